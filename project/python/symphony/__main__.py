@@ -0,0 +1,38 @@
+import argparse
+import importlib
+import sys
+
+# CONSTANTS
+# How the command line tool is run, shown in the usage of every command
+PROG = "python -m symphony"
+# Commands with the module that implements them and a short description. Only the module of the chosen command is
+# imported, so the others' dependencies don't add to its startup time
+COMMANDS = {
+    "generate": ("marker_generation", "generate ArUco marker images"),
+    "sheet": ("marker_sheet", "compose printable sheets of markers at their physical size"),
+    "calibrate": ("camera_calibration", "calibrate the camera from ChArUco board snapshots"),
+    "calibrate-live": ("incremental_calibration", "calibrate the camera while the snapshots are taken"),
+    "bundle": ("calibration_bundle", "convert and inspect binary calibration bundles"),
+    "table": ("table_homography", "compute the homography from camera pixels to the table"),
+    "track": ("marker_tracking", "track the totem markers"),
+    "multi-camera": ("multi_camera", "calibrate several cameras and track the markers with all of them"),
+    "receive": ("pose_stream", "receive the marker poses sent over UDP"),
+    "roi": ("roi_detection", "compare ROI and full-frame detection latency"),
+    "evaluate": ("marker_evaluation", "evaluate marker detection under simulated camera conditions"),
+    "benchmark": ("benchmarks", "benchmark generation, detection and calibration"),
+}
+
+def main(argv: list[str] | None = None):
+    commands = "\n".join(f"  {command:<16}{description}" for command, (_, description) in COMMANDS.items())
+    parser = argparse.ArgumentParser(prog=PROG, description="Tools to generate, calibrate for and track the totem markers.", epilog=f"commands:\n{commands}\n\nRun '{PROG} COMMAND --help' for the options of a command.", formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS, metavar="COMMAND", help="the command to run, see below")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments of the command")
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(f".{COMMANDS[args.command][0]}", __package__)
+    # The commands' parsers take their program name from sys.argv
+    sys.argv[0] = f"{PROG} {args.command}"
+    module.main(args.args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import os
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from .camera_calibration import MIN_CHARUCO_CORNERS, SQUARES_HORIZONTALLY, SQUARES_VERTICALLY, SQUARE_SIZE, create_charuco_board, create_charuco_detector, detect_charuco
+from .incremental_calibration import IncrementalCalibrator
+from .lazy import lazy_import
+from .marker_generation import benchmark_marker_rendering, encode_marker_image, get_dictionary
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+# Directory the results are written to, one JSON file per run
+RESULTS_DIR = "benchmark_results"
+# Synthetic camera the ChArUco views are rendered with
+IMAGE_SIZE = (1920, 1080)
+FOCAL_LENGTH = 1400.0  # In pixels
+DIST_COEFFS = (-0.12, 0.05, 0.0, 0.0, 0.0)
+# Resolution of the flat board image the views are warped from, in pixels per meter
+BOARD_PIXELS_PER_METER = 4000
+# Default strength of the image degradations
+BLUR_SIGMA = 1.0
+NOISE_SIGMA = 6.0  # Standard deviation of the sensor noise, in grey levels
+# Dictionary (name of its `cv2.aruco` constant) and markers the generation is benchmarked with
+GENERATION_DICTIONARY = "DICT_5X5_1000"
+GENERATION_MARKERS = 500
+# Cold start targets in seconds, from starting Python until it exits: printing the tracker's --help, and the tracker
+# processing its first frame (without opening a camera)
+HELP_STARTUP_TARGET = 0.1
+TRACKER_STARTUP_TARGET = 0.25
+# Number of runs per cold start, the fastest one counts
+STARTUP_RUNS = 5
+# Code that starts the tracker and processes one frame
+TRACKER_STARTUP_CODE = "import cv2, numpy as np; from symphony.marker_tracking import MarkerPoseEstimator; MarkerPoseEstimator(np.eye(3), np.zeros(5), cv2.aruco.DICT_5X5_50).process(np.zeros((1080, 1920), np.uint8))"
+
+def synthetic_camera(image_size: tuple[int, int] = IMAGE_SIZE) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the camera matrix and distortion coefficients of the camera the synthetic views are rendered with."""
+
+    camera_matrix = np.array([[FOCAL_LENGTH, 0, image_size[0] / 2], [0, FOCAL_LENGTH, image_size[1] / 2], [0, 0, 1]], dtype=np.float64)
+    return camera_matrix, np.array(DIST_COEFFS, dtype=np.float64)
+
+def distortion_maps(camera_matrix: np.ndarray, dist_coeffs: np.ndarray, image_size: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    # For every pixel of the distorted view, the pixel of the ideal pinhole view it shows
+    width, height = image_size
+    pixels = np.stack(np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32)), axis=-1).reshape(-1, 1, 2)
+    ideal = cv2.undistortPoints(pixels, camera_matrix, dist_coeffs, P=camera_matrix).reshape(height, width, 2)
+    return cv2.convertMaps(ideal[..., 0], ideal[..., 1], cv2.CV_16SC2)
+
+def degrade_view(image: np.ndarray, rng: np.random.Generator, blur_sigma: float = BLUR_SIGMA, noise_sigma: float = NOISE_SIGMA) -> np.ndarray:
+    """Makes a rendered view look like a frame of the IR camera above the table.
+
+    Lowers the contrast, darkens the corners like the falloff of an IR illuminator, blurs, adds sensor noise and a
+    few hot pixels.
+
+    :param image: The grayscale view.
+    :param rng: The random generator.
+    :param blur_sigma: The standard deviation of the Gaussian blur in pixels. 0 disables the blur.
+    :param noise_sigma: The standard deviation of the sensor noise in grey levels. 0 disables the noise.
+    :return: The degraded view.
+    """
+
+    height, width = image.shape
+    view = image.astype(np.float32)
+    view *= rng.uniform(0.45, 0.8)
+    view += rng.uniform(10, 40)
+    # Illuminator falloff towards the corners of the image
+    y, x = np.ogrid[-1:1:height * 1j, -1:1:width * 1j]
+    view *= 1 - rng.uniform(0.2, 0.45) * (x * x + y * y) / 2
+    if blur_sigma > 0:
+        view = cv2.GaussianBlur(view, (0, 0), blur_sigma)
+    if noise_sigma > 0:
+        view += rng.normal(0, noise_sigma, view.shape).astype(np.float32)
+        hot = rng.random(view.shape) < 0.0005
+        view[hot] = 255
+    return np.clip(view, 0, 255).astype(np.uint8)
+
+def synthesize_charuco_views(count: int, image_size: tuple[int, int] = IMAGE_SIZE, seed: int = 0, blur_sigma: float = BLUR_SIGMA, noise_sigma: float = NOISE_SIGMA) -> list[np.ndarray]:
+    """Renders views of the calibration board with random perspective, as seen by `synthetic_camera`.
+
+    The board is the same `create_charuco_board` the calibration uses. Every view places it at a random distance,
+    tilt and rotation, applies the lens distortion and degrades it with `degrade_view`.
+
+    :param count: The number of views.
+    :param image_size: The (width, height) of the views. Default is IMAGE_SIZE.
+    :param seed: The seed of the random poses and noise, so runs render the same views. Default is 0.
+    :param blur_sigma: The standard deviation of the blur in pixels. Default is BLUR_SIGMA.
+    :param noise_sigma: The standard deviation of the sensor noise in grey levels. Default is NOISE_SIGMA.
+    :return: The grayscale views.
+    """
+
+    rng = np.random.default_rng(seed)
+    camera_matrix, dist_coeffs = synthetic_camera(image_size)
+    maps = distortion_maps(camera_matrix, dist_coeffs, image_size)
+
+    board_width, board_height = SQUARES_VERTICALLY * SQUARE_SIZE, SQUARES_HORIZONTALLY * SQUARE_SIZE
+    board_image = create_charuco_board().generateImage((int(board_width * BOARD_PIXELS_PER_METER), int(board_height * BOARD_PIXELS_PER_METER)))
+    # Board image pixels to board coordinates in meters, centred on the board
+    board_to_plane = np.array([[1 / BOARD_PIXELS_PER_METER, 0, -board_width / 2], [0, 1 / BOARD_PIXELS_PER_METER, -board_height / 2], [0, 0, 1]])
+
+    views = []
+    ideal = np.empty((image_size[1], image_size[0]), dtype=np.uint8)
+    for _ in range(count):
+        rvec = np.array([rng.uniform(-0.6, 0.6), rng.uniform(-0.6, 0.6), rng.uniform(-0.5, 0.5)])
+        tvec = np.array([rng.uniform(-0.06, 0.06), rng.uniform(-0.04, 0.04), rng.uniform(0.3, 0.55)])
+        rotation, _ = cv2.Rodrigues(rvec)
+        homography = camera_matrix @ np.column_stack((rotation[:, 0], rotation[:, 1], tvec)) @ board_to_plane
+        cv2.warpPerspective(board_image, homography, image_size, dst=ideal, flags=cv2.INTER_LINEAR, borderValue=160)
+        views.append(degrade_view(cv2.remap(ideal, *maps, cv2.INTER_LINEAR), rng, blur_sigma, noise_sigma))
+    return views
+
+def timing_stats(durations: list[float], count: int | None = None) -> dict[str, float]:
+    # Per-item durations in seconds to throughput and latency percentiles in milliseconds
+    durations_ms = np.array(durations) * 1000
+    return {
+        "count": len(durations) if count is None else count,
+        "per_s": len(durations) / float(np.sum(durations)) if np.sum(durations) > 0 else 0.0,
+        "mean_ms": float(durations_ms.mean()),
+        "p50_ms": float(np.percentile(durations_ms, 50)),
+        "p99_ms": float(np.percentile(durations_ms, 99)),
+    }
+
+def benchmark_generation(marker_count: int = GENERATION_MARKERS, marker_size_px: int = 420) -> dict[str, float]:
+    """Times rendering (per-marker and bulk, see `benchmark_marker_rendering`) and encoding of marker images.
+
+    :param marker_count: The number of markers. Default is GENERATION_MARKERS.
+    :param marker_size_px: The size of the markers in pixels. Default is 420.
+    :return: The rendering results and the encoding throughput in markers per second, as `writeImage` pays it for
+        markers that are not cached.
+    """
+
+    marker_ids = list(range(marker_count))
+    dict = getattr(cv2.aruco, GENERATION_DICTIONARY)
+    results = benchmark_marker_rendering(dict, marker_ids, marker_size_px)
+    aruco_dict = get_dictionary(dict)
+    durations = []
+    for marker_id in marker_ids:
+        start = time.perf_counter()
+        encode_marker_image(aruco_dict, marker_id, marker_size_px, False, 0)
+        durations.append(time.perf_counter() - start)
+    results["encode"] = timing_stats(durations)
+    return results
+
+def benchmark_detection(views: list[np.ndarray]) -> tuple[dict[str, float], list[tuple[np.ndarray, np.ndarray]]]:
+    """Times the ChArUco board detection `process_snapshots` runs on every snapshot.
+
+    :param views: The grayscale views.
+    :return: The detection timings, including the fraction of views with enough corners to calibrate, and the
+        detected corners and IDs of those views.
+    """
+
+    board = create_charuco_board()
+    detector = create_charuco_detector(board)
+    durations, detections = [], []
+    for view in views:
+        start = time.perf_counter()
+        charuco_corners, charuco_ids, _ = detect_charuco(view, board, detector)
+        durations.append(time.perf_counter() - start)
+        if charuco_ids is not None and len(charuco_ids) > MIN_CHARUCO_CORNERS:
+            detections.append((charuco_corners, charuco_ids))
+    results = timing_stats(durations)
+    results["usable_fraction"] = len(detections) / len(views)
+    return results, detections
+
+def benchmark_calibration(detections: list[tuple[np.ndarray, np.ndarray]], image_size: tuple[int, int] = IMAGE_SIZE) -> dict[str, float]:
+    """Times the batch calibration of `process_snapshots` and the incremental calibration until it converged.
+
+    Both start from the same detections, the detection itself is timed by `benchmark_detection`.
+
+    :param detections: The detected corners and IDs of the views, as returned by `benchmark_detection`.
+    :param image_size: The (width, height) of the views. Default is IMAGE_SIZE.
+    :return: The wall time of both calibrations in seconds, their RMS reprojection error and the relative error of
+        the estimated focal length.
+    """
+
+    true_focal_length = synthetic_camera(image_size)[0][0, 0]
+    board = create_charuco_board()
+    start = time.perf_counter()
+    rms, camera_matrix, _, _, _ = cv2.aruco.calibrateCameraCharuco([corners for corners, _ in detections], [ids for _, ids in detections], board, image_size, None, None)
+    results = {
+        "views": len(detections),
+        "batch_s": time.perf_counter() - start,
+        "batch_rms_px": float(rms),
+        "batch_focal_error": abs(camera_matrix[0, 0] - true_focal_length) / true_focal_length,
+    }
+
+    start = time.perf_counter()
+    # Same as `calibrate_stream`, without the detection
+    calibrator = IncrementalCalibrator(board, image_size)
+    for charuco_corners, charuco_ids in detections:
+        calibrator.add_view(charuco_corners, charuco_ids)
+        if calibrator.converged:
+            break
+    if calibrator.camera_matrix is not None:
+        results.update({
+            "incremental_s": time.perf_counter() - start,
+            "incremental_views": len(calibrator.views),
+            "incremental_converged": calibrator.converged,
+            "incremental_rms_px": calibrator.rms,
+            "incremental_focal_error": abs(calibrator.camera_matrix[0, 0] - true_focal_length) / true_focal_length,
+        })
+    return results
+
+def benchmark_startup(runs: int = STARTUP_RUNS) -> dict[str, float]:
+    """Times cold starts of the command line in fresh Python processes.
+
+    :param runs: The number of runs per command. Default is STARTUP_RUNS.
+    :return: The fastest run of Python alone, of the tracker's --help and of the tracker up to its first frame, in
+        seconds.
+    """
+
+    # The directory that contains the package, so `-m symphony` finds it
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    commands = {
+        "python_s": [sys.executable, "-c", "pass"],
+        "help_s": [sys.executable, "-m", "symphony", "track", "--help"],
+        "tracker_s": [sys.executable, "-c", TRACKER_STARTUP_CODE],
+    }
+    results = {}
+    for key, command in commands.items():
+        durations = []
+        # One extra run first, so the bytecode is compiled and the files are in the page cache
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            subprocess.run(command, cwd=package_parent, stdout=subprocess.DEVNULL, check=True)
+            durations.append(time.perf_counter() - start)
+        results[key] = min(durations[1:])
+    return results
+
+def run_benchmarks(view_count: int = 40, seed: int = 0, blur_sigma: float = BLUR_SIGMA, noise_sigma: float = NOISE_SIGMA, marker_count: int = GENERATION_MARKERS) -> dict:
+    """Runs all benchmarks on synthetic inputs.
+
+    :param view_count: The number of synthetic ChArUco views. Default is 40.
+    :param seed: The seed of the synthetic views. Default is 0.
+    :param blur_sigma: The blur of the views in pixels. Default is BLUR_SIGMA.
+    :param noise_sigma: The sensor noise of the views in grey levels. Default is NOISE_SIGMA.
+    :param marker_count: The number of markers to generate. Default is GENERATION_MARKERS.
+    :return: The environment, configuration and results of the run.
+    """
+
+    start = time.perf_counter()
+    views = synthesize_charuco_views(view_count, seed=seed, blur_sigma=blur_sigma, noise_sigma=noise_sigma)
+    synthesis_s = time.perf_counter() - start
+
+    results = {"startup": benchmark_startup()}
+    results["generation"] = benchmark_generation(marker_count)
+    results["detection"], detections = benchmark_detection(views)
+    results["calibration"] = benchmark_calibration(detections) if len(detections) > 0 else {}
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "views": view_count,
+            "image_size": list(IMAGE_SIZE),
+            "seed": seed,
+            "blur_sigma": blur_sigma,
+            "noise_sigma": noise_sigma,
+            "markers": marker_count,
+            "synthesis_s": synthesis_s,
+        },
+        "results": results,
+    }
+
+def flatten_results(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten_results(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def print_results(results: dict, baseline: dict | None = None):
+    current = flatten_results(results)
+    previous = flatten_results(baseline) if baseline is not None else {}
+    width = max(len(key) for key in current)
+    for key, value in current.items():
+        line = f": {key:<{width}} {value:12.4f}"
+        if previous.get(key):
+            line += f"  ({(value - previous[key]) / abs(previous[key]) * 100:+.1f}%)"
+        print(line)
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Benchmark marker generation, ChArUco detection and calibration on synthetic inputs.")
+    parser.add_argument("--views", type=int, default=40, help="number of synthetic ChArUco views (default: 40)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic views (default: 0)")
+    parser.add_argument("--blur", type=float, default=BLUR_SIGMA, help=f"blur of the views in pixels (default: {BLUR_SIGMA})")
+    parser.add_argument("--noise", type=float, default=NOISE_SIGMA, help=f"sensor noise of the views in grey levels (default: {NOISE_SIGMA})")
+    parser.add_argument("--markers", type=int, default=GENERATION_MARKERS, help=f"number of markers to generate (default: {GENERATION_MARKERS})")
+    parser.add_argument("--output", default=None, help=f"JSON file to write the results to (default: {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare the results with")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare is not None:
+        try:
+            with open(args.compare, "r") as baseline_file:
+                baseline = json.load(baseline_file)["results"]
+        except (OSError, ValueError, KeyError) as err:
+            print(f": [Error] Could not read earlier results '{args.compare}': {err}")
+            sys.exit(1)
+
+    print(f"[STARTED] Benchmarking with {args.views} synthetic views and {args.markers} markers.")
+    run = run_benchmarks(args.views, args.seed, args.blur, args.noise, args.markers)
+    print_results(run["results"], baseline)
+    startup = run["results"]["startup"]
+    for key, name, target in (("help_s", "--help", HELP_STARTUP_TARGET), ("tracker_s", "Tracker", TRACKER_STARTUP_TARGET)):
+        if startup[key] > target:
+            print(f"[INFO] {name} cold start of {startup[key] * 1000:.0f} ms misses its target of {target * 1000:.0f} ms.")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now().strftime("%Y%m%d-%H%M%S")}.json")
+    with open(output, "w") as output_file:
+        json.dump(run, output_file, indent=4)
+    print(f"[DONE] Results written to {output}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import os
+import argparse
+import json
+import math
+import struct
+import sys
+import tempfile
+import time
+from typing import NamedTuple
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# CONSTANTS
+# File the calibration bundle is saved to, next to 'calibration_data.json'
+BUNDLE_FILE = "calibration.bin"
+# Identifies calibration bundles and their layout version
+BUNDLE_MAGIC = b"SOLC"
+BUNDLE_VERSION = 1
+# File header: magic, version, number of sections
+FILE_HEADER = struct.Struct("<4sHH")
+# Always loaded: camera matrix (row-major), number of distortion coefficients and the coefficients padded to 14,
+# image width and height, RMS reprojection error (NaN if unknown), number of views, and the board the camera was
+# calibrated with: squares vertically and horizontally, square and marker size in meters, dictionary, legacy pattern
+CORE = struct.Struct("<9dB14dIIdIHHddHB")
+# Section table entry: name (at most 8 bytes), numpy dtype, rows, columns, offset in the file
+SECTION = struct.Struct("<8s4sQQQ")
+# Sections start at a multiple of this many bytes, so they can be memory-mapped as aligned arrays
+SECTION_ALIGNMENT = 64
+# Most distortion coefficients OpenCV estimates
+MAX_DIST_COEFFS = 14
+
+class BoardConfig(NamedTuple):
+    """The ChArUco board a camera was calibrated with.
+
+    - squares_vertically, squares_horizontally: The number of squares.
+    - square_size, marker_size: The side length of a square and a marker, in meters.
+    - dictionary: The ArUco dictionary of the markers, e.g. `cv2.aruco.DICT_5X5_1000`.
+    - legacy_pattern: Whether the board uses OpenCV's legacy ChArUco pattern.
+    """
+
+    squares_vertically: int
+    squares_horizontally: int
+    square_size: float
+    marker_size: float
+    dictionary: int
+    legacy_pattern: bool = True
+
+class CalibrationBundle:
+    """A calibration loaded from a bundle saved by `save_bundle`.
+
+    The camera matrix, distortion coefficients, image size and board are read when the bundle is loaded. The per-view
+    extrinsics and detected corners are only memory-mapped from the file when they are first accessed, so loading
+    doesn't depend on the number of views.
+    """
+
+    def __init__(self, path: str, version: int, camera_matrix: np.ndarray, dist_coeffs: np.ndarray, image_size: tuple[int, int], rms: float | None, view_count: int, board: BoardConfig | None, sections: dict[str, tuple[np.dtype, tuple[int, int], int]]):
+        self.path = path
+        self.version = version
+        self.camera_matrix = camera_matrix
+        self.dist_coeffs = dist_coeffs
+        self.image_size = image_size
+        self.rms = rms
+        self.view_count = view_count
+        self.board = board
+        # Name -> (dtype, shape, offset) of every section in the file
+        self.sections = sections
+        self._loaded = {}
+
+    def section(self, name: str) -> np.ndarray | None:
+        """Memory-maps a section of the bundle read-only.
+
+        :param name: The name of the section, e.g. 'rvecs'.
+        :return: The section, or None if the bundle doesn't have it.
+        """
+
+        if name not in self.sections:
+            return None
+        if name not in self._loaded:
+            dtype, shape, offset = self.sections[name]
+            if shape[0] == 0:
+                self._loaded[name] = np.empty(shape, dtype=dtype)
+            else:
+                self._loaded[name] = np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=shape)
+        return self._loaded[name]
+
+    @property
+    def rvecs(self) -> np.ndarray | None:
+        """The (views, 3) rotation vectors of the board in every view."""
+
+        return self.section("rvecs")
+
+    @property
+    def tvecs(self) -> np.ndarray | None:
+        """The (views, 3) translation vectors of the board in every view."""
+
+        return self.section("tvecs")
+
+    @property
+    def charuco_corners(self) -> list[np.ndarray] | None:
+        """The (N, 1, 2) ChArUco corners detected in every view, as `cv2.aruco.CharucoDetector.detectBoard` returns them."""
+
+        return self._per_view("corners", (-1, 1, 2))
+
+    @property
+    def charuco_ids(self) -> list[np.ndarray] | None:
+        """The (N, 1) IDs of the ChArUco corners detected in every view."""
+
+        return self._per_view("ids", (-1, 1))
+
+    @property
+    def table_pose(self) -> tuple[np.ndarray, np.ndarray] | None:
+        """The (3, 1) rotation and translation vector of the table in camera coordinates, for cameras calibrated with
+        `multi_camera`."""
+
+        pose = self.section("table")
+        if pose is None:
+            return None
+        return np.array(pose[0, :3]).reshape(3, 1), np.array(pose[0, 3:]).reshape(3, 1)
+
+    def _per_view(self, name: str, shape: tuple[int, ...]) -> list[np.ndarray] | None:
+        values, counts = self.section(name), self.section("counts")
+        if values is None or counts is None:
+            return None
+        return [view.reshape(shape) for view in np.split(values, np.cumsum(counts[:, 0])[:-1])]
+
+def save_bundle(path: str, camera_matrix: np.ndarray, dist_coeffs: np.ndarray, image_size: tuple[int, int], rvecs=None, tvecs=None, charuco_corners=None, charuco_ids=None, rms: float | None = None, board: BoardConfig | None = None, table_pose: tuple[np.ndarray, np.ndarray] | None = None):
+    """Saves a calibration as a binary bundle.
+
+    The file is a `FILE_HEADER`, the `CORE` calibration, a `SECTION` table and the sections, all little-endian.
+    It is written to a temporary file first, so a tracker starting at the same time never reads half a bundle.
+
+    :param path: The path of the bundle.
+    :param camera_matrix: The 3x3 camera matrix.
+    :param dist_coeffs: The distortion coefficients.
+    :param image_size: The (width, height) the camera was calibrated at.
+    :param rvecs: The rotation vector of the board in every view. Optional.
+    :param tvecs: The translation vector of the board in every view. Optional.
+    :param charuco_corners: The ChArUco corners detected in every view. Optional.
+    :param charuco_ids: The IDs of the ChArUco corners detected in every view, needed with `charuco_corners`.
+    :param rms: The RMS reprojection error of the calibration. Optional.
+    :param board: The board the camera was calibrated with. Optional.
+    :param table_pose: The rotation and translation vector of the table in camera coordinates. Optional.
+    :raises ValueError: If there are more distortion coefficients than OpenCV estimates.
+    """
+
+    dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64).ravel()
+    if len(dist_coeffs) > MAX_DIST_COEFFS:
+        raise ValueError(f"At most {MAX_DIST_COEFFS} distortion coefficients are supported, got {len(dist_coeffs)}.")
+
+    sections = {}
+    if rvecs is not None:
+        sections["rvecs"] = np.asarray(rvecs, dtype="<f8").reshape(-1, 3)
+    if tvecs is not None:
+        sections["tvecs"] = np.asarray(tvecs, dtype="<f8").reshape(-1, 3)
+    if charuco_corners is not None:
+        # Views have different numbers of corners, so they are stored back to back with a count per view
+        sections["counts"] = np.array([[len(corners)] for corners in charuco_corners], dtype="<i4").reshape(-1, 1)
+        sections["corners"] = np.concatenate([np.asarray(corners, dtype="<f4").reshape(-1, 2) for corners in charuco_corners]) if len(charuco_corners) > 0 else np.empty((0, 2), dtype="<f4")
+        sections["ids"] = np.concatenate([np.asarray(ids, dtype="<i4").reshape(-1, 1) for ids in charuco_ids]) if len(charuco_ids) > 0 else np.empty((0, 1), dtype="<i4")
+    if table_pose is not None:
+        sections["table"] = np.concatenate([np.ravel(table_pose[0]), np.ravel(table_pose[1])]).astype("<f8").reshape(1, 6)
+    view_count = max((len(sections[name]) for name in ("rvecs", "counts") if name in sections), default=0)
+
+    padded_dist_coeffs = np.zeros(MAX_DIST_COEFFS)
+    padded_dist_coeffs[:len(dist_coeffs)] = dist_coeffs
+    board = board or BoardConfig(0, 0, 0.0, 0.0, 0, False)
+    core = CORE.pack(*np.asarray(camera_matrix, dtype=np.float64).ravel(), len(dist_coeffs), *padded_dist_coeffs, *image_size, math.nan if rms is None else rms, view_count,
+                     board.squares_vertically, board.squares_horizontally, board.square_size, board.marker_size, board.dictionary, board.legacy_pattern)
+
+    offset = FILE_HEADER.size + CORE.size + len(sections) * SECTION.size
+    table = []
+    for name, values in sections.items():
+        offset = -(-offset // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+        table.append(SECTION.pack(name.encode(), values.dtype.str.encode(), values.shape[0], values.shape[1], offset))
+        offset += values.nbytes
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as bundle_file:
+            bundle_file.write(FILE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(sections)))
+            bundle_file.write(core)
+            bundle_file.write(b"".join(table))
+            for values in sections.values():
+                bundle_file.write(bytes(-bundle_file.tell() % SECTION_ALIGNMENT))
+                bundle_file.write(values.tobytes())
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def load_bundle(path: str) -> CalibrationBundle:
+    """Loads a calibration bundle saved by `save_bundle`.
+
+    Only the header, the core calibration and the section table are read, the sections are memory-mapped when
+    they are accessed.
+
+    :param path: The path of the bundle.
+    :return: The calibration.
+    :raises OSError: If the file cannot be read.
+    :raises ValueError: If the file is not a calibration bundle, is truncated or was written by a newer version.
+    """
+
+    with open(path, "rb") as bundle_file:
+        head = bundle_file.read(FILE_HEADER.size + CORE.size)
+        if len(head) < FILE_HEADER.size or head[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            raise ValueError(f"'{path}' is not a calibration bundle.")
+        _, version, section_count = FILE_HEADER.unpack_from(head)
+        if version > BUNDLE_VERSION:
+            raise ValueError(f"'{path}' was written by a newer version ({version}), only version {BUNDLE_VERSION} and older can be read.")
+        table = bundle_file.read(section_count * SECTION.size)
+    if len(head) < FILE_HEADER.size + CORE.size or len(table) < section_count * SECTION.size:
+        raise ValueError(f"Calibration bundle '{path}' is truncated.")
+
+    core = CORE.unpack_from(head, FILE_HEADER.size)
+    camera_matrix = np.array(core[0:9], dtype=np.float64).reshape(3, 3)
+    dist_count = core[9]
+    dist_coeffs = np.array(core[10:10 + dist_count], dtype=np.float64).reshape(1, -1)
+    width, height, rms, view_count = core[24:28]
+    board = BoardConfig(*core[28:33], bool(core[33]))
+    sections = {}
+    for index in range(section_count):
+        name, dtype, rows, columns, offset = SECTION.unpack_from(table, index * SECTION.size)
+        sections[name.rstrip(b"\0").decode()] = (np.dtype(dtype.rstrip(b"\0").decode()), (rows, columns), offset)
+    return CalibrationBundle(path, version, camera_matrix, dist_coeffs, (width, height), None if math.isnan(rms) else rms, view_count, board if board.squares_vertically > 0 else None, sections)
+
+def is_bundle(path: str) -> bool:
+    try:
+        with open(path, "rb") as calibration_file:
+            return calibration_file.read(len(BUNDLE_MAGIC)) == BUNDLE_MAGIC
+    except OSError:
+        return False
+
+def convert_json(json_path: str, bundle_path: str, board: BoardConfig | None = None, image_size: tuple[int, int] | None = None) -> CalibrationBundle:
+    """Converts a 'calibration_data.json' into a calibration bundle.
+
+    The JSON file has no detected corners, so the bundle won't either. Files written before the image size was saved
+    need `image_size`, the resolution of the snapshots the camera was calibrated with.
+
+    :param json_path: The path of the JSON file.
+    :param bundle_path: The path of the bundle to write.
+    :param board: The board the camera was calibrated with. Optional.
+    :param image_size: The (width, height) the camera was calibrated at. Only used if the file doesn't have it.
+    :return: The converted calibration, loaded from the bundle.
+    :raises OSError: If the JSON file cannot be read or the bundle cannot be written.
+    :raises KeyError: If the JSON file does not contain calibration data.
+    :raises ValueError: If neither the JSON file nor `image_size` give the image size.
+    """
+
+    with open(json_path, "r") as calibration_file:
+        data = json.load(calibration_file)
+    if "image_size" in data:
+        image_size = tuple(data["image_size"])
+    elif image_size is None:
+        raise ValueError(f"'{json_path}' has no 'image_size', pass the resolution of the calibration snapshots with --image-size WIDTHxHEIGHT.")
+    save_bundle(bundle_path, np.array(data["camera_matrix"], dtype=np.float64), np.array(data["dist_coeffs"], dtype=np.float64), image_size, data.get("rvecs"), data.get("tvecs"), board=board)
+    return load_bundle(bundle_path)
+
+def print_bundle(bundle: CalibrationBundle):
+    width, height = bundle.image_size
+    print(f"Version {bundle.version}, calibrated at {width}x{height} from {bundle.view_count} views" + (f", RMS {bundle.rms:.3f} px." if bundle.rms is not None else "."))
+    print(f"Camera matrix: {bundle.camera_matrix.tolist()}")
+    print(f"Distortion coefficients: {bundle.dist_coeffs.ravel().tolist()}")
+    if bundle.board is not None:
+        board = bundle.board
+        print(f"Board: {board.squares_vertically}x{board.squares_horizontally} squares of {board.square_size * 1000:g} mm, markers of {board.marker_size * 1000:g} mm, dictionary {board.dictionary}.")
+    for name, (dtype, shape, offset) in bundle.sections.items():
+        print(f"Section {name}: {shape[0]}x{shape[1]} {dtype} at byte {offset}.")
+
+def main(argv: list[str] | None = None):
+    # Imported here, camera_calibration itself imports this module
+    from .camera_calibration import board_config, parse_resolution
+
+    parser = argparse.ArgumentParser(description="Convert calibration files to binary calibration bundles and inspect them.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="convert a calibration_data.json into a bundle")
+    convert_parser.add_argument("json_path", nargs="?", default="calibration_data.json", help="JSON file written by the calibrate command (default: calibration_data.json)")
+    convert_parser.add_argument("--output", default=BUNDLE_FILE, help=f"path of the bundle (default: {BUNDLE_FILE})")
+    convert_parser.add_argument("--image-size", type=parse_resolution, default=None, metavar="WIDTHxHEIGHT", help="resolution of the calibration snapshots, for JSON files that don't contain it")
+    info_parser = subparsers.add_parser("info", help="print a bundle and how long it takes to load")
+    info_parser.add_argument("bundle_path", nargs="?", default=BUNDLE_FILE, help=f"path of the bundle (default: {BUNDLE_FILE})")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        try:
+            bundle = convert_json(args.json_path, args.output, board_config(), args.image_size)
+        except (OSError, KeyError, ValueError) as err:
+            print(f": [Error] Could not convert '{args.json_path}': {err}")
+            sys.exit(1)
+        print(f"[DONE] Converted '{args.json_path}' ({os.path.getsize(args.json_path)} bytes) to '{args.output}' ({os.path.getsize(args.output)} bytes).")
+        print_bundle(bundle)
+        return
+
+    try:
+        start = time.perf_counter()
+        bundle = load_bundle(args.bundle_path)
+        load_time = time.perf_counter() - start
+    except (OSError, ValueError) as err:
+        print(f": [Error] Could not load '{args.bundle_path}': {err}")
+        sys.exit(1)
+    print_bundle(bundle)
+    print(f"[INFO] Loaded in {load_time * 1e6:.0f} µs.")
+
+if __name__ == "__main__":
+    main()
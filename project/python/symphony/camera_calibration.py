@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import os
+import json
+import argparse
+import hashlib
+import tempfile
+import time
+from typing import NamedTuple
+
+from . import instrumentation
+from .calibration_bundle import BUNDLE_FILE, BoardConfig, is_bundle, load_bundle, save_bundle
+from .lazy import lazy_import
+from .marker_generation import get_dictionary
+from .undistortion import compute_undistort_maps, save_undistort_maps, scale_camera_matrix, undistort_frame, UNDISTORT_MAP1_FILE, UNDISTORT_MAP2_FILE
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+futures = lazy_import("concurrent.futures")
+
+# CONSTANTS
+# ChArUco board used for calibration
+SQUARES_VERTICALLY = 12
+SQUARES_HORIZONTALLY = 8
+SQUARE_SIZE = 0.02  # Length of a square side in meters
+MARKER_SIZE = 0.015  # Length of a marker side in meters
+BOARD_DICTIONARY = "DICT_5X5_1000"  # Name of the `cv2.aruco` constant
+# Snapshots need more than this many ChArUco corners to be used for calibration
+MIN_CHARUCO_CORNERS = 4
+SNAPSHOT_EXTENSION = ".jpg"
+# Directory inside the snapshots directory that caches the detections per snapshot
+CACHE_DIR = ".detections"
+
+class CalibrationResult(NamedTuple):
+    """Result of calibrating a camera from its snapshots.
+
+    - rms: The RMS reprojection error in pixels.
+    - camera_matrix, dist_coeffs: The intrinsics of the camera.
+    - image_size: The (width, height) of the snapshots.
+    - rvecs, tvecs: The pose of the board in every used snapshot.
+    - charuco_corners, charuco_ids: The ChArUco corners detected in every used snapshot.
+    """
+
+    rms: float
+    camera_matrix: np.ndarray
+    dist_coeffs: np.ndarray
+    image_size: tuple[int, int]
+    rvecs: tuple[np.ndarray, ...]
+    tvecs: tuple[np.ndarray, ...]
+    charuco_corners: list[np.ndarray]
+    charuco_ids: list[np.ndarray]
+
+def create_charuco_board() -> cv2.aruco.CharucoBoard:
+    dict = get_dictionary(getattr(cv2.aruco, BOARD_DICTIONARY))
+    board = cv2.aruco.CharucoBoard((SQUARES_VERTICALLY, SQUARES_HORIZONTALLY), SQUARE_SIZE, MARKER_SIZE, dict)
+    board.setLegacyPattern(True)
+    return board
+
+def board_config() -> BoardConfig:
+    return BoardConfig(SQUARES_VERTICALLY, SQUARES_HORIZONTALLY, SQUARE_SIZE, MARKER_SIZE, getattr(cv2.aruco, BOARD_DICTIONARY), legacy_pattern=True)
+
+def create_detector_parameters() -> cv2.aruco.DetectorParameters:
+    # Shared by the calibration and the marker tracking, so both detect markers the same way
+    return cv2.aruco.DetectorParameters()
+
+def create_charuco_detector(board: cv2.aruco.CharucoBoard) -> cv2.aruco.CharucoDetector:
+    detectorParams = create_detector_parameters()
+    charucoParams = cv2.aruco.CharucoParameters()
+    return cv2.aruco.CharucoDetector(board, charucoParams, detectorParams)
+
+# Per-process board and detector, set once by `init_detection_worker`
+_detection_state = {}
+
+def init_detection_worker(cache_dir: str | None, instrumentation_settings: tuple | None = None):
+    instrumentation.init_worker(instrumentation_settings)
+    # OpenCV objects can't be pickled, so every worker builds its own board and detector
+    _detection_state["board"] = create_charuco_board()
+    _detection_state["detector"] = create_charuco_detector(_detection_state["board"])
+    _detection_state["cache_dir"] = cache_dir
+
+def detect_snapshot(image_path: str) -> dict | None:
+    """Detects the ChArUco corners in a single snapshot, reusing a cached result if the file is unchanged.
+
+    Must run in a process initialized by `init_detection_worker`.
+
+    :param image_path: The path of the snapshot.
+    :return: A dictionary with the 'charuco_corners', 'charuco_ids' (None if too few corners were found),
+        'marker_count', 'image_size' (width, height), whether the result came from the 'cached' detections and the
+        name of its 'cache_file' (None without a cache), or None if the image could not be read.
+    """
+
+    try:
+        with instrumentation.span("read"), open(image_path, "rb") as image_file:
+            raw = image_file.read()
+        mtime_ns = os.stat(image_path).st_mtime_ns
+    except OSError:
+        return None
+
+    # Key the cache on the file content and modification time
+    cache_dir = _detection_state["cache_dir"]
+    cache_path = None
+    if cache_dir is not None:
+        key = hashlib.sha1(raw)
+        key.update(str(mtime_ns).encode())
+        cache_path = os.path.join(cache_dir, f"{key.hexdigest()}.npz")
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as cached:
+                    instrumentation.count("snapshots.cached")
+                    return detection_result(cached["charuco_corners"], cached["charuco_ids"], int(cached["marker_count"]), tuple(int(v) for v in cached["image_size"]), cached=True, cache_path=cache_path)
+            except (OSError, ValueError, KeyError):
+                # Corrupt cache entry, detect again and overwrite it
+                pass
+
+    with instrumentation.span("decode"):
+        # Decoding straight to grayscale skips the colour conversion
+        image = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    charuco_corners, charuco_ids, marker_count = detect_charuco(image, _detection_state["board"], _detection_state["detector"])
+    instrumentation.count("snapshots.detected")
+    # Store empty arrays for snapshots without corners, so they are cached as well
+    charuco_corners = np.empty((0, 1, 2), dtype=np.float32) if charuco_corners is None else charuco_corners
+    charuco_ids = np.empty((0, 1), dtype=np.int32) if charuco_ids is None else charuco_ids
+    image_size = (image.shape[1], image.shape[0])
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".npz")
+        with os.fdopen(fd, "wb") as tmp_file:
+            np.savez(tmp_file, charuco_corners=charuco_corners, charuco_ids=charuco_ids, marker_count=marker_count, image_size=image_size)
+        os.replace(tmp_path, cache_path)
+
+    return detection_result(charuco_corners, charuco_ids, marker_count, image_size, cached=False, cache_path=cache_path)
+
+def detect_charuco(image: np.ndarray, board: cv2.aruco.CharucoBoard, detector: cv2.aruco.CharucoDetector) -> tuple[np.ndarray | None, np.ndarray | None, int]:
+    """Detects the ChArUco corners of the board in a grayscale image.
+
+    :param image: The grayscale image.
+    :param board: The board the detector was created for.
+    :param detector: The detector created by `create_charuco_detector`.
+    :return: The ChArUco corners and IDs (None if none were found) and the number of detected markers.
+    """
+
+    with instrumentation.span("detect"):
+        charuco_corners, charuco_ids, marker_corners, marker_ids = detector.detectBoard(image)
+    marker_count = 0 if marker_ids is None else len(marker_ids)
+
+    if marker_count > 0:
+        with instrumentation.span("interpolate"):
+            success, charuco_corners, charuco_ids = cv2.aruco.interpolateCornersCharuco(marker_corners, marker_ids, image, board, charuco_corners, charuco_ids)
+        if not success:
+            charuco_corners, charuco_ids = None, None
+    return charuco_corners, charuco_ids, marker_count
+
+def detection_result(charuco_corners: np.ndarray, charuco_ids: np.ndarray, marker_count: int, image_size: tuple[int, int], cached: bool, cache_path: str | None = None) -> dict:
+    return {
+        "charuco_corners": charuco_corners if len(charuco_ids) > 0 else None,
+        "charuco_ids": charuco_ids if len(charuco_ids) > 0 else None,
+        "marker_count": marker_count,
+        "image_size": image_size,
+        "cached": cached,
+        "cache_file": os.path.basename(cache_path) if cache_path is not None else None,
+    }
+
+def prune_detection_cache(cache_dir: str, results: list[dict | None]) -> int:
+    """Removes the cached detections that none of the current snapshots match anymore.
+
+    Every changed or deleted snapshot leaves its old detections behind, as the cache is keyed on the file content.
+
+    :param cache_dir: The directory the detections are cached in.
+    :param results: The detection results of all current snapshots (see `detect_snapshot`).
+    :return: The number of removed cache entries.
+    """
+
+    keep = {result["cache_file"] for result in results if result is not None}
+    removed = 0
+    try:
+        entries = list(os.scandir(cache_dir))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if entry.is_file() and entry.name.endswith(".npz") and entry.name not in keep:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+def detect_snapshots(image_paths: list[str], cache_dir: str | None = None, workers: int | None = None) -> list[dict | None]:
+    """Detects the ChArUco corners in all snapshots, spreading the work across a process pool.
+
+    :param image_paths: The paths of the snapshots.
+    :param cache_dir: The directory to cache the detections in. None disables the cache.
+    :param workers: The number of worker processes. Defaults to the number of CPUs, 1 detects in-process.
+    :return: The detection results in the same order as the paths (see `detect_snapshot`).
+    """
+
+    workers = min(workers or os.cpu_count() or 1, len(image_paths))
+    if workers <= 1:
+        init_detection_worker(cache_dir)
+        return [detect_snapshot(path) for path in image_paths]
+    with futures.ProcessPoolExecutor(max_workers=workers, initializer=init_detection_worker, initargs=(cache_dir, instrumentation.worker_settings())) as pool:
+        return list(pool.map(detect_snapshot, image_paths))
+
+def process_snapshots(snapshots_dir, use_cache: bool = True, workers: int | None = None, preview: bool = False, map_size: tuple[int, int] | None = None):
+    result = calibrate_snapshots(snapshots_dir, use_cache, workers)
+    if result is None:
+        return
+
+    image_size = result.image_size
+    map_size = tuple(map_size) if map_size is not None else image_size
+    maps = save_calibration(result.camera_matrix, result.dist_coeffs, image_size, result.rvecs, result.tvecs, os.getcwd(), map_size, result.charuco_corners, result.charuco_ids, result.rms)
+
+    if not preview:
+        return
+
+    # Iterate through displaying all the images
+    for snapshot in sorted(f for f in os.listdir(snapshots_dir) if f.endswith(SNAPSHOT_EXTENSION)):
+        image_path = os.path.join(snapshots_dir, snapshot)
+        image = cv2.imread(image_path)
+        if image is None:
+            print(f"Could not read image {image_path}. Skipping.")
+            continue
+        if map_size != image_size:
+            image = cv2.resize(image, map_size)
+        undistorted_image = undistort_frame(image, maps)
+        cv2.imshow('Undistorted Image', undistorted_image)
+        cv2.waitKey(0)
+
+def calibrate_snapshots(snapshots_dir: str, use_cache: bool = True, workers: int | None = None) -> CalibrationResult | None:
+    """Detects the ChArUco board in the snapshots of a directory and calibrates the camera with them.
+
+    :param snapshots_dir: The directory with the snapshots.
+    :param use_cache: If True, detections cached by earlier runs are reused. Default is True.
+    :param workers: The number of detection processes. Defaults to the number of CPUs.
+    :return: The calibration, or None if there were no usable snapshots or the calibration failed.
+    """
+
+    board = create_charuco_board()
+
+    snapshots = sorted(f for f in os.listdir(snapshots_dir) if f.endswith(SNAPSHOT_EXTENSION))
+
+    if not snapshots:
+        print(f"No snapshots found in {snapshots_dir}.")
+        return None
+
+    all_charuco_corners = []
+    all_charuco_ids = []
+    image_size = None
+
+    start = time.perf_counter()
+    image_paths = [os.path.join(snapshots_dir, snapshot) for snapshot in snapshots]
+    cache_dir = os.path.join(snapshots_dir, CACHE_DIR) if use_cache else None
+    results = detect_snapshots(image_paths, cache_dir, workers)
+
+    for snapshot, image_path, result in zip(snapshots, image_paths, results):
+        if result is None:
+            print(f"Could not read image {image_path}. Skipping.")
+            continue
+        print(f"Processing {snapshot}: Detected {result["marker_count"]} markers.")
+
+        # All snapshots must have the resolution the camera will be tracking at
+        if image_size is None:
+            image_size = result["image_size"]
+        elif result["image_size"] != image_size:
+            print(f"Snapshot {snapshot} has a different resolution {result["image_size"]} than {image_size}. Skipping.")
+            continue
+
+        charuco_ids = result["charuco_ids"]
+        if charuco_ids is not None and len(charuco_ids) > MIN_CHARUCO_CORNERS:
+            print(f"Snapshot {snapshot}: Found {len(charuco_ids)} Charuco corners and {len(charuco_ids)} Charuco ids.")
+            all_charuco_corners.append(result["charuco_corners"])
+            all_charuco_ids.append(charuco_ids)
+    cached = sum(1 for result in results if result is not None and result["cached"])
+    detected = sum(1 for result in results if result is not None) - cached
+    print(f"Detection took {time.perf_counter() - start:.2f}s ({detected} detected, {cached} from cache).")
+    if cache_dir is not None:
+        pruned = prune_detection_cache(cache_dir, results)
+        if pruned > 0:
+            print(f"Removed {pruned} cached detection{"" if pruned == 1 else "s"} of changed or deleted snapshots.")
+
+    if not all_charuco_corners or not all_charuco_ids:
+        print("No valid Charuco corners or IDs found in the snapshots.")
+        return None
+
+    with instrumentation.span("calibrate"):
+        # The return value is the RMS reprojection error, which is 0 if the calibration failed
+        rms, camera_matrix, dist_coeffs, rvecs, tvecs = cv2.aruco.calibrateCameraCharuco(all_charuco_corners, all_charuco_ids, board, image_size, None, None)
+
+    if not rms:
+        print("Camera calibration failed. Please check your snapshots and try again.")
+        return None
+    return CalibrationResult(rms, camera_matrix, dist_coeffs, image_size, rvecs, tvecs, all_charuco_corners, all_charuco_ids)
+
+def save_calibration(camera_matrix: np.ndarray, dist_coeffs: np.ndarray, image_size: tuple[int, int], rvecs, tvecs, directory: str, map_size: tuple[int, int] | None = None, charuco_corners=None, charuco_ids=None, rms: float | None = None, table_pose: tuple[np.ndarray, np.ndarray] | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Saves the calibration as 'calibration_data.json' and as a binary bundle (see `calibration_bundle`), together
+    with the precomputed undistortion maps.
+
+    :param camera_matrix: The 3x3 camera matrix.
+    :param dist_coeffs: The distortion coefficients.
+    :param image_size: The (width, height) the camera was calibrated at.
+    :param rvecs: The rotation vector of the board in every view.
+    :param tvecs: The translation vector of the board in every view.
+    :param directory: The directory to save the files to.
+    :param map_size: The (width, height) to compute the undistortion maps for. Defaults to `image_size`.
+    :param charuco_corners: The ChArUco corners detected in every view, only saved in the bundle. Optional.
+    :param charuco_ids: The IDs of the detected ChArUco corners in every view, only saved in the bundle. Optional.
+    :param rms: The RMS reprojection error of the calibration, only saved in the bundle. Optional.
+    :param table_pose: The rotation and translation vector of the table in camera coordinates, see `multi_camera`.
+        Optional.
+    :return: The undistortion maps.
+    """
+
+    # Precompute the undistortion lookup tables for the resolution the camera will be tracking at
+    map_size = tuple(map_size) if map_size is not None else tuple(image_size)
+    with instrumentation.span("undistort_maps"):
+        maps = compute_undistort_maps(scale_camera_matrix(camera_matrix, image_size, map_size), dist_coeffs, map_size)
+    with instrumentation.span("write"):
+        save_undistort_maps(*maps, directory)
+
+    # Save calibration data
+    data = {
+        "camera_matrix": camera_matrix.tolist(),
+        "dist_coeffs": dist_coeffs.tolist(),
+        "image_size": list(image_size),
+        "undistort_maps": {
+            "image_size": list(map_size),
+            "map1": UNDISTORT_MAP1_FILE,
+            "map2": UNDISTORT_MAP2_FILE,
+        },
+        "rvecs": [rvec.tolist() for rvec in rvecs],
+        "tvecs": [tvec.tolist() for tvec in tvecs]
+    }
+    if table_pose is not None:
+        data["table_pose"] = {"rvec": np.ravel(table_pose[0]).tolist(), "tvec": np.ravel(table_pose[1]).tolist()}
+    with instrumentation.span("write"), open(os.path.join(directory, 'calibration_data.json'), 'w') as save_file:
+        json.dump(data, save_file, indent=4)
+    with instrumentation.span("write"):
+        save_bundle(os.path.join(directory, BUNDLE_FILE), camera_matrix, dist_coeffs, image_size, rvecs, tvecs, charuco_corners, charuco_ids, rms, board_config(), table_pose)
+    return maps
+
+def load_calibration(calibration_path: str) -> tuple[np.ndarray, np.ndarray, tuple[int, int] | None]:
+    """Loads the camera matrix and distortion coefficients saved by `process_snapshots`.
+
+    :param calibration_path: The path of 'calibration_data.json' or of the calibration bundle.
+    :return: The camera matrix, the distortion coefficients and the (width, height) the camera was calibrated at,
+        which is None for calibration files written before it was recorded.
+    :raises OSError: If the file cannot be read.
+    :raises KeyError: If the file does not contain calibration data.
+    :raises ValueError: If the bundle is invalid or was written by a newer version.
+    """
+
+    if is_bundle(calibration_path):
+        # Only reads the first few hundred bytes, however many views the camera was calibrated with
+        bundle = load_bundle(calibration_path)
+        return bundle.camera_matrix, bundle.dist_coeffs, bundle.image_size
+
+    with open(calibration_path, 'r') as calibration_file:
+        data = json.load(calibration_file)
+    camera_matrix = np.array(data["camera_matrix"], dtype=np.float64)
+    dist_coeffs = np.array(data["dist_coeffs"], dtype=np.float64)
+    image_size = tuple(data["image_size"]) if "image_size" in data else None
+    return camera_matrix, dist_coeffs, image_size
+
+def parse_resolution(value: str) -> tuple[int, int]:
+    width, _, height = value.lower().partition("x")
+    try:
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid resolution '{value}', expected WIDTHxHEIGHT.")
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Calibrate the camera from ChArUco board snapshots.")
+    parser.add_argument("snapshots_dir", nargs="?", default=os.path.join(os.getcwd(), "calibration_snapshots"), help="directory with the snapshots (default: ./calibration_snapshots)")
+    parser.add_argument("--workers", type=int, default=None, help="number of detection processes (default: number of CPUs)")
+    parser.add_argument("--no-cache", action="store_true", help="detect every snapshot again instead of reusing cached detections")
+    parser.add_argument("--preview", action="store_true", help="show every undistorted snapshot after calibrating")
+    parser.add_argument("--resolution", type=parse_resolution, default=None, help="WIDTHxHEIGHT to precompute the undistortion maps for (default: snapshot resolution)")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    # cProfile only sees the main process, so detect in-process unless the number of workers is given
+    if args.profile is not None and args.workers is None:
+        args.workers = 1
+    with instrumentation.session(args.stats, args.trace, args.profile):
+        process_snapshots(args.snapshots_dir, use_cache=not args.no_cache, workers=args.workers, preview=args.preview, map_size=args.resolution)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import time
+
+from .lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+multiprocessing = lazy_import("multiprocessing")
+
+# CONSTANTS
+# Number of frames the ring holds before the oldest one is overwritten
+RING_SLOTS = 8
+# Ring header: height, width, number of slots, sequence number of the latest frame, closed flag
+HEADER_FIELDS = 5
+HEADER_HEIGHT, HEADER_WIDTH, HEADER_SLOTS, HEADER_LATEST, HEADER_CLOSED = range(HEADER_FIELDS)
+# The frames start at a multiple of this many bytes, so every slot starts on a cache line
+FRAME_ALIGNMENT = 64
+# Sequence number of a slot that is empty or being written
+NO_FRAME = 0
+
+class FrameRing:
+    """Fixed-size ring of grayscale frames in shared memory, written by one process and read by many.
+
+    The shared memory holds a small header, a sequence number and capture time per slot, and the frames
+    themselves, all allocated once. The writer converts every frame straight into the next slot, readers get
+    numpy views of the slots, so frames are never copied or pickled between processes.
+
+    Every frame gets a sequence number, starting at 1. A slot is only overwritten `slots` frames later, so readers
+    don't take locks: they check `is_current` after using a frame and drop their result if the writer caught up
+    with them in the meantime. A ring can be passed to a `multiprocessing.Process`, which attaches to it.
+    """
+
+    def __init__(self, shape: tuple[int, int] | None = None, slots: int = RING_SLOTS, name: str | None = None, context: multiprocessing.context.BaseContext | None = None):
+        """
+        :param shape: The (height, width) of the frames. Only needed to create a new ring.
+        :param slots: The number of frames a new ring holds. Default is RING_SLOTS.
+        :param name: The name of an existing ring to attach to. If None, a new ring is created.
+        :param context: The multiprocessing context the reader processes are started with. Defaults to the default
+            context.
+        :raises ValueError: If a new ring has no shape, or is too small to hand out a frame while the next one is
+            written.
+        """
+
+        # Imported here, a submodule can't be loaded lazily without loading multiprocessing right away
+        from multiprocessing import shared_memory
+
+        self.owner = name is None
+        if self.owner:
+            if shape is None:
+                raise ValueError("The shape of the frames is needed to create a frame ring.")
+            if slots < 2:
+                raise ValueError(f"A frame ring needs at least 2 slots, got {slots}.")
+            height, width = shape
+            self.shm = shared_memory.SharedMemory(create=True, size=self._frames_offset(slots) + slots * height * width)
+            # Readers wait on this until a new frame was written
+            self.condition = (context or multiprocessing).Condition()
+        else:
+            # Attached rings must not be unlinked by the resource tracker when a reader exits
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+            height, width, slots = (int(value) for value in np.ndarray((3,), dtype=np.int64, buffer=self.shm.buf))
+            self.condition = None
+        self.name = self.shm.name
+        frames_offset = self._frames_offset(slots)
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        self.sequence_numbers = np.ndarray((slots,), dtype=np.int64, buffer=self.shm.buf, offset=HEADER_FIELDS * 8)
+        self.timestamps = np.ndarray((slots,), dtype=np.float64, buffer=self.shm.buf, offset=(HEADER_FIELDS + slots) * 8)
+        self.frames = np.ndarray((slots, height, width), dtype=np.uint8, buffer=self.shm.buf, offset=frames_offset)
+        if self.owner:
+            self.header[:] = (height, width, slots, NO_FRAME, 0)
+            self.sequence_numbers[:] = NO_FRAME
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.frames.shape[1], self.frames.shape[2]
+
+    @property
+    def slots(self) -> int:
+        return self.frames.shape[0]
+
+    @property
+    def latest(self) -> int:
+        """The sequence number of the latest complete frame, NO_FRAME before the first one."""
+
+        return int(self.header[HEADER_LATEST])
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.header[HEADER_CLOSED])
+
+    def write(self, frame: np.ndarray, timestamp: float) -> int:
+        """Converts a frame to grayscale straight into the next slot.
+
+        :param frame: The BGR or grayscale frame, of the ring's shape.
+        :param timestamp: The `time.perf_counter()` at which the frame was captured.
+        :return: The sequence number of the frame.
+        :raises ValueError: If the frame has another size than the ring.
+        """
+
+        if frame.shape[:2] != self.shape:
+            raise ValueError(f"Frame of {frame.shape[1]}x{frame.shape[0]} doesn't fit a ring of {self.shape[1]}x{self.shape[0]}.")
+        sequence_number = self.latest + 1
+        slot = sequence_number % self.slots
+        # Mark the slot as being written first, so a reader that still holds it sees it's no longer current
+        self.sequence_numbers[slot] = NO_FRAME
+        if frame.ndim == 3:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.frames[slot])
+        else:
+            np.copyto(self.frames[slot], frame)
+        self.timestamps[slot] = timestamp
+        self.sequence_numbers[slot] = sequence_number
+        self.header[HEADER_LATEST] = sequence_number
+        if self.condition is not None:
+            with self.condition:
+                self.condition.notify_all()
+        return sequence_number
+
+    def read(self, sequence_number: int) -> tuple[np.ndarray, float] | None:
+        """Returns a frame without copying it.
+
+        The frame is a view of the shared memory. Once done with it, check `is_current` to make sure it wasn't
+        overwritten while it was being used.
+
+        :param sequence_number: The sequence number of the frame.
+        :return: The frame and the time it was captured, or None if it was already overwritten or not yet written.
+        """
+
+        slot = sequence_number % self.slots
+        if self.sequence_numbers[slot] != sequence_number:
+            return None
+        return self.frames[slot], float(self.timestamps[slot])
+
+    def is_current(self, sequence_number: int) -> bool:
+        return self.sequence_numbers[sequence_number % self.slots] == sequence_number
+
+    def wait(self, after: int, timeout: float | None = None) -> int:
+        """Waits for a frame newer than `after`.
+
+        :param after: The sequence number of the last frame the caller has seen.
+        :param timeout: The maximum time to wait in seconds. Default is to wait until a frame arrives or the ring is
+            closed.
+        :return: The sequence number of the latest frame, which is still `after` if the wait timed out or the ring
+            was closed.
+        """
+
+        if self.latest > after or self.closed:
+            return self.latest
+        if self.condition is None:
+            # Rings attached by name have no condition to wait on, poll instead
+            deadline = None if timeout is None else time.perf_counter() + timeout
+            while self.latest <= after and not self.closed and (deadline is None or time.perf_counter() < deadline):
+                time.sleep(0.001)
+            return self.latest
+        with self.condition:
+            self.condition.wait_for(lambda: self.latest > after or self.closed, timeout)
+        return self.latest
+
+    def close_writer(self):
+        """Tells the readers no more frames will be written."""
+
+        self.header[HEADER_CLOSED] = 1
+        if self.condition is not None:
+            with self.condition:
+                self.condition.notify_all()
+
+    def close(self):
+        """Detaches from the shared memory, and frees it if this process created the ring."""
+
+        if self.shm is None:
+            return
+        # The views must be released before the shared memory can be closed
+        self.header = self.sequence_numbers = self.timestamps = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+    def __getstate__(self) -> dict:
+        # Only the name travels to the other process, which attaches to the same memory
+        return {"name": self.name, "condition": self.condition}
+
+    def __setstate__(self, state: dict):
+        self.__init__(name=state["name"])
+        self.condition = state["condition"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _frames_offset(slots: int) -> int:
+        header_size = (HEADER_FIELDS + 2 * slots) * 8
+        return -(-header_size // FRAME_ALIGNMENT) * FRAME_ALIGNMENT
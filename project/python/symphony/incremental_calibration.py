@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import os
+import argparse
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+
+from . import instrumentation
+from .camera_calibration import MIN_CHARUCO_CORNERS, SNAPSHOT_EXTENSION, create_charuco_board, create_charuco_detector, detect_charuco, parse_resolution, save_calibration
+from .lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+# Maximum number of views kept for calibration, the worst one, which may be the new one, is dropped when exceeded
+MAX_VIEWS = 40
+# Number of views needed before the first calibration
+MIN_VIEWS = 5
+# A view is a near-duplicate of a kept view if it shares this fraction of its corners with it...
+DUPLICATE_OVERLAP = 0.8
+# ...and these corners moved less than this on average, relative to the image diagonal
+DUPLICATE_DISTANCE = 0.02
+# The calibration has converged when the focal lengths and principal point changed less than this (relative)...
+CONVERGENCE_TOLERANCE = 0.005
+# ...over this many consecutive calibrations
+CONVERGENCE_SOLVES = 3
+# Interval between two checks of a watched directory for new snapshots, in seconds
+POLL_INTERVAL = 0.5
+
+class CalibrationUpdate(NamedTuple):
+    """Result of adding a view to an `IncrementalCalibrator`.
+
+    - accepted: Whether the view was kept.
+    - reason: Why the view was rejected, empty if it was accepted.
+    - views: The number of views kept.
+    - view_error: The RMS reprojection error of the new view in pixels, None if rejected before calibrating or not
+      calibrated yet.
+    - rms: The overall RMS reprojection error in pixels, None if not calibrated yet.
+    - solve_time: The time the calibration took in seconds, 0 if it didn't run.
+    """
+
+    accepted: bool
+    reason: str
+    views: int
+    view_error: float | None
+    rms: float | None
+    solve_time: float
+
+class CalibrationView:
+    """ChArUco corners of a kept view and their RMS reprojection error of the last calibration."""
+
+    __slots__ = ("charuco_corners", "charuco_ids", "error")
+
+    def __init__(self, charuco_corners: np.ndarray, charuco_ids: np.ndarray):
+        self.charuco_corners = charuco_corners
+        self.charuco_ids = charuco_ids
+        self.error = None
+
+class IncrementalCalibrator:
+    """Calibrates the camera while views come in, instead of once after all snapshots were taken.
+
+    Near-duplicate views don't add information but make every calibration slower, so they are rejected. At most
+    `max_views` views are kept, when full the new view is calibrated with the others and the view with the largest
+    reprojection error is dropped, which may be the new one.
+    Every calibration starts from the previous camera matrix and distortion coefficients, so it only has to refine
+    them and converges in a few iterations.
+    """
+
+    def __init__(self, board: cv2.aruco.CharucoBoard, image_size: tuple[int, int], max_views: int = MAX_VIEWS, min_views: int = MIN_VIEWS):
+        """
+        :param board: The ChArUco board the views show.
+        :param image_size: The (width, height) of the views.
+        :param max_views: The maximum number of views kept. Default is MAX_VIEWS.
+        :param min_views: The number of views needed before the first calibration. Default is MIN_VIEWS.
+        """
+
+        self.board = board
+        self.image_size = tuple(image_size)
+        self.max_views = max_views
+        self.min_views = min_views
+        self.views = []
+        self.camera_matrix = None
+        self.dist_coeffs = None
+        self.rvecs = ()
+        self.tvecs = ()
+        self.rms = None
+        self._duplicate_distance = DUPLICATE_DISTANCE * float(np.hypot(*self.image_size))
+        # Focal lengths and principal point of the last calibrations, to detect convergence
+        self._history = []
+
+    @property
+    def converged(self) -> bool:
+        if len(self._history) <= CONVERGENCE_SOLVES:
+            return False
+        recent = np.array(self._history[-CONVERGENCE_SOLVES - 1:])
+        change = np.abs(np.diff(recent, axis=0)) / np.abs(recent[1:])
+        return bool(change.max() < CONVERGENCE_TOLERANCE)
+
+    def add_view(self, charuco_corners: np.ndarray | None, charuco_ids: np.ndarray | None) -> CalibrationUpdate:
+        """Keeps the view if it adds information and recalibrates.
+
+        :param charuco_corners: The ChArUco corners detected in the view, as returned by `detect_charuco`.
+        :param charuco_ids: The ChArUco IDs detected in the view.
+        :return: Whether the view was kept and the reprojection errors after recalibrating.
+        """
+
+        if charuco_ids is None or len(charuco_ids) <= MIN_CHARUCO_CORNERS:
+            return self._rejected(f"only {0 if charuco_ids is None else len(charuco_ids)} ChArUco corners")
+        duplicate = self._find_duplicate(charuco_corners, charuco_ids)
+        if duplicate is not None:
+            return self._rejected(f"near-duplicate of view {duplicate}")
+
+        view = CalibrationView(charuco_corners, charuco_ids)
+        self.views.append(view)
+        if len(self.views) < self.min_views:
+            return CalibrationUpdate(True, "", len(self.views), None, None, 0.0)
+
+        try:
+            solve_time = self.calibrate()
+        except cv2.error:
+            # The view made the calibration diverge, go back to the views before it
+            self.views.pop()
+            return self._rejected("calibration diverged")
+        if len(self.views) > self.max_views:
+            worst = max(range(len(self.views)), key=lambda i: self.views[i].error)
+            self._evict(worst)
+            if self.views[-1] is not view:
+                return CalibrationUpdate(False, f"largest reprojection error of all views, {view.error:.3f} px", len(self.views), view.error, self.rms, solve_time)
+        return CalibrationUpdate(True, "", len(self.views), view.error, self.rms, solve_time)
+
+    def calibrate(self) -> float:
+        """Calibrates the camera with all kept views, starting from the previous result.
+
+        :return: The time the calibration took in seconds.
+        :raises cv2.error: If the views can't be calibrated.
+        """
+
+        start = time.perf_counter()
+        corners = [view.charuco_corners for view in self.views]
+        ids = [view.charuco_ids for view in self.views]
+        with instrumentation.span("calibrate"):
+            result = None
+            if self.camera_matrix is not None:
+                try:
+                    result = cv2.aruco.calibrateCameraCharucoExtended(corners, ids, self.board, self.image_size, self.camera_matrix.copy(), self.dist_coeffs.copy(), flags=cv2.CALIB_USE_INTRINSIC_GUESS)
+                except cv2.error:
+                    # A warm start can run out of the image when a view changes the estimate a lot, start from scratch instead
+                    instrumentation.count("calibrations.cold")
+            if result is None:
+                result = cv2.aruco.calibrateCameraCharucoExtended(corners, ids, self.board, self.image_size, None, None)
+        rms, camera_matrix, dist_coeffs, rvecs, tvecs, _, _, view_errors = result
+
+        self.rms = float(rms)
+        self.camera_matrix, self.dist_coeffs = camera_matrix, dist_coeffs
+        self.rvecs, self.tvecs = rvecs, tvecs
+        for view, error in zip(self.views, view_errors.ravel()):
+            view.error = float(error)
+        self._history.append((camera_matrix[0, 0], camera_matrix[1, 1], camera_matrix[0, 2], camera_matrix[1, 2]))
+        return time.perf_counter() - start
+
+    def _evict(self, index: int):
+        # The intrinsics stay those of the calibration with the view, the next calibration starts from them without it
+        del self.views[index]
+        self.rvecs = self.rvecs[:index] + self.rvecs[index + 1:]
+        self.tvecs = self.tvecs[:index] + self.tvecs[index + 1:]
+
+    def _find_duplicate(self, charuco_corners: np.ndarray, charuco_ids: np.ndarray) -> int | None:
+        ids = charuco_ids.ravel()
+        for index, view in enumerate(self.views):
+            shared, new_indices, kept_indices = np.intersect1d(ids, view.charuco_ids.ravel(), return_indices=True)
+            if len(shared) < DUPLICATE_OVERLAP * len(ids):
+                continue
+            displacement = np.linalg.norm(charuco_corners.reshape(-1, 2)[new_indices] - view.charuco_corners.reshape(-1, 2)[kept_indices], axis=1)
+            if displacement.mean() < self._duplicate_distance:
+                return index
+        return None
+
+    def _rejected(self, reason: str) -> CalibrationUpdate:
+        return CalibrationUpdate(False, reason, len(self.views), None, self.rms, 0.0)
+
+def watch_directory(directory: str, poll_interval: float = POLL_INTERVAL, idle_timeout: float | None = None) -> Iterator[str]:
+    """Yields the snapshots in a directory, including the ones added while watching.
+
+    A new file is only yielded once its size didn't change between two checks, so snapshots that are still being
+    written are not read half-way.
+
+    :param directory: The directory to watch.
+    :param poll_interval: The interval between two checks for new files in seconds. Default is POLL_INTERVAL.
+    :param idle_timeout: Stop after this many seconds without a new snapshot. None watches forever.
+    :return: The paths of the snapshots, in the order they appeared.
+    """
+
+    seen = set()
+    pending = {}
+    # Snapshots that were already there when watching started are complete
+    first_scan = True
+    last_new = time.perf_counter()
+    while True:
+        ready = []
+        for entry in os.scandir(directory):
+            if not entry.is_file() or not entry.name.endswith(SNAPSHOT_EXTENSION) or entry.name in seen:
+                continue
+            size = entry.stat().st_size
+            if first_scan or pending.get(entry.name) == size:
+                ready.append(entry.name)
+            else:
+                pending[entry.name] = size
+        first_scan = False
+        for name in sorted(ready):
+            seen.add(name)
+            pending.pop(name, None)
+            last_new = time.perf_counter()
+            yield os.path.join(directory, name)
+        if idle_timeout is not None and time.perf_counter() - last_new > idle_timeout:
+            return
+        time.sleep(poll_interval)
+
+def capture_frames(source: int | str, every: int = 1) -> Iterator[np.ndarray]:
+    """Yields grayscale frames from a camera or video.
+
+    Every frame is captured and converted into the same two buffers, so a frame is only valid until the next one is
+    requested. Copy it to keep it.
+
+    :param source: The camera index or video file/stream.
+    :param every: Only yield every n-th frame. Default is 1.
+    :return: The frames.
+    """
+
+    capture = cv2.VideoCapture(source)
+    frame = gray = None
+    try:
+        index = 0
+        while True:
+            with instrumentation.span("capture"):
+                success, frame = capture.read(frame)
+            if not success:
+                return
+            index += 1
+            if index % every == 0:
+                with instrumentation.span("grayscale"):
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray) if frame.ndim == 3 else frame
+                yield gray
+    finally:
+        capture.release()
+
+def calibrate_stream(frames: Iterable[np.ndarray | str], max_views: int = MAX_VIEWS, min_views: int = MIN_VIEWS, stop_when_converged: bool = True) -> Iterator[tuple[str, CalibrationUpdate, IncrementalCalibrator]]:
+    """Detects the ChArUco board in every frame and calibrates the camera while the frames come in.
+
+    :param frames: Grayscale frames, or paths of snapshots to read.
+    :param max_views: The maximum number of views kept. Default is MAX_VIEWS.
+    :param min_views: The number of views needed before the first calibration. Default is MIN_VIEWS.
+    :param stop_when_converged: If True, stops as soon as the calibration converged. Default is True.
+    :return: The name of every frame, the update it caused and the calibrator.
+    """
+
+    board = create_charuco_board()
+    detector = create_charuco_detector(board)
+    calibrator = None
+    for index, frame in enumerate(frames):
+        name = f"frame {index}"
+        if isinstance(frame, str):
+            name = os.path.basename(frame)
+            with instrumentation.span("decode"):
+                frame = cv2.imread(frame, cv2.IMREAD_GRAYSCALE)
+            if frame is None:
+                print(f"Could not read image {name}. Skipping.")
+                continue
+
+        image_size = (frame.shape[1], frame.shape[0])
+        if calibrator is None:
+            calibrator = IncrementalCalibrator(board, image_size, max_views, min_views)
+        elif image_size != calibrator.image_size:
+            print(f"{name} has a different resolution {image_size} than {calibrator.image_size}. Skipping.")
+            continue
+
+        charuco_corners, charuco_ids, _ = detect_charuco(frame, board, detector)
+        yield name, calibrator.add_view(charuco_corners, charuco_ids), calibrator
+        if stop_when_converged and calibrator.converged:
+            return
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Calibrate the camera while ChArUco board snapshots are taken.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--watch", metavar="DIR", help="calibrate from the snapshots in this directory, including the ones added while running")
+    source.add_argument("--source", help="calibrate from the frames of this camera index or video file")
+    parser.add_argument("--every", type=int, default=1, help="only use every n-th camera frame (default: 1)")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="stop watching after this many seconds without a new snapshot (default: never)")
+    parser.add_argument("--max-views", type=int, default=MAX_VIEWS, help=f"maximum number of views kept (default: {MAX_VIEWS})")
+    parser.add_argument("--keep-going", action="store_true", help="don't stop when the calibration converged")
+    parser.add_argument("--resolution", type=parse_resolution, default=None, help="WIDTHxHEIGHT to precompute the undistortion maps for (default: snapshot resolution)")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.watch is not None:
+        if not os.path.isdir(args.watch):
+            print(f": [Error] '{args.watch}' is not a directory.")
+            sys.exit(2)
+        frames = watch_directory(args.watch, idle_timeout=args.idle_timeout)
+    else:
+        frames = capture_frames(int(args.source) if args.source.isdigit() else args.source, args.every)
+
+    print("[STARTED] Calibrating. Press Ctrl+C to stop and save.")
+    start = time.perf_counter()
+    calibrator = None
+    with instrumentation.session(args.stats, args.trace, args.profile):
+        try:
+            for name, update, calibrator in calibrate_stream(frames, args.max_views, stop_when_converged=not args.keep_going):
+                if not update.accepted:
+                    print(f"{name}: Rejected, {update.reason}.")
+                elif update.rms is None:
+                    print(f"{name}: Accepted, {update.views}/{calibrator.min_views} views before calibrating.")
+                else:
+                    print(f"{name}: Accepted, view error {update.view_error:.3f} px, overall RMS {update.rms:.3f} px over {update.views} views (solved in {update.solve_time * 1000:.0f} ms).")
+        except KeyboardInterrupt:
+            pass
+
+    if calibrator is None or calibrator.camera_matrix is None:
+        print("[FAILED] Not enough views to calibrate.")
+        sys.exit(1)
+    save_calibration(calibrator.camera_matrix, calibrator.dist_coeffs, calibrator.image_size, calibrator.rvecs, calibrator.tvecs, os.getcwd(), args.resolution,
+                     [view.charuco_corners for view in calibrator.views], [view.charuco_ids for view in calibrator.views], calibrator.rms)
+    state = "converged" if calibrator.converged else "stopped"
+    print(f"[DONE] Calibration {state} after {time.perf_counter() - start:.1f}s with {len(calibrator.views)} views, RMS {calibrator.rms:.3f} px.")
+
+if __name__ == "__main__":
+    main()
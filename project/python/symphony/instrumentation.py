@@ -0,0 +1,315 @@
+import os
+import argparse
+import contextlib
+import glob
+import json
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+
+# CONSTANTS
+# Maximum number of spans kept per process for the trace, later spans only go into the histograms
+MAX_TRACE_EVENTS = 500_000
+# Histogram resolution: every power of two is split into this many buckets (4 => percentiles at most 25% high)
+SUB_BUCKETS = 4
+# Number of functions printed from a profile
+PROFILE_LINES = 20
+
+class Histogram:
+    """Durations in nanoseconds, bucketed logarithmically so recording is O(1) and memory is fixed."""
+
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.buckets = {}
+
+    def record(self, duration_ns: int):
+        self.count += 1
+        self.total += duration_ns
+        if self.min is None or duration_ns < self.min:
+            self.min = duration_ns
+        if duration_ns > self.max:
+            self.max = duration_ns
+        bucket = self._bucket(duration_ns)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other: "Histogram"):
+        if other.count == 0:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def percentile(self, percent: float) -> int:
+        """Returns the upper bound of the bucket holding the given percentile, in nanoseconds."""
+
+        if self.count == 0:
+            return 0
+        rank = percent / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self._upper_bound(bucket), self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "total_ms": self.total / 1e6,
+            "mean_ms": self.total / self.count / 1e6 if self.count > 0 else 0.0,
+            "min_ms": (self.min or 0) / 1e6,
+            "p50_ms": self.percentile(50) / 1e6,
+            "p99_ms": self.percentile(99) / 1e6,
+            "max_ms": self.max / 1e6,
+        }
+
+    @staticmethod
+    def _bucket(duration_ns: int) -> int:
+        # The top bits of the duration: the power of two and the sub-bucket within it
+        bits = duration_ns.bit_length()
+        if bits <= SUB_BUCKETS.bit_length():
+            return duration_ns
+        shift = bits - SUB_BUCKETS.bit_length()
+        return (shift << 8) | (duration_ns >> shift)
+
+    @staticmethod
+    def _upper_bound(bucket: int) -> int:
+        shift, top = bucket >> 8, bucket & 0xFF
+        return ((top + 1) << shift) - 1
+
+class Span:
+    """Times a block and records it under its name, see `span`."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, self.start, time.perf_counter_ns())
+
+class NullSpan:
+    """Span that does nothing, returned while instrumentation is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NULL_SPAN = NullSpan()
+
+# Instrumentation state of this process, set by `enable`
+_state = {
+    "enabled": False,
+    "trace": False,
+    "parts_dir": None,
+    "histograms": {},
+    "counters": {},
+    "events": [],
+    "dropped_events": 0,
+}
+_lock = threading.Lock()
+
+def span(name: str) -> Span | NullSpan:
+    """Times the `with` block as a span called `name`.
+
+    While instrumentation is disabled this returns a shared no-op span, so leaving spans in hot paths costs a
+    function call and a dictionary lookup.
+
+    :param name: The name of the span, e.g. 'detect'.
+    :return: The context manager timing the block.
+    """
+
+    return Span(name) if _state["enabled"] else NULL_SPAN
+
+def record(name: str, start_ns: int, end_ns: int):
+    duration = end_ns - start_ns
+    with _lock:
+        histogram = _state["histograms"].get(name)
+        if histogram is None:
+            histogram = _state["histograms"][name] = Histogram()
+        histogram.record(duration)
+        if _state["trace"]:
+            if len(_state["events"]) < MAX_TRACE_EVENTS:
+                _state["events"].append((name, start_ns, duration, os.getpid(), threading.get_ident()))
+            else:
+                _state["dropped_events"] += 1
+
+def count(name: str, value: int = 1):
+    """Adds to a counter, e.g. the number of markers written. Does nothing while instrumentation is disabled."""
+
+    if _state["enabled"]:
+        with _lock:
+            _state["counters"][name] = _state["counters"].get(name, 0) + value
+
+def enabled() -> bool:
+    return _state["enabled"]
+
+def enable(trace: bool = False):
+    """Starts recording spans and counters in this process and in worker processes initialized with `init_worker`.
+
+    :param trace: If True, every span is kept for `export`, not only the histograms. Default is False.
+    """
+
+    _state.update(enabled=True, trace=trace, histograms={}, counters={}, events=[], dropped_events=0)
+    if _state["parts_dir"] is None:
+        # Worker processes leave their recordings here when they exit
+        _state["parts_dir"] = tempfile.mkdtemp(prefix="instrumentation-")
+
+def disable():
+    _state["enabled"] = False
+    if _state["parts_dir"] is not None:
+        shutil.rmtree(_state["parts_dir"], ignore_errors=True)
+        _state["parts_dir"] = None
+
+def worker_settings() -> tuple[str, bool] | None:
+    """Returns what `init_worker` needs to instrument a worker process, or None if instrumentation is disabled."""
+
+    return (_state["parts_dir"], _state["trace"]) if _state["enabled"] else None
+
+def init_worker(settings: tuple[str, bool] | None):
+    """Enables instrumentation in a worker process, which hands its recordings to the parent when it exits.
+
+    :param settings: The settings returned by `worker_settings` in the parent process.
+    """
+
+    if settings is None:
+        return
+    parts_dir, trace = settings
+    _state.update(enabled=True, trace=trace, parts_dir=parts_dir, histograms={}, counters={}, events=[], dropped_events=0)
+    # Finalizers also run when a pool worker exits, unlike atexit handlers
+    from multiprocessing import util as multiprocessing_util
+    multiprocessing_util.Finalize(None, _write_part, exitpriority=10)
+
+def _write_part():
+    with open(os.path.join(_state["parts_dir"], f"{os.getpid()}.part"), "wb") as part_file:
+        pickle.dump({key: _state[key] for key in ("histograms", "counters", "events", "dropped_events")}, part_file)
+
+def collect() -> dict:
+    """Merges the recordings of all worker processes that exited into this process.
+
+    :return: The histograms, counters, trace events and number of dropped events.
+    """
+
+    parts = glob.glob(os.path.join(_state["parts_dir"], "*.part")) if _state["parts_dir"] is not None else []
+    with _lock:
+        for path in parts:
+            try:
+                with open(path, "rb") as part_file:
+                    part = pickle.load(part_file)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                continue
+            finally:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+            for name, histogram in part["histograms"].items():
+                _state["histograms"].setdefault(name, Histogram()).merge(histogram)
+            for name, value in part["counters"].items():
+                _state["counters"][name] = _state["counters"].get(name, 0) + value
+            _state["events"].extend(part["events"])
+            _state["dropped_events"] += part["dropped_events"]
+        return {key: _state[key] for key in ("histograms", "counters", "events", "dropped_events")}
+
+def summary() -> dict:
+    recordings = collect()
+    return {
+        "spans": {name: histogram.as_dict() for name, histogram in sorted(recordings["histograms"].items())},
+        "counters": dict(sorted(recordings["counters"].items())),
+        "dropped_events": recordings["dropped_events"],
+    }
+
+def print_summary():
+    stats = summary()
+    if len(stats["spans"]) == 0 and len(stats["counters"]) == 0:
+        print("[INFO] No spans recorded.")
+        return
+    if len(stats["spans"]) > 0:
+        print("[INFO] Time spent per span:")
+    for name, span_stats in sorted(stats["spans"].items(), key=lambda item: -item[1]["total_ms"]):
+        print(f": {name:<16} {span_stats["count"]:>8}x  total {span_stats["total_ms"]:10.1f} ms  mean {span_stats["mean_ms"]:8.3f} ms  p50 {span_stats["p50_ms"]:8.3f} ms  p99 {span_stats["p99_ms"]:8.3f} ms")
+    if len(stats["counters"]) > 0:
+        print("[INFO] Counters:")
+    for name, value in stats["counters"].items():
+        print(f": {name:<16} {value:>8}")
+
+def export(path: str):
+    """Writes the recorded spans to a file.
+
+    Files ending in '.jsonl' get one JSON object per span followed by the summary, everything else is written as a
+    Chrome trace, which can be opened in chrome://tracing or https://ui.perfetto.dev.
+
+    :param path: The path of the file.
+    """
+
+    recordings = collect()
+    stats = summary()
+    events = sorted(recordings["events"], key=lambda event: event[1])
+    origin = events[0][1] if len(events) > 0 else 0
+    with open(path, "w") as export_file:
+        if path.endswith(".jsonl"):
+            for name, start_ns, duration_ns, pid, tid in events:
+                export_file.write(json.dumps({"span": name, "start_us": (start_ns - origin) / 1000, "duration_us": duration_ns / 1000, "pid": pid, "tid": tid}) + "\n")
+            export_file.write(json.dumps({"summary": stats}) + "\n")
+        else:
+            trace_events = [{"name": name, "ph": "X", "ts": (start_ns - origin) / 1000, "dur": duration_ns / 1000, "pid": pid, "tid": tid} for name, start_ns, duration_ns, pid, tid in events]
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms", "otherData": stats}, export_file)
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the --stats, --trace and --profile options of `session` to a command line parser."""
+
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--stats", action="store_true", help="time the hot paths and print where the time went")
+    group.add_argument("--trace", metavar="PATH", default=None, help="also write every timed span to PATH, as Chrome trace JSON or as a structured log if PATH ends in .jsonl")
+    group.add_argument("--profile", metavar="PATH", default=None, help="profile the main process with cProfile and save the stats to PATH")
+
+@contextlib.contextmanager
+def session(stats: bool = False, trace: str | None = None, profile: str | None = None) -> Iterator[None]:
+    """Instruments and/or profiles the `with` block, then reports the results.
+
+    :param stats: If True, prints the time spent per span and the counters afterwards.
+    :param trace: If set, writes every span to this path afterwards (see `export`).
+    :param profile: If set, profiles the block with cProfile, saves the stats to this path and prints the top functions.
+        Only the main process is profiled, to profile worker processes as well use py-spy with --subprocesses.
+    """
+
+    if stats or trace is not None:
+        enable(trace=trace is not None)
+    profiler = None
+    if profile is not None:
+        # Imported here, so only profiled runs pay for importing the profiler
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+            print(f"[INFO] Profile written to {profile}.")
+            pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_LINES)
+        if enabled():
+            if trace is not None:
+                export(trace)
+                print(f"[INFO] Trace written to {trace}.")
+            print_summary()
+            disable()
@@ -0,0 +1,28 @@
+import importlib.util
+import sys
+import types
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Imports a module on first attribute access instead of right away.
+
+    OpenCV and numpy take most of the startup time, so the modules bind them with this and commands like `--help`
+    never load them. The module is imported as usual once one of its attributes is used, and is shared with every
+    regular `import` of it from then on.
+
+    :param name: The name of the module, e.g. "cv2".
+    :return: The module, or a placeholder that loads it on first use.
+    :raises ModuleNotFoundError: If the module is not installed.
+    """
+
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from collections.abc import Callable
+
+from . import instrumentation
+
+# CONSTANTS
+# Default upper bound for the in-memory part of the cache, in bytes
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+class MarkerCache:
+    """Content-addressed cache of encoded marker images.
+
+    Entries are stored on disk as '<cache_dir>/<key[:2]>/<key><extension>' so they survive between runs and are
+    shared between worker processes, and the most recently used entries are kept in an in-memory LRU that is bounded
+    by the total size of the cached images.
+    """
+
+    def __init__(self, cache_dir: str, extension: str, memory_limit: int = DEFAULT_MEMORY_LIMIT):
+        """
+        :param cache_dir: The directory to store the cached images in. Created on the first write.
+        :param extension: The file extension of the cached images, e.g. '.jpg'.
+        :param memory_limit: The maximum total size of the images kept in memory, in bytes.
+        """
+
+        self.cache_dir = cache_dir
+        self.extension = extension
+        self.memory_limit = memory_limit
+        self._memory = OrderedDict()
+        self._memory_size = 0
+
+    @staticmethod
+    def key(marker_bits: bytes, marker_size_px: int, inverted: bool, border_thickness: int, extension: str) -> str:
+        """Computes the cache key of a marker image.
+
+        :param marker_bits: The marker's bits as stored in the dictionary, including the marker dimension.
+        :param marker_size_px: The size of the marker image in pixels.
+        :param inverted: Whether the marker image is inverted.
+        :param border_thickness: The thickness of the additional border.
+        :param extension: The file extension, which determines the image encoding.
+        :return: The hex digest identifying the encoded image.
+        """
+
+        digest = hashlib.sha256(marker_bits)
+        digest.update(f":{marker_size_px}:{int(inverted)}:{border_thickness}:{extension.lower()}".encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}{self.extension}")
+
+    def get(self, key: str) -> bytes | None:
+        """Looks up an encoded image in memory first and on disk second.
+
+        :param key: The cache key as returned by `MarkerCache.key`.
+        :return: The encoded image, or None if it is not cached.
+        """
+
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            return data
+        try:
+            with open(self.path(key), "rb") as cached_file:
+                data = cached_file.read()
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Stores an encoded image in memory and on disk.
+
+        The file is written to a temporary name first and then moved into place, so concurrent writers never
+        leave a partially written entry behind.
+
+        :param key: The cache key as returned by `MarkerCache.key`.
+        :param data: The encoded image.
+        """
+
+        self._remember(key, data)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The cache is an optimization, failing to persist an entry must not fail the generation
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        """Returns the cached image for the key, rendering and caching it first if needed.
+
+        :param key: The cache key as returned by `MarkerCache.key`.
+        :param render: Produces the encoded image on a cache miss.
+        :return: The encoded image.
+        """
+
+        data = self.get(key)
+        if data is None:
+            instrumentation.count("cache.misses")
+            data = render()
+            self.put(key, data)
+        else:
+            instrumentation.count("cache.hits")
+        return data
+
+    def matches(self, key: str, filepath: str, render: Callable[[], bytes]) -> bool:
+        """Checks whether the file at the given path holds exactly the image identified by the key.
+
+        :param key: The cache key as returned by `MarkerCache.key`.
+        :param filepath: The path of the file to compare.
+        :param render: Produces the encoded image on a cache miss.
+        :return: True if the file content is identical to the cached image, False otherwise.
+        """
+
+        data = self.get_or_render(key, render)
+        try:
+            if os.path.getsize(filepath) != len(data):
+                return False
+            with open(filepath, "rb") as existing_file:
+                return existing_file.read() == data
+        except OSError:
+            return False
+
+    def _remember(self, key: str, data: bytes):
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_size += len(data)
+        # Evict the least recently used entries until we are within the memory limit again
+        while self._memory_size > self.memory_limit and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
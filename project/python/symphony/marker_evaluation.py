@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import os
+import argparse
+import itertools
+import json
+import sys
+import time
+from typing import NamedTuple
+
+from .benchmarks import IMAGE_SIZE, degrade_view, synthetic_camera
+from .camera_calibration import create_detector_parameters
+from .lazy import lazy_import
+from .marker_generation import ARUCO_DICTIONARY_ATTRIBS, aruco_dictionaries, generate_marker_images, get_dictionary, spread_marker_ids
+from .marker_sheet import MM_PER_INCH
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+futures = lazy_import("concurrent.futures")
+
+# CONSTANTS
+# Resolution the generated markers are printed at, which turns their size in pixels into a physical size
+PRINT_DPI = 300
+# Markers per simulated frame, laid out in a grid on the table
+MARKERS_PER_FRAME = 6
+MARKER_COLUMNS = 3
+# Grey level of the table around the markers
+BACKGROUND_GREY = 150
+# Simulated conditions: distance between camera and markers in meters, tilt of the markers in degrees, blur in
+# pixels and sensor noise in grey levels
+DISTANCES = (0.4, 0.7, 1.0)
+ANGLES = (0, 45)
+BLUR_SIGMAS = (0.5, 2.0)
+NOISE_SIGMAS = (4.0, 12.0)
+# A configuration is reliable if it finds at least this fraction of the markers and never reports a wrong ID
+RELIABLE_DETECTION_RATE = 0.99
+# Detection times that differ less than this (relative) count as equally fast
+SAME_SPEED_TOLERANCE = 0.05
+
+class Condition(NamedTuple):
+    """Simulated camera condition a frame is rendered with."""
+
+    distance: float
+    angle: float
+    blur_sigma: float
+    noise_sigma: float
+
+class EvaluationResult(NamedTuple):
+    """Detection robustness of one marker configuration over all simulated conditions.
+
+    - dictionary: The name of the ArUco dictionary.
+    - marker_size_px: The size the markers were generated at.
+    - border_thickness: The additional border around the markers in pixels.
+    - inverted: Whether the markers are inverted.
+    - bits: The number of bits per marker side.
+    - capacity: The number of markers in the dictionary.
+    - detection_rate: The fraction of markers found with the right ID.
+    - false_id_rate: The fraction of detections with an ID that is not at that position.
+    - detection_ms: The mean detection time per frame in milliseconds.
+    - worst_condition: The condition with the lowest detection rate.
+    - worst_detection_rate: The detection rate in that condition.
+    """
+
+    dictionary: str
+    marker_size_px: int
+    border_thickness: int
+    inverted: bool
+    bits: int
+    capacity: int
+    detection_rate: float
+    false_id_rate: float
+    detection_ms: float
+    worst_condition: Condition
+    worst_detection_rate: float
+
+    @property
+    def reliable(self) -> bool:
+        return self.detection_rate >= RELIABLE_DETECTION_RATE and self.false_id_rate == 0
+
+def dictionary_names() -> dict[int, str]:
+    # ArUco dictionary IDs to their names, e.g. cv2.aruco.DICT_5X5_50 -> 'DICT_5X5_50'
+    return {getattr(cv2.aruco, name): name for name in ARUCO_DICTIONARY_ATTRIBS}
+
+def render_marker_plane(dict: int, marker_ids: list[int], marker_size_px: int, inverted: bool, border_thickness: int) -> tuple[np.ndarray, np.ndarray]:
+    """Lays out the markers in a grid, the way they would be printed.
+
+    :param dict: The ArUco dictionary ID.
+    :param marker_ids: The IDs of the markers.
+    :param marker_size_px: The size the markers are generated at.
+    :param inverted: Whether the markers are inverted.
+    :param border_thickness: The additional border around the markers in pixels.
+    :return: The image of the printed markers and the centre of every marker in it.
+    """
+
+    markers = generate_marker_images(get_dictionary(dict), marker_ids, marker_size_px, inverted, border_thickness)
+    size = markers.shape[1]
+    # Leave a marker's size of table between the markers, so they can't be detected as one
+    pitch = size * 2
+    rows = -(-len(marker_ids) // MARKER_COLUMNS)
+    plane = np.full((rows * pitch, MARKER_COLUMNS * pitch), BACKGROUND_GREY, dtype=np.uint8)
+    centres = []
+    for index, marker in enumerate(markers):
+        row, column = divmod(index, MARKER_COLUMNS)
+        y, x = row * pitch + size // 2, column * pitch + size // 2
+        plane[y:y + size, x:x + size] = marker
+        centres.append((x + size / 2, y + size / 2))
+    return plane, np.array(centres, dtype=np.float32)
+
+def plane_homography(plane_shape: tuple[int, int], condition: Condition, camera_matrix: np.ndarray, rotation: float) -> np.ndarray:
+    # Printed pixels to meters, centred on the plane
+    metres_per_px = MM_PER_INCH / PRINT_DPI / 1000
+    height, width = plane_shape
+    plane_to_metres = np.array([[metres_per_px, 0, -width * metres_per_px / 2], [0, metres_per_px, -height * metres_per_px / 2], [0, 0, 1]])
+    # Tilt around the x-axis, then rotate in the plane, placed straight in front of the camera
+    tilt, _ = cv2.Rodrigues(np.array([np.radians(condition.angle), 0, 0]))
+    spin, _ = cv2.Rodrigues(np.array([0, 0, rotation]))
+    orientation = tilt @ spin
+    return camera_matrix @ np.column_stack((orientation[:, 0], orientation[:, 1], (0, 0, condition.distance))) @ plane_to_metres
+
+def evaluate_configuration(dict: int, marker_size_px: int, border_thickness: int, inverted: bool, conditions: list[Condition], seed: int = 0) -> EvaluationResult:
+    """Renders the markers of a configuration in every condition and detects them.
+
+    :param dict: The ArUco dictionary ID.
+    :param marker_size_px: The size the markers are generated at.
+    :param border_thickness: The additional border around the markers in pixels.
+    :param inverted: Whether the markers are inverted.
+    :param conditions: The simulated conditions.
+    :param seed: The seed of the in-plane rotation and noise. Default is 0.
+    :return: The detection robustness of the configuration.
+    """
+
+    rng = np.random.default_rng(seed)
+    camera_matrix, _ = synthetic_camera(IMAGE_SIZE)
+    capacity = aruco_dictionaries()[dict][1]
+    marker_ids = spread_marker_ids(capacity, MARKERS_PER_FRAME)
+    plane, centres = render_marker_plane(dict, marker_ids, marker_size_px, inverted, border_thickness)
+
+    parameters = create_detector_parameters()
+    parameters.detectInvertedMarker = inverted
+    aruco_dict = get_dictionary(dict)
+    detector = cv2.aruco.ArucoDetector(aruco_dict, parameters)
+
+    frame = np.empty((IMAGE_SIZE[1], IMAGE_SIZE[0]), dtype=np.uint8)
+    # The printed markers shrunk to about their size in the frame per distance, so the warp doesn't alias
+    shrunk_planes = {}
+    found_total = false_total = detected_total = 0
+    detection_time = 0.0
+    worst_condition, worst_rate = conditions[0], 1.0
+    for condition in conditions:
+        homography = plane_homography(plane.shape, condition, camera_matrix, rng.uniform(-np.pi, np.pi))
+        scale = min(camera_matrix[0, 0] * MM_PER_INCH / PRINT_DPI / 1000 / condition.distance, 1.0)
+        if condition.distance not in shrunk_planes:
+            shrunk_planes[condition.distance] = cv2.resize(plane, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        shrunk = shrunk_planes[condition.distance]
+        shrunk_to_plane = np.diag([plane.shape[1] / shrunk.shape[1], plane.shape[0] / shrunk.shape[0], 1.0])
+        cv2.warpPerspective(shrunk, homography @ shrunk_to_plane, IMAGE_SIZE, dst=frame, flags=cv2.INTER_LINEAR, borderValue=BACKGROUND_GREY)
+        gray = degrade_view(frame, rng, condition.blur_sigma, condition.noise_sigma)
+
+        start = time.perf_counter()
+        corners, ids, _ = detector.detectMarkers(gray)
+        detection_time += time.perf_counter() - start
+
+        # A detection is only right if it has the ID of the marker at its position
+        expected = cv2.perspectiveTransform(centres.reshape(-1, 1, 2), homography).reshape(-1, 2)
+        # Half a marker in the frame, measured from every marker's centre to the middle of its edge
+        edges = cv2.perspectiveTransform((centres + (marker_size_px / 2, 0)).reshape(-1, 1, 2), homography).reshape(-1, 2)
+        tolerances = np.linalg.norm(edges - expected, axis=1)
+        found = set()
+        if ids is not None:
+            for marker_corners, marker_id in zip(corners, ids.ravel()):
+                detected_total += 1
+                distances = np.linalg.norm(expected - marker_corners.reshape(4, 2).mean(axis=0), axis=1)
+                nearest = int(distances.argmin())
+                if marker_ids[nearest] == marker_id and distances[nearest] < tolerances[nearest] and nearest not in found:
+                    found.add(nearest)
+                else:
+                    false_total += 1
+        found_total += len(found)
+        rate = len(found) / len(marker_ids)
+        if rate < worst_rate:
+            worst_condition, worst_rate = condition, rate
+
+    return EvaluationResult(
+        dictionary_names()[dict], marker_size_px, border_thickness, inverted, aruco_dict.markerSize, capacity,
+        found_total / (len(marker_ids) * len(conditions)),
+        false_total / detected_total if detected_total > 0 else 0.0,
+        detection_time / len(conditions) * 1000,
+        worst_condition, worst_rate,
+    )
+
+def evaluate_job(job: tuple) -> EvaluationResult:
+    return evaluate_configuration(*job)
+
+def evaluate_dictionaries(dicts: list[int], marker_sizes: list[int], borders: list[int], inversions: list[bool], conditions: list[Condition], workers: int | None = None, seed: int = 0) -> list[EvaluationResult]:
+    """Evaluates every combination of dictionary, marker size, border and inversion in all conditions.
+
+    :param dicts: The ArUco dictionary IDs.
+    :param marker_sizes: The sizes the markers are generated at, in pixels.
+    :param borders: The additional border thicknesses in pixels.
+    :param inversions: Whether to evaluate normal and/or inverted markers.
+    :param conditions: The simulated conditions.
+    :param workers: The number of worker processes. Defaults to the number of CPUs, 1 evaluates in-process.
+    :param seed: The seed of the in-plane rotation and noise. Every configuration is rendered with the same seed.
+    :return: The results in the order of the combinations.
+    """
+
+    jobs = [(dict, size, border, inverted, conditions, seed) for dict, size, border, inverted in itertools.product(dicts, marker_sizes, borders, inversions)]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return [evaluate_job(job) for job in jobs]
+    with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(evaluate_job, jobs))
+
+def recommend(results: list[EvaluationResult], min_capacity: int) -> EvaluationResult | None:
+    """Picks the reliable configuration with the fastest detection that has enough markers.
+
+    :param results: The evaluation results.
+    :param min_capacity: The number of markers the dictionary must hold.
+    :return: The recommended configuration, or None if none is reliable.
+    """
+
+    candidates = [result for result in results if result.reliable and result.capacity >= min_capacity]
+    if len(candidates) == 0:
+        return None
+    # Detection times within a few percent are measurement noise, among those prefer fewer bits and smaller markers
+    fastest = min(result.detection_ms for result in candidates)
+    candidates = [result for result in candidates if result.detection_ms <= fastest * (1 + SAME_SPEED_TOLERANCE)]
+    return min(candidates, key=lambda result: (result.bits, result.marker_size_px + 2 * result.border_thickness, result.inverted))
+
+def parse_int_list(value: str) -> list[int]:
+    try:
+        return [int(item) for item in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid list '{value}', expected comma separated integers.")
+
+def parse_float_list(value: str) -> list[float]:
+    try:
+        return [float(item) for item in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid list '{value}', expected comma separated numbers.")
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Evaluate how reliably and how fast markers of every dictionary, size, border and inversion are detected under simulated camera conditions.")
+    parser.add_argument("--dicts", default=None, help="comma separated dictionary names (default: all)")
+    parser.add_argument("--sizes", type=parse_int_list, default=[210, 420], help=f"marker sizes in pixels, printed at {PRINT_DPI} DPI (default: 210,420)")
+    parser.add_argument("--borders", type=parse_int_list, default=[0, 40], help="additional border thicknesses in pixels (default: 0,40)")
+    parser.add_argument("--inversion", choices=["normal", "inverted", "both"], default="both", help="evaluate normal and/or inverted markers (default: both)")
+    parser.add_argument("--distances", type=parse_float_list, default=list(DISTANCES), help=f"camera distances in meters (default: {",".join(map(str, DISTANCES))})")
+    parser.add_argument("--angles", type=parse_float_list, default=list(ANGLES), help=f"marker tilts in degrees (default: {",".join(map(str, ANGLES))})")
+    parser.add_argument("--blur", type=parse_float_list, default=list(BLUR_SIGMAS), help=f"blur sigmas in pixels (default: {",".join(map(str, BLUR_SIGMAS))})")
+    parser.add_argument("--noise", type=parse_float_list, default=list(NOISE_SIGMAS), help=f"noise sigmas in grey levels (default: {",".join(map(str, NOISE_SIGMAS))})")
+    parser.add_argument("--min-markers", type=int, default=10, help="number of markers the dictionary must hold to be recommended (default: 10)")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--output", default=None, help="JSON file to write all results to")
+    args = parser.parse_args(argv)
+
+    names = dictionary_names()
+    if args.dicts is None:
+        dicts = list(aruco_dictionaries())
+    else:
+        dicts = [getattr(cv2.aruco, name, None) for name in args.dicts.split(",")]
+        if any(dict not in aruco_dictionaries() for dict in dicts):
+            print(f": [Error] Unknown ArUco dictionary in '{args.dicts}'.")
+            sys.exit(2)
+    inversions = {"normal": [False], "inverted": [True], "both": [False, True]}[args.inversion]
+    conditions = [Condition(*values) for values in itertools.product(args.distances, args.angles, args.blur, args.noise)]
+
+    configurations = len(dicts) * len(args.sizes) * len(args.borders) * len(inversions)
+    print(f"[STARTED] Evaluating {configurations} configurations in {len(conditions)} conditions.")
+    start = time.perf_counter()
+    results = evaluate_dictionaries(dicts, args.sizes, args.borders, inversions, conditions, args.workers)
+    print(f"[DONE] Evaluated in {time.perf_counter() - start:.1f}s.")
+
+    for result in sorted(results, key=lambda result: (not result.reliable, result.detection_ms)):
+        worst = result.worst_condition
+        print(f"{result.dictionary:<22} {result.marker_size_px:>4}px border {result.border_thickness:>3}{" inverted" if result.inverted else "         "}: "
+              f"detected {result.detection_rate * 100:5.1f}%, false IDs {result.false_id_rate * 100:4.1f}%, {result.detection_ms:5.1f} ms/frame"
+              f"{"" if result.worst_detection_rate == 1 else f", worst {result.worst_detection_rate * 100:.0f}% at {worst.distance} m / {worst.angle:g}° / blur {worst.blur_sigma} / noise {worst.noise_sigma}"}")
+
+    best = recommend(results, args.min_markers)
+    if best is None:
+        print(f": [Alert] No configuration with at least {args.min_markers} markers detected {RELIABLE_DETECTION_RATE * 100:g}% of the markers without false IDs.")
+    else:
+        print(f"[INFO] Recommended: {best.dictionary}, {best.marker_size_px}px, border {best.border_thickness}{", inverted" if best.inverted else ""} ({best.detection_ms:.1f} ms/frame, {best.detection_rate * 100:.1f}% detected).")
+
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump([{**result._asdict(), "worst_condition": result.worst_condition._asdict(), "reliable": result.reliable} for result in results], output_file, indent=4)
+        print(f"[DONE] Results written to {args.output}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,869 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import os
+import sys
+import time
+from collections.abc import Callable, Iterable
+from enum import IntEnum, StrEnum
+
+from . import instrumentation
+from .lazy import lazy_import
+from .marker_cache import MarkerCache
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+futures = lazy_import("concurrent.futures")
+
+# CONSTANTS
+# Directory to save generated markers to
+SAVE_DIR = "markers"
+# Existing ArUco dictionaries with their attributes dimension and capacity, by the name of their `cv2.aruco` constant.
+# Keyed by name so OpenCV isn't loaded on import, see `aruco_dictionaries` for the dictionary IDs
+ARUCO_DICTIONARY_ATTRIBS = {
+    "DICT_4X4_50": [4, 50],
+    "DICT_4X4_100": [4, 100],
+    "DICT_4X4_250": [4, 250],
+    "DICT_4X4_1000": [4, 1000],
+    "DICT_5X5_50": [5, 50],
+    "DICT_5X5_100": [5, 100],
+    "DICT_5X5_250": [5, 250],
+    "DICT_5X5_1000": [5, 1000],
+    "DICT_6X6_50": [6, 50],
+    "DICT_6X6_100": [6, 100],
+    "DICT_6X6_250": [6, 250],
+    "DICT_6X6_1000": [6, 1000],
+    "DICT_7X7_50": [7, 50],
+    "DICT_7X7_100": [7, 100],
+    "DICT_7X7_250": [7, 250],
+    "DICT_7X7_1000": [7, 1000],
+    "DICT_ARUCO_ORIGINAL": [4, 1024],
+    "DICT_APRILTAG_16H5": [4, 16],
+    "DICT_APRILTAG_25H9": [4, 25],
+    "DICT_APRILTAG_36H10": [4, 36],
+    "DICT_APRILTAG_36H11": [4, 36],
+}
+# filename: 'marker{marker_id}[_INV][_n].jpg'
+FILENAME_BASE = "marker"
+INVERTED_TAG = "_INV"
+FILE_EXTENSION = ".jpg"
+# Cache of rendered marker images, keyed by the marker's content, inside the save directory
+CACHE_DIR = ".cache"
+# Above this many markers, the per-marker result lines are left out of the output
+MAX_MARKER_LINES = 50
+
+class FileAction(IntEnum):
+    """Actions that can be performed when generating markers.
+
+    - CREATE: Generate a new marker image and save it.
+    - OVERWRITE: Overwrite an existing marker image.
+    - SKIP: Skip generating the current marker image.
+    - KEEP_BOTH: Generate a new marker image and save it as a new version of the original.
+    - DECIDE_PER_MARKER: Allow the user to decide for each marker whether to overwrite, skip, or keep both versions.
+    - UNCHANGED: Leave the existing marker image alone, it is identical to the one that would be generated.
+    """
+    
+    CREATE = 0
+    OVERWRITE = 1
+    SKIP = 2
+    KEEP_BOTH = 3
+    DECIDE_PER_MARKER = 4
+    UNCHANGED = 5
+
+class Operation(StrEnum):
+    """Operations that can be performed when generating markers in case of file conflicts.
+
+    - OVERWRITE: Overwrite an existing marker image.
+    - SKIP: Skip generating the current marker image.
+    - KEEP_BOTH: Generate a new marker image and save it as a new version of the original.
+    - DECIDE_PER_MARKER: Allow the user to decide for each marker whether to overwrite, skip, or keep both versions.
+    """
+    NO_OP = ""
+    OVERWRITE = "o"
+    SKIP = "s"
+    KEEP_BOTH = "k"
+    DECIDE_PER_MARKER = "d"
+
+def generate_marker_single(dict: int, marker_id: int, marker_size_px: int = 420, inverted: bool = False, border_thickness: int = 0):
+    """Generates a single ArUco marker image and saves it to the specified directory.
+
+    If the marker image already exists, the user is prompted to decide whether to overwrite it, skip it, or keep both versions.
+
+    :param dict: The ArUco dictionary to use for marker generation.
+    :param marker_id: The ID of the marker to generate.
+    :param marker_size_px: The size of the marker image in pixels. This should be a multiple of the marker's dimension. Default is 420.
+    :param inverted: If True, the marker image will be inverted (black on white + white border). Default is False.
+    :param border_thickness: The thickness of the border to add to the marker image. Default is 0 (no border).
+    :raises ValueError: If the marker ID is out of range for the specified dictionary.
+    :raises OSError: If the save directory cannot be created or is not a directory.
+    """
+
+    # Get the marker's dimension and the dictionary capacity
+    dict_attribs = get_dict_attribs(dict)
+    marker_dimension, dict_cap = dict_attribs if dict_attribs is not None else (0, 0)
+
+    # Run preliminary checks
+    can_run = prelim_check(dict_cap, marker_dimension, 1, marker_size_px)
+    if not can_run:
+        print("[FAILED] Generation aborted: Preliminary checks failed.")
+        return
+    print("[SUCCESS] Preliminary checks passed.")
+
+    # Check if the marker ID is within the valid range for the dictionary
+    if not (0 <= marker_id <= dict_cap):
+        print(f": [Error] Marker ID must be in the range 0 to {dict_cap}.")
+        print("[FAILED] Generation aborted: Marker ID out of range.")
+        return
+
+    # Get the ArUCo Dictionary object for the specified dictionary ID
+    aruco_dict = get_dictionary(dict)
+    # Generate the marker image
+    action = process_single_marker(aruco_dict, marker_id, marker_size_px, inverted, border_thickness)
+    # Inform the user about the action taken
+    match action:
+        case FileAction.CREATE:
+            print(f"[DONE] Marker {marker_id} generated and saved to directory '{SAVE_DIR}'.")
+        case FileAction.OVERWRITE:
+            print(f"[DONE] Marker {marker_id} overwritten.")
+        case FileAction.SKIP:
+            print("[DONE] File skipped. No image generated.")
+        case FileAction.KEEP_BOTH:
+            print(f"[DONE] Marker {marker_id} saved as a new file.")
+        case FileAction.UNCHANGED:
+            print(f"[DONE] Marker {marker_id} is up to date. No image generated.")
+
+def generate_marker_multi(dict: int, marker_count: int, marker_size_px: int = 420, inverted: bool = False, border_thickness: int = 0):
+    """Generates ArUco marker images in bulk and saves them to the specified directory.
+    
+    If the marker images already exist, the user is prompted to decide whether to overwrite all, skip all, keep both versions or decide per marker.
+    
+    :param dict: The ArUco dictionary to use for marker generation.
+    :param marker_count: The number of markers to generate.
+    :param marker_size_px: The size of the marker image in pixels. This should be a multiple of the marker's dimension. Default is 420.
+    :param inverted: If True, the marker image will be inverted (black on white + white border). Default is False.
+    :param border_thickness: The thickness of the border to add to the marker image. Default is 0 (no border).
+    """
+
+    # Get the marker's dimension and the dictionary capacity
+    dict_attribs = get_dict_attribs(dict)
+    marker_dimension, dict_cap = dict_attribs if dict_attribs is not None else (0, 0)
+
+    # Run preliminary checks
+    can_run = prelim_check(dict_cap, marker_dimension, marker_count, marker_size_px)
+    if not can_run:
+        print("[FAILED] Generation aborted: Preliminary checks failed.")
+        return
+    print("[SUCCESS] Preliminary checks passed.")
+
+    # Ask for confirmation before proceeding
+    print(f"[Summary] Will generate {marker_count} markers with")
+    print(f"--image-size: {marker_size_px}px --inverted: {inverted} --border: {border_thickness if border_thickness > 0 else 'False'}")
+    confirm = input(f">> Continue? (y/n): ").lower()
+    if confirm == 'n':
+        print("[EXITED] User cancelled generation.")
+        return
+    print(f"[STARTED] Generating {marker_count} markers...")
+
+    # Spread the chosen markers evenly across the dictionary
+    marker_ids = spread_marker_ids(dict_cap, marker_count)
+    # Check which markers already exist with a different content (identical images are left alone)
+    start = time.perf_counter()
+    actions = [(i, *action) for i, action in zip(marker_ids, resolve_file_actions(dict, marker_ids, marker_size_px, inverted, border_thickness))]
+    compare_elapsed = time.perf_counter() - start
+    conflicting_markers = [i for i, action, _ in actions if action == FileAction.DECIDE_PER_MARKER]
+
+    operation = Operation.NO_OP
+    options = [Operation.OVERWRITE, Operation.SKIP, Operation.KEEP_BOTH, Operation.DECIDE_PER_MARKER]
+    # If there are any existing markers that conflict with the new markers, prompt the user
+    if len(conflicting_markers) > 0:
+        print(f": [Alert] The following markers already exist and may be overwritten: {conflicting_markers}. What would you like to do?")
+        opInput = input(f">> (o)verwrite all / (s)kip all / (k)eep both for all / (d)ecide per marker: ").lower()
+        while opInput not in options:
+            print(f": [Error] Command '{opInput}' is not a valid option.")
+            opInput = input(f">> (o)verwrite all / (s)kip all / (k)eep both for all / (d)ecide per marker: ").lower()
+        operation = Operation(opInput)
+
+    # Resolve every conflict up front (prompting per marker if requested),
+    # so the rendering itself can run without any user interaction
+    for index, (i, action, _) in enumerate(actions):
+        if action == FileAction.DECIDE_PER_MARKER:
+            marker_operation = operation if operation not in (Operation.NO_OP, Operation.DECIDE_PER_MARKER) else prompt_operation(i)
+            actions[index] = (i, *apply_operation(i, inverted, marker_operation))
+
+    jobs = [(i, filepath) for i, action, filepath in actions if action not in (FileAction.SKIP, FileAction.UNCHANGED)]
+    elapsed = render_markers(dict, jobs, marker_size_px, inverted, border_thickness)
+
+    generated, skipped, overwritten = 0, 0, 0
+    # Collect the per-marker lines and print them at once, a print per marker costs more than rendering it
+    lines = []
+    for iteration, (i, action, _) in enumerate(actions, start=1):
+        match action:
+            case FileAction.CREATE:
+                generated += 1
+                lines.append(f": [{iteration}/{len(marker_ids)}] Marker {i} generated.")
+            case FileAction.OVERWRITE:
+                overwritten += 1
+                generated += 1
+                lines.append(f": [{iteration}/{len(marker_ids)}] Marker {i} overwritten.")
+            case FileAction.SKIP:
+                skipped += 1
+                lines.append(f": [{iteration}/{len(marker_ids)}] File skipped.")
+            case FileAction.KEEP_BOTH:
+                generated += 1
+                lines.append(f": [{iteration}/{len(marker_ids)}] Marker {i} saved as a new file.")
+            case FileAction.UNCHANGED:
+                skipped += 1
+                lines.append(f": [{iteration}/{len(marker_ids)}] Marker {i} is up to date.")
+    if len(lines) <= MAX_MARKER_LINES:
+        print("\n".join(lines))
+    else:
+        print(f"[INFO] Left out the results of the individual markers, there are more than {MAX_MARKER_LINES}.")
+
+    print(f"[DONE] {generated if generated > 0 else "No"} marker{"" if generated == 1 else "s"} generated. {skipped if skipped > 0 else "No"} marker{"" if skipped == 1 else "s"} skipped. {overwritten if overwritten > 0 else "No"} marker{"" if overwritten == 1 else "s"} overwritten.")
+    print_timings(len(marker_ids), compare_elapsed, len(jobs), elapsed)
+
+def generate_marker_batch(dict: int, marker_ids: Iterable[int], marker_size_px: int = 420, inverted: bool = False, border_thickness: int = 0, operation: Operation = Operation.SKIP, workers: int | None = None) -> dict[FileAction, int] | None:
+    """Generates ArUco marker images in bulk without any user interaction.
+
+    Unlike `generate_marker_multi`, the conflict policy is fixed up front, the markers are given as explicit IDs and
+    rendering is spread across a pool of worker processes.
+
+    :param dict: The ArUco dictionary to use for marker generation.
+    :param marker_ids: The IDs of the markers to generate. Duplicates are ignored.
+    :param marker_size_px: The size of the marker image in pixels. This should be a multiple of the marker's dimension. Default is 420.
+    :param inverted: If True, the marker image will be inverted (black on white + white border). Default is False.
+    :param border_thickness: The thickness of the border to add to the marker image. Default is 0 (no border).
+    :param operation: The operation to perform for markers that already have an image. Must be one of
+        [Operation.OVERWRITE, Operation.SKIP, Operation.KEEP_BOTH]. Default is Operation.SKIP.
+    :param workers: The number of worker processes to render with. Defaults to the number of CPUs, 1 renders in-process.
+    :return: The number of markers per action taken, or None if generation was aborted.
+    :raises ValueError: If the operation would require user interaction.
+    """
+
+    if operation not in (Operation.OVERWRITE, Operation.SKIP, Operation.KEEP_BOTH):
+        raise ValueError(f"Batch generation requires a fixed conflict operation, got '{operation.name}'.")
+
+    # Get the marker's dimension and the dictionary capacity
+    dict_attribs = get_dict_attribs(dict)
+    marker_dimension, dict_cap = dict_attribs if dict_attribs is not None else (0, 0)
+    # Remove duplicates while keeping the requested order
+    unique_ids, seen_ids = [], set()
+    for i in marker_ids:
+        if i not in seen_ids:
+            seen_ids.add(i)
+            unique_ids.append(i)
+    marker_ids = unique_ids
+
+    # Run preliminary checks
+    can_run = prelim_check(dict_cap, marker_dimension, len(marker_ids), marker_size_px)
+    if not can_run:
+        print("[FAILED] Generation aborted: Preliminary checks failed.")
+        return None
+
+    out_of_range = [i for i in marker_ids if not (0 <= i < dict_cap)]
+    if len(out_of_range) > 0:
+        print(f": [Error] Marker IDs must be in the range 0 to {dict_cap - 1}. Out of range: {out_of_range}.")
+        print("[FAILED] Generation aborted: Marker ID out of range.")
+        return None
+
+    print(f"[STARTED] Generating {len(marker_ids)} markers...")
+    start = time.perf_counter()
+    actions = [(i, *action) for i, action in zip(marker_ids, resolve_file_actions(dict, marker_ids, marker_size_px, inverted, border_thickness, operation, workers))]
+    compare_elapsed = time.perf_counter() - start
+    jobs = [(i, filepath) for i, action, filepath in actions if action not in (FileAction.SKIP, FileAction.UNCHANGED)]
+    elapsed = render_markers(dict, jobs, marker_size_px, inverted, border_thickness, workers)
+
+    counts = {action: 0 for action in FileAction}
+    for _, action, _ in actions:
+        counts[action] += 1
+    print(f"[DONE] {counts[FileAction.CREATE]} created, {counts[FileAction.OVERWRITE]} overwritten, {counts[FileAction.KEEP_BOTH]} kept both, {counts[FileAction.SKIP]} skipped, {counts[FileAction.UNCHANGED]} up to date.")
+    print_timings(len(marker_ids), compare_elapsed, len(jobs), elapsed)
+    return counts
+
+def render_markers(dict: int, jobs: list[tuple[int, str]], marker_size_px: int, inverted: bool, border_thickness: int, workers: int | None = None) -> float:
+    """Renders marker images and writes them to disk, spreading the work across a process pool.
+
+    :param dict: The ArUco dictionary ID to use for marker generation.
+    :param jobs: The (marker ID, file path) pairs to render.
+    :param marker_size_px: The size of the marker image in pixels.
+    :param inverted: Whether the marker images should be inverted (black on white w/ white border).
+    :param border_thickness: The thickness of the border to add to the marker images.
+    :param workers: The number of worker processes to use. Defaults to the number of CPUs, 1 renders in-process.
+    :return: The wall time spent rendering, in seconds.
+    """
+
+    start = time.perf_counter()
+    map_marker_jobs(render_job, dict, jobs, marker_size_px, inverted, border_thickness, workers)
+    return time.perf_counter() - start
+
+def map_marker_jobs(function: Callable[[tuple], object], dict: int, jobs: list[tuple], marker_size_px: int, inverted: bool, border_thickness: int, workers: int | None = None) -> list:
+    """Runs a job function over marker jobs in a process pool set up with `init_render_worker`.
+
+    :param function: The job function, e.g. `render_job`. Must be defined at module level so it can be pickled.
+    :param dict: The ArUco dictionary ID to use for marker generation.
+    :param jobs: The jobs, each starting with the marker ID.
+    :param marker_size_px: The size of the marker image in pixels.
+    :param inverted: Whether the marker images should be inverted (black on white w/ white border).
+    :param border_thickness: The thickness of the border to add to the marker images.
+    :param workers: The number of worker processes to use. Defaults to the number of CPUs, 1 runs in-process.
+    :return: The results of the jobs, in the order of the jobs.
+    """
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        init_render_worker(dict, marker_size_px, inverted, border_thickness)
+        return [function(job) for job in jobs]
+    # Hand out a few chunks per worker to keep the IPC overhead low while still balancing the load
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with futures.ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker, initargs=(dict, marker_size_px, inverted, border_thickness, instrumentation.worker_settings())) as pool:
+        return list(pool.map(function, jobs, chunksize=chunksize))
+
+# Per-process render settings, set once by `init_render_worker` so jobs only carry the marker ID and file path
+_render_settings = {}
+
+def init_render_worker(dict: int, marker_size_px: int, inverted: bool, border_thickness: int, instrumentation_settings: tuple | None = None):
+    instrumentation.init_worker(instrumentation_settings)
+    # ArUco Dictionary objects can't be pickled, so every worker builds its own from the dictionary ID
+    _render_settings["dict"] = get_dictionary(dict)
+    _render_settings["marker_size_px"] = marker_size_px
+    _render_settings["inverted"] = inverted
+    _render_settings["border_thickness"] = border_thickness
+
+def render_job(job: tuple[int, str]) -> int:
+    marker_id, filepath = job
+    writeImage(_render_settings["dict"], marker_id, _render_settings["marker_size_px"], _render_settings["inverted"], _render_settings["border_thickness"], filepath)
+    return marker_id
+
+def match_job(job: tuple[int, list[str]]) -> str | None:
+    marker_id, filepaths = job
+    return matching_marker_file(_render_settings["dict"], marker_id, _render_settings["marker_size_px"], _render_settings["inverted"], _render_settings["border_thickness"], filepaths)
+
+def spread_marker_ids(dict_capacity: int, marker_count: int) -> list[int]:
+    """Picks `marker_count` marker IDs spread evenly across the dictionary.
+
+    :param dict_capacity: The capacity of the dictionary (number of markers).
+    :param marker_count: The number of markers to pick. Limited to the dictionary capacity.
+    :return: The chosen marker IDs in ascending order.
+    """
+
+    # Limit the marker count to the dictionary capacity
+    marker_count = max(1, min(dict_capacity, marker_count))
+    if marker_count == 1:
+        return [0]
+    step = int((dict_capacity - 1) / (marker_count - 1))
+    return list(range(0, dict_capacity, step))[:marker_count]
+
+def parse_marker_ids(spec: str) -> list[int]:
+    """Parses a comma separated list of marker IDs and inclusive ranges, e.g. '0-9,12,20-24'.
+
+    :param spec: The marker ID specification.
+    :return: The marker IDs in the given order.
+    :raises ValueError: If the specification is malformed.
+    """
+
+    marker_ids = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        if sep:
+            first, last = int(start), int(end)
+            if last < first:
+                raise ValueError(f"Invalid marker ID range '{part}'.")
+            marker_ids.extend(range(first, last + 1))
+        else:
+            marker_ids.append(int(part))
+    return marker_ids
+
+def print_timings(marker_count: int, compare_elapsed: float, rendered_count: int, render_elapsed: float):
+    # Comparing with the existing files and rendering are timed apart, an up-to-date run only compares
+    print(f"[INFO] Compared {marker_count} marker{"" if marker_count == 1 else "s"} with the existing files in {compare_elapsed:.2f}s ({format_throughput(marker_count, compare_elapsed)}).")
+    print(f"[INFO] Rendered {rendered_count} marker{"" if rendered_count == 1 else "s"} in {render_elapsed:.2f}s ({format_throughput(rendered_count, render_elapsed)}).")
+
+def format_throughput(marker_count: int, elapsed: float) -> str:
+    return f"{marker_count / elapsed:.1f} markers/s" if elapsed > 0 else "n/a markers/s"
+
+def prelim_check(dict_capacity: int, marker_dimension: int, marker_count: int, marker_size_px: int) -> bool:
+    """Performs preliminary checks before generating markers.
+    
+    Checks if the dictionary exists, if the marker count is valid, and if the marker size is a multiple of the marker dimension.
+    
+    :param dict_capacity: The capacity of the dictionary (number of markers).
+    :param marker_dimension: The dimension of the markers in the dictionary.
+    :param marker_count: The number of markers to generate.
+    :param marker_size_px: The size of the marker image in pixels.
+    :return: True if all checks pass, False otherwise.
+    
+    """
+
+    print(f"[STARTED] Running preliminary checks for marker generation...")
+
+    if dict_capacity is None or marker_dimension is None:
+        print(": [Error] Dictionary not found.")
+        return False
+
+    if dict_capacity == 0:
+        print(": [Error] Dictionary does not contain any markers to generate.")
+        return False
+    
+    # Create the directory if it doesn't exist
+    save_path = get_save_path()
+    if not os.path.exists(save_path):
+        try:
+            os.makedirs(save_path)
+        except OSError as err:
+            print(f": [Error] Could not create directory {SAVE_DIR}: {err}")
+            return False
+    # Check if the save path is a directory
+    elif not os.path.isdir(SAVE_DIR):
+        print(f": [Error] '{SAVE_DIR}' is not a directory.")
+        return False
+
+    if marker_count < 1:
+        print(": [Alert] marker_count must be greater than 0 in order to generate markers.")
+    elif marker_count > dict_capacity:
+        print(f": [Alert] Attempting to generate more markers than available ({dict_capacity}). Marker count will be updated.")
+        print(": [Info] If you need more markers, pick a larger dictionary.")
+
+    # Check if the marker size is a multiple of the marker dimension and update it if necessary
+    if (marker_size_px % marker_dimension) != 0:
+        og_marker_size_px = marker_size_px
+        marker_size_px = marker_dimension * np.ceil(marker_size_px / marker_dimension)
+        print(f": [Alert] Bad image size: {og_marker_size_px}. Must be a multiple of marker dimension. Resized to {marker_size_px}.")
+        print(": [Info] To prevent resizing, make sure the image size is a multiple of the marker dimension.")
+    
+    return True
+
+def process_single_marker(dict: cv2.aruco.Dictionary, marker_id: int, marker_size_px: int, inverted: bool, border_thickness: int, operation: Operation = Operation.NO_OP) -> int:
+    """Processes a single marker image generation request.
+    
+    :param dict: The ArUco dictionary to use for marker generation.
+    :param marker_id: The ID of the marker to generate.
+    :param marker_size_px: The size of the marker image in pixels.
+    :param inverted: Whether the marker image should be inverted (black on white w/ white border).
+    :param border_thickness: The thickness of the border to add to the marker image.
+    :param operation: The operation to perform if the marker image already exists. If not set, the user will be prompted for an action.
+    :return: One of [FileAction.CREATE, FileAction.OVERWRITE, FileAction.SKIP, FileAction.KEEP_BOTH, FileAction.UNCHANGED] representing the action taken.
+    """
+    
+    action, filepath = resolve_file_action(dict, marker_id, marker_size_px, inverted, border_thickness, operation)
+    # If no operation is specified, or if the operation should be
+    # decided per marker, prompt the user for an action
+    if action == FileAction.DECIDE_PER_MARKER:
+        action, filepath = apply_operation(marker_id, inverted, prompt_operation(marker_id))
+
+    if action not in (FileAction.SKIP, FileAction.UNCHANGED):
+        writeImage(dict, marker_id, marker_size_px, inverted, border_thickness, filepath)
+    return action
+
+def resolve_file_action(dict: cv2.aruco.Dictionary, marker_id: int, marker_size_px: int, inverted: bool, border_thickness: int, operation: Operation = Operation.NO_OP) -> tuple[FileAction, str]:
+    """Decides what to do with a marker image without prompting the user.
+
+    An existing image only counts as a conflict if neither it nor any of its kept versions holds the image that
+    would be generated, identical images are reported as FileAction.UNCHANGED and can be left alone.
+
+    :param dict: The ArUco dictionary to use for marker generation.
+    :param marker_id: The ID of the marker to generate.
+    :param marker_size_px: The size of the marker image in pixels.
+    :param inverted: Whether the marker image should be inverted.
+    :param border_thickness: The thickness of the border to add to the marker image.
+    :param operation: The operation to perform if a different marker image already exists.
+    :return: The action to take and the path the marker image should be written to. The action is
+        FileAction.DECIDE_PER_MARKER if there is a conflict and the operation requires user input.
+    """
+
+    filepaths = existing_marker_files(marker_id, inverted)
+    match = matching_marker_file(dict, marker_id, marker_size_px, inverted, border_thickness, filepaths) if filepaths else None
+    return decide_file_action(marker_id, inverted, filepaths, match, operation)
+
+def resolve_file_actions(dict: int, marker_ids: list[int], marker_size_px: int, inverted: bool, border_thickness: int, operation: Operation = Operation.NO_OP, workers: int | None = None) -> list[tuple[FileAction, str]]:
+    """Decides what to do with many marker images without prompting the user, see `resolve_file_action`.
+
+    Comparing an existing image renders the marker on a cache miss, so the comparisons are spread across the same
+    kind of worker pool as the rendering.
+
+    :param dict: The ArUco dictionary ID to use for marker generation.
+    :param marker_ids: The IDs of the markers to generate.
+    :param marker_size_px: The size of the marker image in pixels.
+    :param inverted: Whether the marker images should be inverted.
+    :param border_thickness: The thickness of the border to add to the marker images.
+    :param operation: The operation to perform if a different marker image already exists.
+    :param workers: The number of worker processes to compare with. Defaults to the number of CPUs, 1 compares in-process.
+    :return: The action to take and the path to write to for every marker, in the order of `marker_ids`.
+    """
+
+    existing = [existing_marker_files(i, inverted) for i in marker_ids]
+    jobs = [(i, filepaths) for i, filepaths in zip(marker_ids, existing) if filepaths]
+    matches = {i: match for (i, _), match in zip(jobs, map_marker_jobs(match_job, dict, jobs, marker_size_px, inverted, border_thickness, workers))} if jobs else {}
+    return [decide_file_action(i, inverted, filepaths, matches.get(i), operation) for i, filepaths in zip(marker_ids, existing)]
+
+def decide_file_action(marker_id: int, inverted: bool, filepaths: list[str], match: str | None, operation: Operation) -> tuple[FileAction, str]:
+    # If there are no conflicts with existing files, simply write the image
+    if not filepaths:
+        return FileAction.CREATE, marker_filepath(marker_id, inverted)
+    # If an existing file already holds this exact marker, there is nothing to do
+    if match is not None:
+        return FileAction.UNCHANGED, match
+    if operation in (Operation.NO_OP, Operation.DECIDE_PER_MARKER):
+        return FileAction.DECIDE_PER_MARKER, filepaths[0]
+    return apply_operation(marker_id, inverted, operation)
+
+def existing_marker_files(marker_id: int, inverted: bool) -> list[str]:
+    """Lists the existing images of a marker: the original followed by the versions kept next to it.
+
+    :param marker_id: The ID of the marker.
+    :param inverted: Whether to list the inverted images.
+    :return: The paths of the existing images, empty if the original doesn't exist.
+    """
+
+    filepaths = []
+    filepath = marker_filepath(marker_id, inverted)
+    # Versions are numbered from 1 without gaps, see `apply_operation`
+    while os.path.exists(filepath):
+        filepaths.append(filepath)
+        filepath = marker_filepath(marker_id, inverted, len(filepaths))
+    return filepaths
+
+def matching_marker_file(dict: cv2.aruco.Dictionary, marker_id: int, marker_size_px: int, inverted: bool, border_thickness: int, filepaths: list[str]) -> str | None:
+    # The first of the files that holds exactly the image that would be generated, the marker is only rendered once
+    key = marker_cache_key(dict, marker_id, marker_size_px, inverted, border_thickness)
+    for filepath in filepaths:
+        if get_marker_cache().matches(key, filepath, lambda: encode_marker_image(dict, marker_id, marker_size_px, inverted, border_thickness)):
+            return filepath
+    return None
+
+def apply_operation(marker_id: int, inverted: bool, operation: Operation) -> tuple[FileAction, str]:
+    """Applies a conflict operation to a marker whose image already exists with a different content.
+
+    :param marker_id: The ID of the marker to generate.
+    :param inverted: Whether the marker image should be inverted.
+    :param operation: One of [Operation.OVERWRITE, Operation.SKIP, Operation.KEEP_BOTH].
+    :return: The action to take and the path the marker image should be written to.
+    :raises ValueError: If the operation requires user interaction.
+    """
+
+    filepath = marker_filepath(marker_id, inverted)
+    match operation:
+        case Operation.KEEP_BOTH:
+            # Start with version 1 and increment until a unique filename is found
+            version = 1
+            while os.path.exists(filepath):
+                filepath = marker_filepath(marker_id, inverted, version)
+                version += 1
+            return FileAction.KEEP_BOTH, filepath
+        case Operation.OVERWRITE:
+            return FileAction.OVERWRITE, filepath
+        case Operation.SKIP:
+            return FileAction.SKIP, filepath
+    raise ValueError(f"Marker {marker_id} already exists and operation '{operation.name}' requires user input.")
+
+def prompt_operation(marker_id: int) -> Operation:
+    """Asks the user what to do with a marker that already has an associated image.
+
+    :param marker_id: The ID of the conflicting marker.
+    :return: One of [Operation.OVERWRITE, Operation.SKIP, Operation.KEEP_BOTH].
+    """
+
+    options = [Operation.OVERWRITE, Operation.SKIP, Operation.KEEP_BOTH]
+    print(f": [Alert] Marker {marker_id} already has an associated image in directory '{SAVE_DIR}'. What would you like to do?")
+    opInput = input(f">> (o)verwrite / (s)kip / (k)eep both: ").lower()
+    while opInput not in options:
+        print(f": [Error] Command '{opInput}' is not a valid option.")
+        opInput = input(f">> (o)verwrite / (s)kip / (k)eep both: ").lower()
+    return Operation(opInput)
+
+def marker_filepath(marker_id: int, inverted: bool, version: int = 0) -> str:
+    # filename: 'marker{marker_id}[_INV][_n].jpg'
+    filename = f"{FILENAME_BASE}{marker_id}{INVERTED_TAG if inverted else ""}{f"_{version}" if version > 0 else ""}{FILE_EXTENSION}"
+    return os.path.join(get_save_path(), filename)
+
+def writeImage(dict, marker_id, marker_size_px, inverted, border_thickness, filepath):
+    # Only render and encode the marker if this exact image isn't cached yet
+    key = marker_cache_key(dict, marker_id, marker_size_px, inverted, border_thickness)
+    data = get_marker_cache().get_or_render(key, lambda: encode_marker_image(dict, marker_id, marker_size_px, inverted, border_thickness))
+    with instrumentation.span("write"), open(filepath, "wb") as marker_file:
+        marker_file.write(data)
+    instrumentation.count("markers.written")
+
+def encode_marker_image(dict: cv2.aruco.Dictionary, marker_id: int, marker_size_px: int, inverted: bool, border_thickness: int) -> bytes:
+    marker = generate_marker_image(dict, marker_id, marker_size_px, inverted)
+    # Add border in inverted colour, if specified
+    if border_thickness > 0:
+        # Add additional border to the marker image
+        # If the marker is inverted, the border bits will be white => additional border should be black
+        # If the marker is not inverted, the border bits will be black => additional border should be white
+        border_colour = (0, 0, 0) if inverted else (255, 255, 255)
+        marker = cv2.copyMakeBorder(marker, border_thickness, border_thickness, border_thickness, border_thickness, cv2.BORDER_CONSTANT, value=border_colour)
+    with instrumentation.span("encode"):
+        success, data = cv2.imencode(FILE_EXTENSION, marker)
+    if not success:
+        raise OSError(f"Could not encode marker {marker_id} as '{FILE_EXTENSION}'.")
+    return data.tobytes()
+
+def marker_cache_key(dict: cv2.aruco.Dictionary, marker_id: int, marker_size_px: int, inverted: bool, border_thickness: int) -> str:
+    # Key on the marker's actual bits rather than the dictionary ID, identical markers in different dictionaries share an entry
+    marker_bits = dict.markerSize.to_bytes(1, "little") + dict.bytesList[marker_id].tobytes()
+    return MarkerCache.key(marker_bits, marker_size_px, inverted, border_thickness, FILE_EXTENSION)
+
+# Per-process marker cache, created on first use so it follows the save path
+_marker_cache = None
+
+def get_marker_cache() -> MarkerCache:
+    global _marker_cache
+    if _marker_cache is None:
+        _marker_cache = MarkerCache(os.path.join(get_save_path(), CACHE_DIR), FILE_EXTENSION)
+    return _marker_cache
+
+def generate_marker_image(dict: cv2.aruco.Dictionary, marker_id: int, marker_size_px: int, inverted: bool, out: np.ndarray | None = None):
+    # Memalloc marker image, unless the caller provides a (marker_size_px x marker_size_px) view to render into
+    marker_image = np.zeros((marker_size_px, marker_size_px, 1), dtype=np.uint8) if out is None else out
+    with instrumentation.span("render"):
+        # Generate the marker image
+        marker_image = cv2.aruco.generateImageMarker(dict, marker_id, marker_size_px, marker_image, 1)
+        # Invert the marker image if needed (in place, so views into a larger buffer stay valid)
+        if inverted:
+            marker_image = cv2.bitwise_not(marker_image, dst=marker_image)
+    return marker_image
+
+def generate_marker_images(dict: cv2.aruco.Dictionary, marker_ids: Iterable[int], marker_size_px: int, inverted: bool = False, border_thickness: int = 0) -> np.ndarray:
+    """Renders many markers at once, straight from the dictionary's byte list.
+
+    Produces the same pixels as `generate_marker_image` followed by the border of `writeImage`, but unpacks the bits of
+    all requested markers in one go and upscales, inverts and adds the border while filling a single output stack.
+
+    :param dict: The ArUco dictionary to use for marker generation.
+    :param marker_ids: The IDs of the markers to render.
+    :param marker_size_px: The size of the marker (without the additional border) in pixels.
+    :param inverted: If True, the markers will be inverted (black on white + white border). Default is False.
+    :param border_thickness: The thickness of the border to add around each marker. Default is 0 (no border).
+    :return: A (N, H, W) uint8 array with one marker image per requested ID, in the requested order.
+    :raises ValueError: If the marker size is smaller than the marker's cells.
+    """
+
+    marker_ids = np.asarray(list(marker_ids), dtype=np.intp)
+    # Marker bits plus the one cell wide black border that generateImageMarker adds
+    cells = dict.markerSize + 2
+    if marker_size_px < cells:
+        raise ValueError(f"Marker size must be at least {cells}px for this dictionary.")
+    bits = unpack_marker_bits(dict, marker_ids)
+
+    # Apply the colours (and with that, the inversion) to the tiny cell grid rather than to the full-size images
+    black, white = (255, 0) if inverted else (0, 255)
+    tiny = np.full((len(marker_ids), cells, cells), black, dtype=np.uint8)
+    tiny[:, 1:-1, 1:-1] = np.where(bits, white, black)
+
+    side = marker_size_px + 2 * border_thickness
+    markers = np.empty((len(marker_ids), side, side), dtype=np.uint8)
+    inner = markers[:, border_thickness:border_thickness + marker_size_px, border_thickness:border_thickness + marker_size_px]
+    if marker_size_px % cells == 0:
+        # Every cell becomes a block of scale x scale pixels: write the cells into a blocked view of the output (np.kron-style)
+        scale = marker_size_px // cells
+        blocks = inner.reshape(len(marker_ids), cells, scale, cells, scale)
+        blocks[...] = tiny[:, :, None, :, None]
+    else:
+        # Same nearest neighbour mapping as the INTER_NEAREST resize in generateImageMarker, where
+        # every cell covers a run of either floor or ceil(marker_size_px / cells) pixels
+        cell_index = (np.arange(marker_size_px) * cells) // marker_size_px
+        run_lengths = np.bincount(cell_index, minlength=cells)
+        inner[...] = np.repeat(np.repeat(tiny, run_lengths, axis=1), run_lengths, axis=2)
+
+    if border_thickness > 0:
+        # If the marker is inverted, the border bits will be white => additional border should be black
+        # If the marker is not inverted, the border bits will be black => additional border should be white
+        border_colour = 0 if inverted else 255
+        markers[:, :border_thickness, :] = border_colour
+        markers[:, -border_thickness:, :] = border_colour
+        markers[:, :, :border_thickness] = border_colour
+        markers[:, :, -border_thickness:] = border_colour
+    return markers
+
+def unpack_marker_bits(dict: cv2.aruco.Dictionary, marker_ids: np.ndarray) -> np.ndarray:
+    """Unpacks the bit matrices of the given markers from the dictionary's byte list.
+
+    :param dict: The ArUco dictionary the markers belong to.
+    :param marker_ids: The IDs of the markers to unpack.
+    :return: A (N, markerSize, markerSize) uint8 array of 0/1 bits, equal to `aruco.Dictionary.getBitsFromByteList`.
+    """
+
+    marker_dimension = dict.markerSize
+    bit_count = marker_dimension * marker_dimension
+    byte_list = dict.bytesList
+    byte_count = byte_list.shape[1]
+    # Every marker stores the bytes of its 4 rotations one after the other, the first rotation is the marker itself
+    rotation0 = byte_list.reshape(len(byte_list), -1)[marker_ids, :byte_count]
+    # Bits are packed MSB first, but the remaining bits of the last byte are right-aligned
+    bit_index = np.arange(bit_count)
+    remainder = bit_count % 8
+    if remainder > 0:
+        bit_index[-remainder:] += 8 - remainder
+    return np.unpackbits(rotation0, axis=1)[:, bit_index].reshape(len(marker_ids), marker_dimension, marker_dimension)
+
+def benchmark_marker_rendering(dict: int, marker_ids: list[int], marker_size_px: int = 420, inverted: bool = False, border_thickness: int = 0, repeats: int = 3) -> dict[str, float]:
+    """Compares the per-marker rendering path with the vectorized bulk renderer.
+
+    Both paths render the same markers (including the border), the outputs are checked to be identical and the best
+    of `repeats` runs is reported. Encoding and writing to disk are not included.
+
+    :param dict: The ArUco dictionary ID to benchmark.
+    :param marker_ids: The IDs of the markers to render.
+    :param marker_size_px: The size of the marker images in pixels. Default is 420.
+    :param inverted: Whether the markers are inverted. Default is False.
+    :param border_thickness: The thickness of the additional border. Default is 0.
+    :param repeats: The number of runs per path. Default is 3.
+    :return: The best wall time of both paths in seconds, their throughput in markers per second and the speedup.
+    :raises AssertionError: If both paths don't produce the same images.
+    """
+
+    aruco_dict = get_dictionary(dict)
+    border_colour = (0, 0, 0) if inverted else (255, 255, 255)
+
+    def per_marker():
+        markers = []
+        for i in marker_ids:
+            marker = generate_marker_image(aruco_dict, i, marker_size_px, inverted)
+            if border_thickness > 0:
+                marker = cv2.copyMakeBorder(marker, border_thickness, border_thickness, border_thickness, border_thickness, cv2.BORDER_CONSTANT, value=border_colour)
+            markers.append(marker)
+        return markers
+
+    def bulk():
+        return generate_marker_images(aruco_dict, marker_ids, marker_size_px, inverted, border_thickness)
+
+    timings = {}
+    for name, render in (("per_marker", per_marker), ("bulk", bulk)):
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = render()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+        if name == "per_marker":
+            reference = result
+    assert all(np.array_equal(reference[index].reshape(result[index].shape), result[index]) for index in range(len(marker_ids))), "Bulk renderer output differs from the per-marker path."
+
+    return {
+        "per_marker_s": timings["per_marker"],
+        "bulk_s": timings["bulk"],
+        "per_marker_markers_per_s": len(marker_ids) / timings["per_marker"],
+        "bulk_markers_per_s": len(marker_ids) / timings["bulk"],
+        "speedup": timings["per_marker"] / timings["bulk"],
+    }
+
+@functools.cache
+def aruco_dictionaries() -> dict[int, list[int]]:
+    """Returns the existing ArUco dictionaries with their attributes dimension and capacity, keyed by dictionary ID."""
+
+    return {getattr(cv2.aruco, name): dict_attribs for name, dict_attribs in ARUCO_DICTIONARY_ATTRIBS.items()}
+
+def get_dict_attribs(dict: int) -> list[int] | None:
+    dict_attribs = aruco_dictionaries().get(dict)
+    return dict_attribs
+
+@functools.cache
+def get_dictionary(dict: int) -> cv2.aruco.Dictionary:
+    """Returns the predefined ArUco dictionary for a dictionary ID.
+
+    Every dictionary is only created once per process and shared by all callers, so don't modify it.
+
+    :param dict: The ArUco dictionary ID, e.g. `cv2.aruco.DICT_5X5_50`.
+    :return: The ArUco Dictionary object.
+    """
+
+    return cv2.aruco.getPredefinedDictionary(dict)
+
+def get_save_path() -> str:
+    # Full path to the save directory, resolved on use so it follows the working directory
+    return os.path.join(os.getcwd(), SAVE_DIR)
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate ArUco marker images. Without --ids or --count the generator runs interactively.")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--ids", type=parse_marker_ids, help="marker IDs and inclusive ranges to generate, e.g. '0-9,12,20-24'")
+    selection.add_argument("--count", type=int, help="number of markers to generate, spread evenly across the dictionary")
+    parser.add_argument("--dict", default="DICT_5X5_50", help="name of the ArUco dictionary (default: DICT_5X5_50)")
+    parser.add_argument("--size", type=int, default=420, help="marker image size in pixels (default: 420)")
+    parser.add_argument("--inverted", action="store_true", help="invert the marker images (black on white + white border)")
+    parser.add_argument("--border", type=int, default=0, help="border thickness in pixels (default: 0, no border)")
+    parser.add_argument("--on-conflict", choices=["overwrite", "skip", "keep-both"], default="skip", help="what to do with markers that already have an image (default: skip)")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--benchmark", action="store_true", help="compare the per-marker and bulk renderers for the selected markers instead of writing files")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    # cProfile only sees the main process, so render in-process unless the number of workers is given
+    if args.profile is not None and args.workers is None:
+        args.workers = 1
+    with instrumentation.session(args.stats, args.trace, args.profile):
+        run(args)
+
+def run(args: argparse.Namespace):
+    dict = getattr(cv2.aruco, args.dict, None)
+    if dict not in aruco_dictionaries():
+        print(f": [Error] Unknown ArUco dictionary '{args.dict}'.")
+        sys.exit(2)
+
+    dict_cap = aruco_dictionaries()[dict][1]
+    if args.benchmark:
+        marker_ids = args.ids if args.ids is not None else spread_marker_ids(dict_cap, args.count or dict_cap)
+        print(f"[STARTED] Benchmarking {len(marker_ids)} markers of {args.size}px...")
+        results = benchmark_marker_rendering(dict, marker_ids, args.size, args.inverted, args.border)
+        print(f": per-marker: {results["per_marker_s"] * 1000:.1f} ms ({results["per_marker_markers_per_s"]:.1f} markers/s)")
+        print(f": bulk:       {results["bulk_s"] * 1000:.1f} ms ({results["bulk_markers_per_s"]:.1f} markers/s)")
+        print(f"[DONE] Bulk renderer is {results["speedup"]:.1f}x faster.")
+        sys.exit(0)
+
+    # Run headless if the markers to generate were given on the command line
+    if args.ids is not None or args.count is not None:
+        marker_ids = args.ids if args.ids is not None else spread_marker_ids(dict_cap, args.count)
+        operation = Operation[args.on_conflict.upper().replace("-", "_")]
+        counts = generate_marker_batch(dict, marker_ids, args.size, args.inverted, args.border, operation, args.workers)
+        sys.exit(0 if counts is not None else 1)
+
+    print("Welcome to the ArUco marker generator!")
+    print("=========================================================")
+    print(f"Markers will be saved in the directory '{get_save_path()}'")
+    print("You can generate a single marker or multiple markers at once.")
+    print("=========================================================")
+    count, marker_size_px, inverted, border_thickness = None, None, None, None
+    while count is None:
+        try:
+            count = int(input(">> How many markers would you like to generate? (0 to exit): "))
+            if count < 0:
+                count = None
+            elif count == 0:
+                print("[EXITED] User cancelled generation.")
+                exit(0)
+        except ValueError:
+            print(": [Error] Marker count must be a positive integer.")
+    while marker_size_px is None:
+        try:
+            marker_size_px = int(input(">> Set the marker image size (in pixels) or press Enter to use the default (420): ") or 420)
+            if marker_size_px <= 0:
+                marker_size_px = None
+        except ValueError:
+            print(": [Error] Marker size must be a positive integer. If you want to use the default size, press Enter without typing anything.")
+    while inverted is None:
+        inverted_input = input(">> Invert the marker image? (y/n, default: n): ").lower()
+        if inverted_input in ['y', 'yes']:
+            inverted = True
+        elif inverted_input in ['n', 'no', '']:
+            inverted = False
+        else:
+            print(": [Error] Invalid input. Please enter 'y' or 'n'.")
+    while border_thickness is None:
+        try:
+            border_thickness = int(input(">> Set the border thickness (in pixels) or press Enter to generate without border: ") or 0)
+            if border_thickness < 0:
+                border_thickness = None
+        except ValueError:
+            print(": [Error] Border thickness must be a non-negative integer. If you want to use the default size, press Enter without typing anything.")
+
+    # Generate markers
+    generate_marker_multi(dict, count, marker_size_px=marker_size_px, inverted=inverted, border_thickness=border_thickness)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+
+from .lazy import lazy_import
+from .marker_generation import aruco_dictionaries, generate_marker_image, get_dict_attribs, get_dictionary, get_save_path, parse_marker_ids
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+# Paper sizes (width, height) in millimetres
+PAPER_SIZES = {
+    "A3": (297.0, 420.0),
+    "A4": (210.0, 297.0),
+    "A5": (148.0, 210.0),
+    "LETTER": (215.9, 279.4),
+}
+MM_PER_INCH = 25.4
+# PDF user space units (points) per inch
+POINTS_PER_INCH = 72
+# Grey value and dash length (in mm) of the cut lines
+CUT_LINE_COLOUR = 160
+CUT_LINE_DASH_MM = 2.0
+# Height of the ID labels printed underneath each marker, in mm
+LABEL_HEIGHT_MM = 3.0
+
+def mm_to_px(mm: float, dpi: int) -> int:
+    return int(round(mm * dpi / MM_PER_INCH))
+
+def iter_sheet_pages(dict: int, marker_ids: Iterable[int], marker_size_mm: float, dpi: int = 300, paper: str = "A4", inverted: bool = False, border_mm: float = 0, margin_mm: float = 10, spacing_mm: float = 6, labels: bool = True, cut_lines: bool = True) -> Iterator[tuple[np.ndarray, list[int]]]:
+    """Lays out markers on printable pages at their physical size.
+
+    Every marker is rendered exactly once, straight into a view of a single preallocated page buffer. The same buffer is
+    reused for every page, so consume (or copy) each page before advancing the iterator. The layout is checked when
+    this is called, before anything is rendered or written.
+
+    :param dict: The ArUco dictionary to use for marker generation.
+    :param marker_ids: The IDs of the markers to put on the sheets.
+    :param marker_size_mm: The printed size of a marker (without the additional border) in millimetres.
+    :param dpi: The resolution of the pages in dots per inch. Default is 300.
+    :param paper: The paper size, one of the keys of PAPER_SIZES. Default is 'A4'.
+    :param inverted: If True, the markers will be inverted (black on white + white border). Default is False.
+    :param border_mm: The thickness of the border around each marker in millimetres. Default is 0 (no border).
+    :param margin_mm: The empty margin around the page in millimetres. Default is 10.
+    :param spacing_mm: The space between two markers in millimetres, cut lines run through its centre. Default is 6.
+    :param labels: If True, the marker ID is printed underneath each marker. Default is True.
+    :param cut_lines: If True, dashed cut lines are drawn between the markers. Default is True.
+    :return: An iterator over (page image, marker IDs on the page) tuples.
+    :raises ValueError: If the dictionary or paper size is unknown, a marker ID is out of range, a size is out of range
+        or a marker does not fit on the page.
+    """
+
+    dict_attribs = get_dict_attribs(dict)
+    if dict_attribs is None:
+        raise ValueError("Dictionary not found.")
+    marker_dimension, dict_cap = dict_attribs
+    if dpi <= 0:
+        raise ValueError(f"DPI must be positive, got {dpi}.")
+    if marker_size_mm <= 0:
+        raise ValueError(f"Marker size must be positive, got {marker_size_mm:g} mm.")
+    for name, value in (("Border", border_mm), ("Margin", margin_mm), ("Spacing", spacing_mm)):
+        if value < 0:
+            raise ValueError(f"{name} must not be negative, got {value:g} mm.")
+    if paper.upper() not in PAPER_SIZES:
+        raise ValueError(f"Unknown paper size '{paper}'. Must be one of {list(PAPER_SIZES)}.")
+    marker_ids = list(marker_ids)
+    out_of_range = [i for i in marker_ids if not (0 <= i < dict_cap)]
+    if len(out_of_range) > 0:
+        raise ValueError(f"Marker IDs must be in the range 0 to {dict_cap - 1}. Out of range: {out_of_range}.")
+
+    page_w_mm, page_h_mm = PAPER_SIZES[paper.upper()]
+    printable_w_mm, printable_h_mm = page_w_mm - 2 * margin_mm, page_h_mm - 2 * margin_mm
+    tile_mm = marker_size_mm + 2 * border_mm
+    if tile_mm > printable_w_mm or tile_mm > printable_h_mm:
+        raise ValueError(f"A {tile_mm:g} mm marker does not fit in the {max(printable_w_mm, 0):g} x {max(printable_h_mm, 0):g} mm printable area of a {paper} page with a {margin_mm:g} mm margin.")
+
+    # Convert the layout to pixels
+    page_w, page_h = mm_to_px(page_w_mm, dpi), mm_to_px(page_h_mm, dpi)
+    marker_px = mm_to_px(marker_size_mm, dpi)
+    # The marker's cells plus its black border must each get at least a pixel
+    if marker_px < marker_dimension + 2:
+        raise ValueError(f"A {marker_size_mm:g} mm marker is only {marker_px}px at {dpi} DPI, this dictionary needs at least {marker_dimension + 2}px.")
+    border_px = mm_to_px(border_mm, dpi)
+    margin_px = mm_to_px(margin_mm, dpi)
+    spacing_px = mm_to_px(spacing_mm, dpi)
+    label_px = mm_to_px(LABEL_HEIGHT_MM, dpi) if labels else 0
+    tile_px = marker_px + 2 * border_px
+    cell_w = tile_px + spacing_px
+    cell_h = tile_px + label_px + spacing_px
+    cols = (page_w - 2 * margin_px + spacing_px) // cell_w
+    rows = (page_h - 2 * margin_px + spacing_px) // cell_h
+    if cols < 1 or rows < 1:
+        raise ValueError(f"A {marker_size_mm} mm marker does not fit on a {paper} page with a {margin_mm} mm margin.")
+    per_page = cols * rows
+
+    # Centre the grid on the page
+    grid_w, grid_h = cols * cell_w - spacing_px, rows * cell_h - spacing_px
+    origin_x, origin_y = (page_w - grid_w) // 2, (page_h - grid_h) // 2
+    # If the marker is inverted, the border bits will be white => additional border should be black
+    # If the marker is not inverted, the border bits will be black => additional border should be white
+    border_colour = 0 if inverted else 255
+    # Font scale for the labels: Hershey Simplex digits are roughly 22 px high at scale 1
+    font_scale = label_px * 0.6 / 22
+    font_thickness = max(1, int(round(font_scale * 1.5)))
+
+    # Memalloc the page buffer once and the dash pattern for the cut lines
+    page = np.empty((page_h, page_w), dtype=np.uint8)
+    dash_px = max(1, mm_to_px(CUT_LINE_DASH_MM, dpi))
+    dash_h = (np.arange(page_h) // dash_px) % 2 == 0
+    dash_w = (np.arange(page_w) // dash_px) % 2 == 0
+
+    aruco_dict = get_dictionary(dict)
+
+    def render_pages() -> Iterator[tuple[np.ndarray, list[int]]]:
+        for page_start in range(0, len(marker_ids), per_page):
+            page_ids = marker_ids[page_start:page_start + per_page]
+            page.fill(255)
+
+            for index, marker_id in enumerate(page_ids):
+                row, col = divmod(index, cols)
+                x, y = origin_x + col * cell_w, origin_y + row * cell_h
+                if border_px > 0:
+                    page[y:y + tile_px, x:x + tile_px] = border_colour
+                # Render the marker straight into its tile on the page
+                generate_marker_image(aruco_dict, marker_id, marker_px, inverted, out=page[y + border_px:y + border_px + marker_px, x + border_px:x + border_px + marker_px])
+                if labels:
+                    cv2.putText(page, str(marker_id), (x, y + tile_px + int(label_px * 0.8)), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 0, font_thickness, cv2.LINE_AA)
+
+            if cut_lines:
+                used_rows = (len(page_ids) + cols - 1) // cols
+                used_cols = min(len(page_ids), cols)
+                top, bottom = origin_y - spacing_px // 2, origin_y + used_rows * cell_h - spacing_px // 2
+                left, right = origin_x - spacing_px // 2, origin_x + used_cols * cell_w - spacing_px // 2
+                top, left = max(top, 0), max(left, 0)
+                bottom, right = min(bottom, page_h - 1), min(right, page_w - 1)
+                # Cut lines run through the centre of the spacing between the cells
+                for col in range(used_cols + 1):
+                    line_x = min(left + col * cell_w, page_w - 1)
+                    column = page[top:bottom + 1, line_x]
+                    column[dash_h[top:bottom + 1]] = CUT_LINE_COLOUR
+                for row in range(used_rows + 1):
+                    line_y = min(top + row * cell_h, page_h - 1)
+                    line = page[line_y, left:right + 1]
+                    line[dash_w[left:right + 1]] = CUT_LINE_COLOUR
+
+            yield page, page_ids
+
+    return render_pages()
+
+def write_sheets(pages: Iterable[tuple[np.ndarray, list[int]]], filepath: str, dpi: int) -> list[str]:
+    """Writes the pages to disk as a single multi-page PDF, or one PNG per page.
+
+    :param pages: The (page image, marker IDs) tuples as produced by `iter_sheet_pages`.
+    :param filepath: The output path. A '.pdf' extension produces one PDF, any other extension numbered PNG files.
+    :param dpi: The resolution of the pages, used to give the PDF pages their physical size.
+    :return: The paths of the written files.
+    """
+
+    os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+    base, extension = os.path.splitext(filepath)
+    if extension.lower() == ".pdf":
+        write_pdf((page for page, _ in pages), filepath, dpi)
+        return [filepath]
+
+    written = []
+    for number, (page, _) in enumerate(pages, start=1):
+        page_path = f"{base}_{number}.png"
+        cv2.imwrite(page_path, page)
+        written.append(page_path)
+    return written
+
+def write_pdf(pages: Iterable[np.ndarray], filepath: str, dpi: int):
+    """Writes grayscale page images to a PDF file with one page per image.
+
+    Each page is compressed as soon as it is produced, so the page buffers can be reused while writing.
+
+    :param pages: The 8-bit grayscale page images.
+    :param filepath: The path of the PDF file to write.
+    :param dpi: The resolution of the page images, used to give the PDF pages their physical size.
+    """
+
+    # Object 1 is the catalog, object 2 the page tree, every page adds a page, content stream and image object
+    offsets = {}
+    page_refs = []
+    with open(filepath, "wb") as pdf:
+        pdf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        def write_object(number: int, body: bytes):
+            offsets[number] = pdf.tell()
+            pdf.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        object_number = 3
+        for page in pages:
+            page_obj, content_obj, image_obj = object_number, object_number + 1, object_number + 2
+            object_number += 3
+            height, width = page.shape[:2]
+            width_pt, height_pt = width * POINTS_PER_INCH / dpi, height * POINTS_PER_INCH / dpi
+
+            image_data = zlib.compress(np.ascontiguousarray(page).tobytes(), 6)
+            write_object(image_obj, f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode /Length {len(image_data)} >>\nstream\n".encode() + image_data + b"\nendstream")
+            content = f"q {width_pt:.4f} 0 0 {height_pt:.4f} 0 0 cm /Im0 Do Q".encode()
+            write_object(content_obj, f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream")
+            write_object(page_obj, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.4f} {height_pt:.4f}] /Resources << /XObject << /Im0 {image_obj} 0 R >> >> /Contents {content_obj} 0 R >>".encode())
+            page_refs.append(f"{page_obj} 0 R")
+
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(2, f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>".encode())
+
+        # Cross-reference table
+        xref_offset = pdf.tell()
+        pdf.write(f"xref\n0 {object_number}\n0000000000 65535 f \n".encode())
+        for number in range(1, object_number):
+            pdf.write(f"{offsets[number]:010d} 00000 n \n".encode())
+        pdf.write(f"trailer\n<< /Size {object_number} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Compose printable sheets of ArUco markers at their physical size.")
+    parser.add_argument("--ids", type=parse_marker_ids, required=True, help="marker IDs and inclusive ranges to print, e.g. '0-9,12,20-24'")
+    parser.add_argument("--dict", default="DICT_5X5_50", help="name of the ArUco dictionary (default: DICT_5X5_50)")
+    parser.add_argument("--size-mm", type=float, required=True, help="printed marker size in millimetres")
+    parser.add_argument("--dpi", type=int, default=300, help="page resolution in dots per inch (default: 300)")
+    parser.add_argument("--paper", default="A4", choices=list(PAPER_SIZES), type=str.upper, help="paper size (default: A4)")
+    parser.add_argument("--inverted", action="store_true", help="invert the markers (black on white + white border)")
+    parser.add_argument("--border-mm", type=float, default=0, help="border thickness around each marker in millimetres (default: 0)")
+    parser.add_argument("--margin-mm", type=float, default=10, help="page margin in millimetres (default: 10)")
+    parser.add_argument("--spacing-mm", type=float, default=6, help="space between markers in millimetres (default: 6)")
+    parser.add_argument("--no-labels", action="store_true", help="don't print the marker IDs")
+    parser.add_argument("--no-cut-lines", action="store_true", help="don't draw cut lines")
+    parser.add_argument("--output", default=os.path.join(get_save_path(), "sheet.pdf"), help="output file; '.pdf' for a single PDF, '.png' for one image per page (default: markers/sheet.pdf)")
+    args = parser.parse_args(argv)
+
+    dict = getattr(cv2.aruco, args.dict, None)
+    if dict not in aruco_dictionaries():
+        print(f": [Error] Unknown ArUco dictionary '{args.dict}'.")
+        sys.exit(2)
+
+    print(f"[STARTED] Composing {len(args.ids)} markers of {args.size_mm} mm on {args.paper} at {args.dpi} DPI...")
+    start = time.perf_counter()
+    try:
+        pages = iter_sheet_pages(dict, args.ids, args.size_mm, args.dpi, args.paper, args.inverted, args.border_mm, args.margin_mm, args.spacing_mm, not args.no_labels, not args.no_cut_lines)
+        written = write_sheets(pages, args.output, args.dpi)
+    except ValueError as err:
+        print(f": [Error] {err}")
+        print("[FAILED] Composition aborted.")
+        sys.exit(1)
+    print(f"[DONE] Wrote {len(written)} file{"" if len(written) == 1 else "s"} in {time.perf_counter() - start:.2f}s: {', '.join(written)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,554 @@
+from __future__ import annotations
+
+import abc
+import argparse
+import math
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections.abc import Callable
+from typing import NamedTuple
+
+from . import instrumentation
+from .calibration_bundle import BUNDLE_FILE
+from .camera_calibration import create_detector_parameters, load_calibration
+from .frame_ring import RING_SLOTS, FrameRing
+from .lazy import lazy_import
+from .marker_generation import aruco_dictionaries, get_dictionary
+from .roi_detection import RESCAN_INTERVAL, RoiMarkerDetector
+from .undistortion import scale_camera_matrix
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+multiprocessing = lazy_import("multiprocessing")
+
+# CONSTANTS
+# Side length of the printed totem markers in meters
+DEFAULT_MARKER_LENGTH = 0.04
+# Dictionary the totem markers were generated with
+DEFAULT_DICTIONARY = "DICT_5X5_50"
+# A marker that moved less than this is considered still, e.g. by the pose stream's delta packets
+POSITION_THRESHOLD = 0.0005  # In meters
+# Number of items the queues between the pipeline stages can hold before dropping the oldest one
+QUEUE_SIZE = 1
+# Interval between two statistics reports, in seconds
+STATS_INTERVAL = 5.0
+# How long a stage waits for input before checking whether it should stop, in seconds
+POLL_INTERVAL = 0.1
+
+class TrackedMarker(NamedTuple):
+    """Pose of a single marker in a frame.
+
+    - marker_id: The ID of the marker.
+    - x, y: The position of the marker's centre in camera coordinates, or in table coordinates if the estimator
+      knows the pose of the table, in meters. In table homography mode (see `table_homography`) in millimeters on
+      the table or in projector UV.
+    - angle: The rotation of the marker around the camera's optical axis, or around the table's normal, in
+      degrees (-180, 180].
+    - confidence: How well the estimated pose explains the detected corners, in (0, 1].
+    """
+
+    marker_id: int
+    x: float
+    y: float
+    angle: float
+    confidence: float = 1.0
+
+class FramePoses(NamedTuple):
+    """All marker poses found in one camera frame.
+
+    - frame_index: The index of the frame since the capture started.
+    - timestamp: The `time.perf_counter()` at which the frame was captured.
+    - markers: The poses of the markers found in the frame.
+    """
+
+    frame_index: int
+    timestamp: float
+    markers: list[TrackedMarker]
+
+class DropOldestQueue(queue.Queue):
+    """Bounded queue that drops its oldest item instead of blocking when a new item is put while it is full.
+
+    Keeps a slow consumer working on the most recent data, so latency can't build up between pipeline stages.
+    """
+
+    def __init__(self, maxsize: int = QUEUE_SIZE):
+        super().__init__(maxsize)
+        self.dropped = 0
+
+    def put(self, item, block: bool = True, timeout: float | None = None):
+        with self.not_full:
+            if 0 < self.maxsize <= self._qsize():
+                self._get()
+                self.unfinished_tasks -= 1
+                self.dropped += 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+class MarkerEstimator(abc.ABC):
+    """Base of the estimators `MarkerTracker` runs on every frame: detects the markers in grayscale frames.
+
+    Subclasses turn the detected corners into `TrackedMarker`s in `estimate`, set `position_threshold` to the
+    smallest movement worth reporting in the unit of their positions, and keep their constructor arguments in
+    `settings`. OpenCV objects can't be pickled, so detection worker processes build their own estimator from
+    these.
+    """
+
+    def __init__(self, dict: int, roi: bool = False, rescan_interval: int = RESCAN_INTERVAL):
+        """
+        :param dict: The ArUco dictionary the markers were generated with.
+        :param roi: If True, markers are only searched for around their predicted positions (see `RoiMarkerDetector`).
+        :param rescan_interval: The number of frames between two full-frame rescans in ROI mode.
+        :raises ValueError: If the dictionary is unknown.
+        """
+
+        if dict not in aruco_dictionaries():
+            raise ValueError(f"Unknown ArUco dictionary {dict}.")
+        self.settings = (dict, roi, rescan_interval)
+        self.detector = cv2.aruco.ArucoDetector(get_dictionary(dict), create_detector_parameters())
+        self.roi_detector = RoiMarkerDetector(self.detector, rescan_interval) if roi else None
+
+    def detect(self, gray: np.ndarray) -> tuple[tuple[np.ndarray, ...], np.ndarray | None]:
+        with instrumentation.span("detect"):
+            if self.roi_detector is not None:
+                return self.roi_detector.detect(gray)
+            corners, ids, _ = self.detector.detectMarkers(gray)
+            return corners, ids
+
+    @abc.abstractmethod
+    def estimate(self, corners: tuple[np.ndarray, ...], ids: np.ndarray | None, frame_size: tuple[int, int]) -> list[TrackedMarker]:
+        """Locates every detected marker.
+
+        :param corners: The detected marker corners, as returned by `detect`.
+        :param ids: The detected marker IDs, as returned by `detect`.
+        :param frame_size: The (width, height) of the frame the markers were detected in.
+        :return: The poses of the markers.
+        """
+
+    def process(self, gray: np.ndarray) -> list[TrackedMarker]:
+        corners, ids = self.detect(gray)
+        return self.estimate(corners, ids, (gray.shape[1], gray.shape[0]))
+
+class MarkerPoseEstimator(MarkerEstimator):
+    """Detects markers in grayscale frames and estimates their pose with one `cv2.solvePnPGeneric` per marker."""
+
+    # The positions are in meters
+    position_threshold = POSITION_THRESHOLD
+
+    def __init__(self, camera_matrix: np.ndarray, dist_coeffs: np.ndarray, dict: int, marker_length: float = DEFAULT_MARKER_LENGTH, calibrated_size: tuple[int, int] | None = None, roi: bool = False, rescan_interval: int = RESCAN_INTERVAL, table_pose: tuple[np.ndarray, np.ndarray] | None = None):
+        """
+        :param camera_matrix: The 3x3 camera matrix.
+        :param dist_coeffs: The distortion coefficients.
+        :param dict: The ArUco dictionary the markers were generated with.
+        :param marker_length: The side length of the printed markers in meters.
+        :param calibrated_size: The (width, height) the camera was calibrated at. If frames of another resolution
+            are processed, the camera matrix is scaled accordingly.
+        :param roi: If True, markers are only searched for around their predicted positions (see `RoiMarkerDetector`).
+        :param rescan_interval: The number of frames between two full-frame rescans in ROI mode.
+        :param table_pose: The rotation and translation vector of the table in camera coordinates. If given, the
+            poses are estimated in table coordinates instead of camera coordinates.
+        :raises ValueError: If the dictionary is unknown.
+        """
+
+        super().__init__(dict, roi, rescan_interval)
+        self.settings = (camera_matrix, dist_coeffs, dict, marker_length, calibrated_size, roi, rescan_interval, table_pose)
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64)
+        self.calibrated_size = calibrated_size
+        self._frame_size = calibrated_size
+        self._frame_camera_matrix = self.camera_matrix
+        # Transposed table rotation and table origin, to turn camera coordinates into table coordinates
+        self.table_rotation = None
+        self.table_origin = None
+        if table_pose is not None:
+            self.table_rotation = cv2.Rodrigues(np.asarray(table_pose[0], dtype=np.float64))[0].T
+            self.table_origin = np.asarray(table_pose[1], dtype=np.float64).reshape(3, 1)
+        # Corners of the marker in its own coordinate system, in the order solvePnP's IPPE_SQUARE method expects
+        half = marker_length / 2
+        self.object_points = np.array([[-half, half, 0], [half, half, 0], [half, -half, 0], [-half, -half, 0]], dtype=np.float32)
+
+    def estimate(self, corners: tuple[np.ndarray, ...], ids: np.ndarray | None, frame_size: tuple[int, int]) -> list[TrackedMarker]:
+        """Estimates the pose of every detected marker.
+
+        :param corners: The detected marker corners, as returned by `detect`.
+        :param ids: The detected marker IDs, as returned by `detect`.
+        :param frame_size: The (width, height) of the frame the markers were detected in.
+        :return: The poses of the markers.
+        """
+
+        if ids is None:
+            return []
+        camera_matrix = self.camera_matrix_for(frame_size)
+        markers = []
+        with instrumentation.span("estimate"):
+            for marker_corners, marker_id in zip(corners, ids.ravel()):
+                # Same as solvePnP, but also returns the reprojection error of the best solution at no extra cost
+                solutions, rvecs, tvecs, errors = cv2.solvePnPGeneric(self.object_points, marker_corners.reshape(4, 2), camera_matrix, self.dist_coeffs, flags=cv2.SOLVEPNP_IPPE_SQUARE)
+                if solutions == 0:
+                    continue
+                rotation, _ = cv2.Rodrigues(rvecs[0])
+                position = tvecs[0]
+                if self.table_rotation is not None:
+                    rotation = self.table_rotation @ rotation
+                    position = self.table_rotation @ (position - self.table_origin)
+                # Angle of the marker's x-axis projected onto the image plane, or onto the table
+                angle = math.degrees(math.atan2(rotation[1, 0], rotation[0, 0]))
+                confidence = 1.0 / (1.0 + float(errors[0, 0]))
+                markers.append(TrackedMarker(int(marker_id), float(position[0, 0]), float(position[1, 0]), angle, confidence))
+        instrumentation.count("markers.tracked", len(markers))
+        return markers
+
+    def camera_matrix_for(self, frame_size: tuple[int, int]) -> np.ndarray:
+        # Only rescale the camera matrix when the frame size changes, not on every frame
+        if frame_size != self._frame_size:
+            self._frame_size = frame_size
+            calibrated_size = self.calibrated_size or frame_size
+            self._frame_camera_matrix = scale_camera_matrix(self.camera_matrix, calibrated_size, frame_size)
+        return self._frame_camera_matrix
+
+class MarkerTracker:
+    """Real-time marker tracking pipeline.
+
+    Capture, detection and output each run on their own thread. The stages are connected by bounded queues that
+    drop the oldest item when full, so every stage always works on the most recent frame and latency stays within
+    one frame instead of piling up when detection can't keep up with the camera.
+
+    With `detect_workers`, detection runs in that many processes instead of a thread, so it scales across cores.
+    The capture thread then converts every frame straight into a shared-memory `FrameRing`, the workers take turns
+    detecting the latest frame of their turn in place, and only the poses travel back to the output thread.
+    """
+
+    def __init__(self, estimator: MarkerEstimator, source: int | str, output: Callable[[FramePoses], None], resolution: tuple[int, int] | None = None, queue_size: int = QUEUE_SIZE, detect_workers: int = 0, ring_slots: int = RING_SLOTS):
+        """
+        :param estimator: The estimator to run on every frame, e.g. a `MarkerPoseEstimator`.
+        :param source: The camera index or video file/stream to capture from.
+        :param output: Called with the poses of every processed frame, on the output thread.
+        :param resolution: The (width, height) to request from the camera. Defaults to the camera's default.
+        :param queue_size: The number of items each queue holds before dropping the oldest. Default is 1.
+        :param detect_workers: The number of detection processes. Default is 0, which detects on a thread.
+        :param ring_slots: The number of frames the shared-memory ring holds with detection processes.
+            Default is RING_SLOTS.
+        """
+
+        self.estimator = estimator
+        self.source = source
+        self.output = output
+        self.resolution = resolution
+        self.detect_workers = detect_workers
+        self.ring_slots = ring_slots
+        self.frames = DropOldestQueue(queue_size)
+        self.poses = DropOldestQueue(queue_size)
+        self.ring = None
+        # Spawned instead of forked, forking a process that already runs OpenCV and capture threads can deadlock
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = []
+        self._results = None
+        self._ring_dropped = self._context.Value("q", 0)
+        self._stop = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def start(self):
+        """Starts the pipeline.
+
+        :raises RuntimeError: If detection runs in processes and the source delivers no frames.
+        """
+
+        self._stop.clear()
+        capture = cv2.VideoCapture(self.source)
+        if self.resolution is not None:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
+        if self.detect_workers > 0:
+            # The ring is sized by the first frame, which is the first one the workers get
+            success, frame = capture.read()
+            if not success:
+                capture.release()
+                raise RuntimeError(f"No frames from source '{self.source}'.")
+            self.ring = FrameRing(frame.shape[:2], self.ring_slots, context=self._context)
+            self.ring.write(frame, time.perf_counter())
+            with self._stats_lock:
+                self._capture_count += 1
+            self._results = self._context.Queue()
+            self._workers = [self._context.Process(target=detection_worker, args=(self.ring, index, self.detect_workers, type(self.estimator), self.estimator.settings, self._results, self._ring_dropped, instrumentation.worker_settings()), name=f"detect-{index}", daemon=True) for index in range(self.detect_workers)]
+            for worker in self._workers:
+                worker.start()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, args=(capture,), name="capture", daemon=True),
+            threading.Thread(target=self._detect_loop if self.ring is None else self._collect_loop, name="detect", daemon=True),
+            threading.Thread(target=self._output_loop, name="output", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def run(self):
+        """Runs the pipeline until the source runs out of frames or the user presses Ctrl+C, reporting statistics."""
+
+        self.start()
+        last_report = time.perf_counter()
+        try:
+            while self.running:
+                self._threads[-1].join(POLL_INTERVAL)
+                if time.perf_counter() - last_report >= STATS_INTERVAL:
+                    print(self.report())
+                    last_report = time.perf_counter()
+        except KeyboardInterrupt:
+            print("[EXITED] Tracking stopped by user.")
+        finally:
+            self.stop()
+        print(self.report())
+
+    def report(self) -> str:
+        with self._stats_lock:
+            elapsed = max(time.perf_counter() - self._stats_start, 1e-9)
+            latency = self._latency_total / self._output_count * 1000 if self._output_count > 0 else 0.0
+            line = f"[STATS] capture {self._capture_count / elapsed:.1f} fps, output {self._output_count / elapsed:.1f} fps, dropped {self.frames.dropped + self.poses.dropped + self._ring_dropped.value} frames, latency avg {latency:.1f} ms / max {self._latency_max * 1000:.1f} ms"
+        roi_detector = self.estimator.roi_detector
+        # With detection processes the estimator of this process isn't used, its timings stay empty
+        if roi_detector is not None and self.detect_workers == 0:
+            timings = roi_detector.latency_report()
+            line += f", detection ROI {timings["roi_mean_ms"]:.1f} ms ({timings["roi_count"]}x) / full frame {timings["full_mean_ms"]:.1f} ms ({timings["full_count"]}x)"
+        self._reset_stats()
+        return line
+
+    def _reset_stats(self):
+        with self._stats_lock:
+            self._stats_start = time.perf_counter()
+            self._capture_count = 0
+            self._output_count = 0
+            self._latency_total = 0.0
+            self._latency_max = 0.0
+            self.frames.dropped = 0
+            self.poses.dropped = 0
+            self._ring_dropped.value = 0
+
+    def _capture_loop(self, capture: cv2.VideoCapture):
+        frame_index = 0
+        frame = None
+        try:
+            while not self._stop.is_set():
+                with instrumentation.span("capture"):
+                    # With a ring every frame is converted into it right away, so the capture buffer can be reused
+                    success, frame = capture.read(frame if self.ring is not None else None)
+                if not success:
+                    break
+                if self.ring is not None:
+                    timestamp = time.perf_counter()
+                    with instrumentation.span("grayscale"):
+                        self.ring.write(frame, timestamp)
+                else:
+                    self.frames.put((frame_index, time.perf_counter(), frame))
+                    frame_index += 1
+                with self._stats_lock:
+                    self._capture_count += 1
+        finally:
+            capture.release()
+            # Tell the next stage there are no more frames
+            if self.ring is not None:
+                self.ring.close_writer()
+            else:
+                self.frames.put(None)
+
+    def _detect_loop(self):
+        while True:
+            item = self._next(self.frames)
+            if item is None:
+                break
+            frame_index, timestamp, frame = item
+            with instrumentation.span("grayscale"):
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+            self.poses.put(FramePoses(frame_index, timestamp, self.estimator.process(gray)))
+        self.poses.put(None)
+
+    def _collect_loop(self):
+        # Forwards the poses from the detection processes, which may finish frames out of order
+        finished = 0
+        last_frame_index = -1
+        while finished < len(self._workers):
+            try:
+                poses = self._results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in self._workers):
+                    break
+                continue
+            if poses is None:
+                finished += 1
+            elif poses.frame_index < last_frame_index:
+                # A newer frame was already sent on
+                with self._ring_dropped.get_lock():
+                    self._ring_dropped.value += 1
+            else:
+                last_frame_index = poses.frame_index
+                self.poses.put(poses)
+        self.poses.put(None)
+
+    def _output_loop(self):
+        while True:
+            poses = self._next(self.poses)
+            if poses is None:
+                break
+            self.output(poses)
+            latency = time.perf_counter() - poses.timestamp
+            with self._stats_lock:
+                self._output_count += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+
+    def _next(self, source_queue: DropOldestQueue):
+        # Returns None once the previous stage is done or the pipeline is stopped
+        while not self._stop.is_set():
+            try:
+                return source_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
+
+def detection_worker(ring: FrameRing, index: int, workers: int, estimator_class: type, estimator_settings: tuple, results: multiprocessing.Queue, dropped: multiprocessing.Value, instrumentation_settings: tuple | None = None):
+    """Detects markers in the frames of a ring until its writer closes it, see `MarkerTracker`.
+
+    The workers take turns: worker `index` handles the frames whose sequence number is `index + 1` modulo `workers`,
+    and always the latest of those, so a slow worker skips frames instead of falling behind.
+
+    :param ring: The ring the frames are written to.
+    :param index: The index of this worker, from 0 to `workers` - 1.
+    :param workers: The number of workers.
+    :param estimator_class: The class of the estimator to run, a `MarkerEstimator` subclass.
+    :param estimator_settings: The `settings` of the estimator, its constructor arguments.
+    :param results: The queue the poses of every frame are put on, followed by None when done.
+    :param dropped: Counter of the frames that were skipped or overwritten before they were detected.
+    :param instrumentation_settings: The settings returned by `instrumentation.worker_settings`.
+    """
+
+    # Ctrl+C is handled by the main process, which stops the capture and with it the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    instrumentation.init_worker(instrumentation_settings)
+    estimator = estimator_class(*estimator_settings)
+    next_sequence_number = index + 1
+    try:
+        while True:
+            latest = ring.wait(next_sequence_number - 1, POLL_INTERVAL)
+            if latest < next_sequence_number:
+                if ring.closed:
+                    break
+                continue
+            # The latest frame of this worker's turn, skipping the older ones
+            sequence_number = latest - (latest - next_sequence_number) % workers
+            skipped = (sequence_number - next_sequence_number) // workers
+            next_sequence_number = sequence_number + workers
+            detected = False
+            frame = ring.read(sequence_number)
+            if frame is not None:
+                gray, timestamp = frame
+                markers = estimator.process(gray)
+                # The ring can't be closed while a view of its memory is still referenced
+                frame = gray = None
+                # A frame that was overwritten while it was detected is dropped
+                detected = ring.is_current(sequence_number)
+                if detected:
+                    results.put(FramePoses(sequence_number - 1, timestamp, markers))
+            lost = skipped + (not detected)
+            if lost > 0:
+                with dropped.get_lock():
+                    dropped.value += lost
+    finally:
+        results.put(None)
+        ring.close()
+
+def print_poses(poses: FramePoses):
+    markers = " ".join(f"[{marker.marker_id}: x={marker.x:.4f} y={marker.y:.4f} angle={marker.angle:.1f}]" for marker in poses.markers)
+    print(f"{poses.frame_index}: {markers}")
+
+def parse_source(value: str) -> int | str:
+    # Camera indices are plain integers, anything else is a file or stream URL
+    return int(value) if value.isdigit() else value
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Track the totem markers and print their positions and orientations.")
+    parser.add_argument("--calibration", default=None, help=f"calibration file written by the calibrate command (default: {BUNDLE_FILE} if it exists, else calibration_data.json)")
+    parser.add_argument("--table", metavar="PATH", default=None, help="locate the markers on the table with the homography written by the table command instead of estimating their pose, in millimeters")
+    parser.add_argument("--projector", action="store_true", help="with --table, locate the markers in projector UV instead of millimeters")
+    parser.add_argument("--dict", default=DEFAULT_DICTIONARY, help=f"name of the ArUco dictionary of the markers (default: {DEFAULT_DICTIONARY})")
+    parser.add_argument("--marker-length", type=float, default=DEFAULT_MARKER_LENGTH, help=f"side length of the printed markers in meters (default: {DEFAULT_MARKER_LENGTH})")
+    parser.add_argument("--source", type=parse_source, default=0, help="camera index or video file/stream (default: 0)")
+    parser.add_argument("--roi", action="store_true", help="only search for markers around their predicted positions, with periodic full-frame rescans")
+    parser.add_argument("--rescan-interval", type=int, default=RESCAN_INTERVAL, help=f"frames between two full-frame rescans in ROI mode (default: {RESCAN_INTERVAL})")
+    parser.add_argument("--udp", metavar="HOST:PORT", default=None, help="also send the poses as binary UDP packets to this address (see the receive command)")
+    parser.add_argument("--no-delta", action="store_true", help="send every marker in every UDP packet instead of only the ones that moved")
+    parser.add_argument("--detect-workers", type=int, default=0, help="detect in this many processes, fed through shared memory (default: 0, detect on a thread)")
+    parser.add_argument("--quiet", action="store_true", help="only print statistics, not the poses of every frame")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.calibration is None:
+        args.calibration = BUNDLE_FILE if os.path.exists(BUNDLE_FILE) else "calibration_data.json"
+
+    dict = getattr(cv2.aruco, args.dict, None)
+    if dict not in aruco_dictionaries():
+        print(f": [Error] Unknown ArUco dictionary '{args.dict}'.")
+        sys.exit(2)
+    if args.table is not None:
+        # Imported here, table_homography itself imports this module
+        from .table_homography import TableMarkerEstimator, load_table_homography
+        try:
+            table = load_table_homography(args.table)
+            estimator = TableMarkerEstimator(table, dict, args.roi, args.rescan_interval, args.projector)
+        except (OSError, KeyError, ValueError) as err:
+            print(f": [Error] Could not load table homography '{args.table}': {err}")
+            sys.exit(1)
+        image_size = table.image_size
+    else:
+        try:
+            camera_matrix, dist_coeffs, image_size = load_calibration(args.calibration)
+        except (OSError, KeyError, ValueError) as err:
+            print(f": [Error] Could not load calibration '{args.calibration}': {err}")
+            sys.exit(1)
+        estimator = MarkerPoseEstimator(camera_matrix, dist_coeffs, dict, args.marker_length, image_size, args.roi, args.rescan_interval)
+
+    outputs = [] if args.quiet else [print_poses]
+    publisher = None
+    if args.udp is not None:
+        # Imported here, pose_stream itself imports this module
+        from .pose_stream import PosePublisher
+        host, _, port = args.udp.rpartition(":")
+        if not host or not port.isdigit():
+            print(f": [Error] Invalid UDP address '{args.udp}', expected HOST:PORT.")
+            sys.exit(2)
+        publisher = PosePublisher(host, int(port), delta=not args.no_delta, position_threshold=estimator.position_threshold)
+        outputs.append(publisher.publish)
+
+    def output(poses: FramePoses):
+        for write in outputs:
+            write(poses)
+
+    tracker = MarkerTracker(estimator, args.source, output, resolution=image_size, detect_workers=args.detect_workers)
+    print(f"[STARTED] Tracking {args.dict} markers from source '{args.source}'. Press Ctrl+C to stop.")
+    try:
+        with instrumentation.session(args.stats, args.trace, args.profile):
+            tracker.run()
+    finally:
+        if publisher is not None:
+            print(f"[INFO] Sent {publisher.sent_packets} UDP packets ({publisher.sent_bytes} bytes).")
+            publisher.close()
+
+if __name__ == "__main__":
+    main()
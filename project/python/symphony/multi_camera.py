@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable
+
+from . import instrumentation
+from .calibration_bundle import BUNDLE_FILE, load_bundle
+from .camera_calibration import CACHE_DIR, SNAPSHOT_EXTENSION, calibrate_snapshots, create_charuco_board, create_charuco_detector, detect_charuco, save_calibration
+from .lazy import lazy_import
+from .marker_generation import aruco_dictionaries
+from .marker_tracking import DEFAULT_DICTIONARY, DEFAULT_MARKER_LENGTH, POLL_INTERVAL, STATS_INTERVAL, FramePoses, MarkerPoseEstimator, MarkerTracker, TrackedMarker, parse_source, print_poses
+from .pose_stream import PosePublisher
+from .undistortion import scale_camera_matrix
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+# Directory inside the snapshots directory with one snapshot per camera of the board lying flat on the table
+TABLE_DIR = "table"
+# Directory the calibration of every camera is saved to, in a subdirectory per camera
+CAMERAS_DIR = "cameras"
+# The board must show at least this many ChArUco corners in a table snapshot to locate the table
+MIN_TABLE_CORNERS = 12
+# Observations older than this are left out of the fused poses, in seconds
+MAX_OBSERVATION_AGE = 0.1
+
+def estimate_table_pose(image: np.ndarray, camera_matrix: np.ndarray, dist_coeffs: np.ndarray, board: cv2.aruco.CharucoBoard, detector: cv2.aruco.CharucoDetector) -> tuple[np.ndarray, np.ndarray, float] | None:
+    """Locates the table in a camera's view from a snapshot of the ChArUco board lying flat on it.
+
+    The board defines the table coordinates: the origin is its first corner, x and y run along its edges in meters
+    and z is its normal. Every camera that sees the board at the same time gets poses in the same coordinates.
+
+    :param image: The grayscale snapshot.
+    :param camera_matrix: The camera matrix, valid for the snapshot's resolution.
+    :param dist_coeffs: The distortion coefficients.
+    :param board: The board on the table.
+    :param detector: The detector created by `create_charuco_detector`.
+    :return: The rotation and translation vector of the table in camera coordinates and the RMS reprojection error
+        in pixels, or None if too little of the board is visible.
+    """
+
+    charuco_corners, charuco_ids, _ = detect_charuco(image, board, detector)
+    if charuco_ids is None or len(charuco_ids) < MIN_TABLE_CORNERS:
+        return None
+    object_points, image_points = board.matchImagePoints(charuco_corners, charuco_ids)
+    success, rvec, tvec = cv2.solvePnP(object_points, image_points, camera_matrix, dist_coeffs)
+    if not success:
+        return None
+    projected, _ = cv2.projectPoints(object_points, rvec, tvec, camera_matrix, dist_coeffs)
+    error = float(np.sqrt(np.mean(np.sum((projected.reshape(-1, 2) - image_points.reshape(-1, 2)) ** 2, axis=1))))
+    return rvec, tvec, error
+
+def calibrate_cameras(snapshots_dir: str, table_dir: str, output_dir: str, use_cache: bool = True, workers: int | None = None) -> list[str]:
+    """Calibrates every camera from its own snapshots and locates the table in its view.
+
+    `snapshots_dir` holds a subdirectory of snapshots per camera, named after the camera. `table_dir` holds one
+    snapshot per camera, named '<camera>.jpg', all taken while the board lay still on the table. Every camera is
+    saved to its own subdirectory of `output_dir` (see `save_calibration`), with the pose of the table.
+
+    :param snapshots_dir: The directory with the snapshots of every camera.
+    :param table_dir: The directory with the table snapshots.
+    :param output_dir: The directory to save the calibrations to.
+    :param use_cache: If True, detections cached by earlier runs are reused. Default is True.
+    :param workers: The number of detection processes per camera. Defaults to the number of CPUs.
+    :return: The names of the cameras that were calibrated.
+    """
+
+    table_dir = os.path.abspath(table_dir)
+    cameras = sorted(name for name in os.listdir(snapshots_dir) if os.path.isdir(os.path.join(snapshots_dir, name)) and os.path.abspath(os.path.join(snapshots_dir, name)) != table_dir and name != CACHE_DIR)
+    board = create_charuco_board()
+    detector = create_charuco_detector(board)
+    calibrated = []
+    for camera in cameras:
+        print(f"[STARTED] Calibrating camera '{camera}'...")
+        table_path = os.path.join(table_dir, camera + SNAPSHOT_EXTENSION)
+        table_image = cv2.imread(table_path, cv2.IMREAD_GRAYSCALE)
+        if table_image is None:
+            print(f": [Error] No table snapshot '{table_path}' for camera '{camera}'. Skipping.")
+            continue
+        result = calibrate_snapshots(os.path.join(snapshots_dir, camera), use_cache, workers)
+        if result is None:
+            print(f"[FAILED] Could not calibrate camera '{camera}'.")
+            continue
+
+        table_size = (table_image.shape[1], table_image.shape[0])
+        table_camera_matrix = scale_camera_matrix(result.camera_matrix, result.image_size, table_size)
+        table_pose = estimate_table_pose(table_image, table_camera_matrix, result.dist_coeffs, board, detector)
+        if table_pose is None:
+            print(f"[FAILED] Camera '{camera}' sees less than {MIN_TABLE_CORNERS} corners of the board in '{table_path}'.")
+            continue
+        rvec, tvec, error = table_pose
+
+        directory = os.path.join(output_dir, camera)
+        os.makedirs(directory, exist_ok=True)
+        save_calibration(result.camera_matrix, result.dist_coeffs, result.image_size, result.rvecs, result.tvecs, directory, None, result.charuco_corners, result.charuco_ids, result.rms, (rvec, tvec))
+        # Where the camera is in table coordinates, to check the setup at a glance
+        position = -cv2.Rodrigues(rvec)[0].T @ tvec
+        print(f"[DONE] Camera '{camera}': RMS {result.rms:.3f} px, table located with {error:.3f} px error, camera at x={position[0, 0]:.3f} y={position[1, 0]:.3f} z={position[2, 0]:.3f} m.")
+        calibrated.append(camera)
+    return calibrated
+
+def load_camera(calibration_dir: str, camera: str) -> tuple[np.ndarray, np.ndarray, tuple[int, int], tuple[np.ndarray, np.ndarray]]:
+    """Loads a camera calibrated by `calibrate_cameras`.
+
+    :param calibration_dir: The directory the calibrations were saved to.
+    :param camera: The name of the camera.
+    :return: The camera matrix, distortion coefficients, calibrated (width, height) and pose of the table.
+    :raises OSError: If the calibration cannot be read.
+    :raises ValueError: If the calibration is invalid or doesn't locate the table.
+    """
+
+    bundle = load_bundle(os.path.join(calibration_dir, camera, BUNDLE_FILE))
+    if bundle.table_pose is None:
+        raise ValueError(f"The calibration of camera '{camera}' doesn't locate the table, calibrate it with the multi-camera calibrate command.")
+    return bundle.camera_matrix, bundle.dist_coeffs, bundle.image_size, bundle.table_pose
+
+class MarkerFuser:
+    """Fuses the marker poses of several cameras into one set of poses in table coordinates.
+
+    Every camera's latest observation of a marker is kept until the camera loses the marker or the observation is
+    older than `max_age`. A marker seen by several cameras gets the confidence-weighted mean of their positions and
+    angles, and a confidence of 1 - (1 - c1)(1 - c2)..., so a marker seen by two cameras is more certain than by one.
+    """
+
+    def __init__(self, output: Callable[[FramePoses], None], max_age: float = MAX_OBSERVATION_AGE):
+        """
+        :param output: Called with the fused poses after every camera frame.
+        :param max_age: The age in seconds after which an observation is left out. Default is MAX_OBSERVATION_AGE.
+        """
+
+        self.output = output
+        self.max_age = max_age
+        # Camera -> (capture time, markers) of its latest frame
+        self.observations = {}
+        self.frame_index = 0
+        self._lock = threading.Lock()
+
+    def add(self, camera: str, poses: FramePoses):
+        # Called from the output thread of every camera, the lock also keeps the output calls in order
+        with self._lock:
+            self.observations[camera] = (poses.timestamp, poses.markers)
+            frame = FramePoses(self.frame_index, poses.timestamp, self.fuse(poses.timestamp))
+            self.frame_index += 1
+            self.output(frame)
+
+    def fuse(self, now: float) -> list[TrackedMarker]:
+        # Marker ID -> the markers observed by the cameras
+        observed = {}
+        for timestamp, markers in self.observations.values():
+            if now - timestamp > self.max_age:
+                continue
+            for marker in markers:
+                observed.setdefault(marker.marker_id, []).append(marker)
+
+        fused = []
+        for marker_id, markers in sorted(observed.items()):
+            if len(markers) == 1:
+                fused.append(markers[0])
+                continue
+            weights = [marker.confidence for marker in markers]
+            total = sum(weights)
+            x = sum(weight * marker.x for weight, marker in zip(weights, markers)) / total
+            y = sum(weight * marker.y for weight, marker in zip(weights, markers)) / total
+            # Angles are averaged as unit vectors, so -179 and 179 average to 180 instead of 0
+            sin = sum(weight * math.sin(math.radians(marker.angle)) for weight, marker in zip(weights, markers))
+            cos = sum(weight * math.cos(math.radians(marker.angle)) for weight, marker in zip(weights, markers))
+            confidence = 1.0 - math.prod(1.0 - weight for weight in weights)
+            fused.append(TrackedMarker(marker_id, x, y, math.degrees(math.atan2(sin, cos)), confidence))
+        return fused
+
+class MultiCameraTracker:
+    """Tracks the markers with several cameras at once and fuses their poses, see `MarkerFuser`.
+
+    Every camera runs its own `MarkerTracker` with its own detection process, so detection scales with the number
+    of cameras across cores and a slow camera never holds up the others.
+    """
+
+    def __init__(self, trackers: dict[str, MarkerTracker], fuser: MarkerFuser):
+        """
+        :param trackers: The tracker of every camera, by camera name, whose output must go to `fuser`.
+        :param fuser: The fuser combining the poses of all cameras.
+        """
+
+        self.trackers = trackers
+        self.fuser = fuser
+
+    def run(self):
+        """Runs all cameras until every source runs out of frames or the user presses Ctrl+C, reporting statistics.
+
+        :raises RuntimeError: If a camera delivers no frames.
+        """
+
+        started = []
+        last_report = time.perf_counter()
+        try:
+            for tracker in self.trackers.values():
+                tracker.start()
+                started.append(tracker)
+            while any(tracker.running for tracker in started):
+                time.sleep(POLL_INTERVAL)
+                if time.perf_counter() - last_report >= STATS_INTERVAL:
+                    self.print_report()
+                    last_report = time.perf_counter()
+        except KeyboardInterrupt:
+            print("[EXITED] Tracking stopped by user.")
+        finally:
+            for tracker in started:
+                tracker.stop()
+        self.print_report()
+
+    def print_report(self):
+        for camera, tracker in self.trackers.items():
+            print(f"{tracker.report()} [{camera}]")
+
+def parse_camera(value: str) -> tuple[str, int | str]:
+    name, separator, source = value.partition("=")
+    if not separator or not name or not source:
+        raise argparse.ArgumentTypeError(f"Invalid camera '{value}', expected NAME=SOURCE.")
+    return name, parse_source(source)
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Calibrate several cameras over the same table and track the markers with all of them at once.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    calibrate_parser = subparsers.add_parser("calibrate", help="calibrate every camera and locate the table in its view")
+    calibrate_parser.add_argument("snapshots_dir", nargs="?", default="calibration_snapshots", help="directory with a subdirectory of snapshots per camera (default: ./calibration_snapshots)")
+    calibrate_parser.add_argument("--table", default=None, help=f"directory with a '<camera>{SNAPSHOT_EXTENSION}' per camera of the board lying on the table (default: SNAPSHOTS_DIR/{TABLE_DIR})")
+    calibrate_parser.add_argument("--output", default=CAMERAS_DIR, help=f"directory to save the calibrations to (default: {CAMERAS_DIR})")
+    calibrate_parser.add_argument("--workers", type=int, default=None, help="number of detection processes (default: number of CPUs)")
+    calibrate_parser.add_argument("--no-cache", action="store_true", help="detect every snapshot again instead of reusing cached detections")
+    track_parser = subparsers.add_parser("track", help="track the markers with all cameras and print the fused poses in table coordinates")
+    track_parser.add_argument("--camera", type=parse_camera, action="append", required=True, metavar="NAME=SOURCE", help="a calibrated camera and its camera index or video file/stream, once per camera")
+    track_parser.add_argument("--calibration-dir", default=CAMERAS_DIR, help=f"directory the calibrations were saved to (default: {CAMERAS_DIR})")
+    track_parser.add_argument("--dict", default=DEFAULT_DICTIONARY, help=f"name of the ArUco dictionary of the markers (default: {DEFAULT_DICTIONARY})")
+    track_parser.add_argument("--marker-length", type=float, default=DEFAULT_MARKER_LENGTH, help=f"side length of the printed markers in meters (default: {DEFAULT_MARKER_LENGTH})")
+    track_parser.add_argument("--roi", action="store_true", help="only search for markers around their predicted positions, with periodic full-frame rescans")
+    track_parser.add_argument("--max-age", type=float, default=MAX_OBSERVATION_AGE, help=f"seconds after which an observation is left out of the fused poses (default: {MAX_OBSERVATION_AGE})")
+    track_parser.add_argument("--udp", metavar="HOST:PORT", default=None, help="also send the fused poses as binary UDP packets to this address (see the receive command)")
+    track_parser.add_argument("--quiet", action="store_true", help="only print statistics, not the fused poses of every frame")
+    instrumentation.add_arguments(track_parser)
+    args = parser.parse_args(argv)
+
+    if args.command == "calibrate":
+        table_dir = args.table if args.table is not None else os.path.join(args.snapshots_dir, TABLE_DIR)
+        if not os.path.isdir(args.snapshots_dir) or not os.path.isdir(table_dir):
+            print(f": [Error] '{args.snapshots_dir}' or '{table_dir}' is not a directory.")
+            sys.exit(2)
+        calibrated = calibrate_cameras(args.snapshots_dir, table_dir, args.output, use_cache=not args.no_cache, workers=args.workers)
+        if len(calibrated) == 0:
+            print("[FAILED] No camera could be calibrated.")
+            sys.exit(1)
+        print(f"[DONE] Calibrated {len(calibrated)} cameras ({", ".join(calibrated)}) into '{args.output}'.")
+        return
+
+    dict = getattr(cv2.aruco, args.dict, None)
+    if dict not in aruco_dictionaries():
+        print(f": [Error] Unknown ArUco dictionary '{args.dict}'.")
+        sys.exit(2)
+    cameras = {}
+    for name, source in args.camera:
+        try:
+            cameras[name] = (source, *load_camera(args.calibration_dir, name))
+        except (OSError, ValueError) as err:
+            print(f": [Error] Could not load camera '{name}': {err}")
+            sys.exit(1)
+
+    outputs = [] if args.quiet else [print_poses]
+    publisher = None
+    if args.udp is not None:
+        host, _, port = args.udp.rpartition(":")
+        if not host or not port.isdigit():
+            print(f": [Error] Invalid UDP address '{args.udp}', expected HOST:PORT.")
+            sys.exit(2)
+        publisher = PosePublisher(host, int(port))
+        outputs.append(publisher.publish)
+
+    def output(poses: FramePoses):
+        for write in outputs:
+            write(poses)
+
+    fuser = MarkerFuser(output, args.max_age)
+    trackers = {}
+    for name, (source, camera_matrix, dist_coeffs, image_size, table_pose) in cameras.items():
+        estimator = MarkerPoseEstimator(camera_matrix, dist_coeffs, dict, args.marker_length, image_size, args.roi, table_pose=table_pose)
+        trackers[name] = MarkerTracker(estimator, source, lambda poses, name=name: fuser.add(name, poses), resolution=image_size, detect_workers=1)
+    print(f"[STARTED] Tracking {args.dict} markers with {len(trackers)} cameras ({", ".join(trackers)}). Press Ctrl+C to stop.")
+    try:
+        with instrumentation.session(args.stats, args.trace, args.profile):
+            MultiCameraTracker(trackers, fuser).run()
+    except RuntimeError as err:
+        print(f": [Error] {err}")
+        sys.exit(1)
+    finally:
+        if publisher is not None:
+            print(f"[INFO] Sent {publisher.sent_packets} UDP packets ({publisher.sent_bytes} bytes).")
+            publisher.close()
+
+if __name__ == "__main__":
+    main()
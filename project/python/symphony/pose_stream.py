@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import argparse
+import socket
+import struct
+import sys
+import time
+from typing import NamedTuple
+
+from .lazy import lazy_import
+from .marker_tracking import POSITION_THRESHOLD, FramePoses, TrackedMarker
+
+np = lazy_import("numpy")
+
+# CONSTANTS
+# Default address the poses are sent to, e.g. a UDP In DAT in TouchDesigner
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9000
+# Identifies pose packets and their layout version
+PACKET_MAGIC = b"SOLP"
+PACKET_VERSION = 1
+# Packet header: magic, version, flags, marker count, sequence number, frame index, capture time in microseconds since the epoch
+HEADER = struct.Struct("<4sBBHIIQ")
+# Marker record: ID, flags, padding, x and y in the unit of the tracking mode (meters, or with a table homography
+# millimeters on the table or projector UV), angle in degrees, confidence
+RECORD = struct.Struct("<HBxffff")
+# At most this many markers are sent per packet, so a packet always fits in a single 1500 byte Ethernet frame
+MAX_MARKERS_PER_PACKET = 64
+# Header flag: the packet holds every visible marker instead of only the ones that changed
+FLAG_KEYFRAME = 0x01
+# Record flag: the marker is no longer visible
+FLAG_REMOVED = 0x01
+# Every this many frames a keyframe is sent, so receivers recover from lost packets
+KEYFRAME_INTERVAL = 30
+# A marker that turned less than this since it was last sent is left out of delta packets
+ANGLE_THRESHOLD = 0.5  # In degrees
+
+class PosePacket(NamedTuple):
+    """A decoded pose packet.
+
+    - sequence: The number of the packet since the publisher started, to detect lost packets.
+    - frame_index: The index of the camera frame the poses were estimated from.
+    - timestamp: The time the frame was captured, in seconds since the epoch.
+    - keyframe: True if `markers` holds every visible marker, False if only the ones that changed.
+    - markers: The poses of the markers.
+    - removed: The IDs of the markers that are no longer visible.
+    """
+
+    sequence: int
+    frame_index: int
+    timestamp: float
+    keyframe: bool
+    markers: list[TrackedMarker]
+    removed: list[int]
+
+class PosePublisher:
+    """Sends the marker poses of every frame as binary UDP packets.
+
+    A packet is a `HEADER` followed by one `RECORD` per marker, all little-endian. The positions are sent as the
+    estimator reports them: in meters when estimating poses, in millimeters on the table or in projector UV with a
+    table homography. Packets are packed into a send
+    buffer allocated once, so publishing doesn't allocate per frame. Unless `delta` is disabled, markers that
+    didn't move are left out and markers that disappeared are sent once with `FLAG_REMOVED`. Every
+    `keyframe_interval` frames a keyframe with all visible markers is sent. A frame with more than
+    `MAX_MARKERS_PER_PACKET` records is split over several packets, only the first of which is the keyframe, the
+    rest add to it like delta packets.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, delta: bool = True, keyframe_interval: int = KEYFRAME_INTERVAL, position_threshold: float = POSITION_THRESHOLD):
+        """
+        :param host: The host to send the packets to.
+        :param port: The UDP port to send the packets to.
+        :param delta: If True, only markers that moved, appeared or disappeared are sent between keyframes. Default is True.
+        :param keyframe_interval: The number of frames between two keyframes. Default is KEYFRAME_INTERVAL.
+        :param position_threshold: A marker that moved less than this is left out of delta packets, in the unit of
+            the positions. Default is POSITION_THRESHOLD, for meters. Take the estimator's `position_threshold`.
+        """
+
+        self.address = (host, port)
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.position_threshold = position_threshold
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.buffer = bytearray(HEADER.size + MAX_MARKERS_PER_PACKET * RECORD.size)
+        self._view = memoryview(self.buffer)
+        self.sequence = 0
+        self.sent_packets = 0
+        self.sent_bytes = 0
+        # Last pose sent per marker ID
+        self._sent = {}
+        self._frames_since_keyframe = keyframe_interval
+        # Capture timestamps are `time.perf_counter()` values, convert them to wall-clock time for the receiver
+        self._clock_offset = time.time() - time.perf_counter()
+
+    def publish(self, poses: FramePoses):
+        """Sends the poses of a frame. Can be used as the output of a `MarkerTracker`.
+
+        :param poses: The poses of the frame.
+        """
+
+        self._frames_since_keyframe += 1
+        keyframe = not self.delta or self._frames_since_keyframe >= self.keyframe_interval
+        if keyframe:
+            self._frames_since_keyframe = 0
+
+        flags = FLAG_KEYFRAME if keyframe else 0
+        count = 0
+        visible = set()
+        for marker in poses.markers:
+            visible.add(marker.marker_id)
+            if not keyframe and not self._moved(marker):
+                continue
+            if count == MAX_MARKERS_PER_PACKET:
+                # The rest of the frame follows in packets without the keyframe flag, which add to the first one
+                if not self._send(poses, flags, count):
+                    return
+                flags, count = 0, 0
+            RECORD.pack_into(self.buffer, HEADER.size + count * RECORD.size, marker.marker_id, 0, marker.x, marker.y, marker.angle, marker.confidence)
+            self._sent[marker.marker_id] = marker
+            count += 1
+        for marker_id in [marker_id for marker_id in self._sent if marker_id not in visible]:
+            # Keyframes replace the receiver's state, so they don't need to list removed markers
+            if not keyframe:
+                if count == MAX_MARKERS_PER_PACKET:
+                    if not self._send(poses, flags, count):
+                        return
+                    flags, count = 0, 0
+                RECORD.pack_into(self.buffer, HEADER.size + count * RECORD.size, marker_id, FLAG_REMOVED, 0.0, 0.0, 0.0, 0.0)
+                count += 1
+            del self._sent[marker_id]
+
+        # Nothing changed since the last packet, or the last packet of the frame was full
+        if count == 0 and not flags & FLAG_KEYFRAME:
+            return
+        self._send(poses, flags, count)
+
+    __call__ = publish
+
+    def close(self):
+        self.socket.close()
+
+    def _send(self, poses: FramePoses, flags: int, count: int) -> bool:
+        size = HEADER.size + count * RECORD.size
+        timestamp_us = int((poses.timestamp + self._clock_offset) * 1_000_000)
+        HEADER.pack_into(self.buffer, 0, PACKET_MAGIC, PACKET_VERSION, flags, count, self.sequence, poses.frame_index, timestamp_us)
+        try:
+            self.socket.sendto(self._view[:size], self.address)
+        except OSError as err:
+            # Nobody listening (e.g. ICMP port unreachable) must not stop the tracking
+            print(f": [Alert] Could not send poses to {self.address[0]}:{self.address[1]}: {err}")
+            return False
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        self.sent_packets += 1
+        self.sent_bytes += size
+        return True
+
+    def _moved(self, marker: TrackedMarker) -> bool:
+        previous = self._sent.get(marker.marker_id)
+        if previous is None:
+            return True
+        # Compare the angle on the circle, so -179.9 and 180 are 0.1 degrees apart
+        angle_delta = abs((marker.angle - previous.angle + 180) % 360 - 180)
+        return abs(marker.x - previous.x) > self.position_threshold or abs(marker.y - previous.y) > self.position_threshold or angle_delta > ANGLE_THRESHOLD
+
+def unpack_packet(data: bytes) -> PosePacket:
+    """Decodes a packet sent by `PosePublisher`.
+
+    :param data: The content of the UDP datagram.
+    :return: The decoded packet.
+    :raises ValueError: If the data is not a pose packet of a supported version.
+    """
+
+    if len(data) < HEADER.size:
+        raise ValueError(f"Packet of {len(data)} bytes is shorter than the header.")
+    magic, version, flags, count, sequence, frame_index, timestamp_us = HEADER.unpack_from(data, 0)
+    if magic != PACKET_MAGIC or version != PACKET_VERSION:
+        raise ValueError(f"Not a version {PACKET_VERSION} pose packet.")
+    if len(data) != HEADER.size + count * RECORD.size:
+        raise ValueError(f"Packet of {len(data)} bytes does not hold {count} markers.")
+
+    markers, removed = [], []
+    for marker_id, record_flags, x, y, angle, confidence in RECORD.iter_unpack(memoryview(data)[HEADER.size:]):
+        if record_flags & FLAG_REMOVED:
+            removed.append(marker_id)
+        else:
+            markers.append(TrackedMarker(marker_id, x, y, angle, confidence))
+    return PosePacket(sequence, frame_index, timestamp_us / 1_000_000, bool(flags & FLAG_KEYFRAME), markers, removed)
+
+class PoseReceiver:
+    """Stand-in for the receiving end, which keeps the current pose of every marker and measures the stream.
+
+    Latency is measured from frame capture to packet arrival. Sender and receiver must share a clock, so this is
+    only meaningful when both run on the same machine.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """
+        :param host: The address to listen on.
+        :param port: The UDP port to listen on.
+        """
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.buffer = bytearray(HEADER.size + MAX_MARKERS_PER_PACKET * RECORD.size)
+        # Current pose per marker ID
+        self.markers = {}
+        self.latencies = []
+        self.packets = 0
+        self.keyframes = 0
+        self.lost = 0
+        self.invalid = 0
+        self._last_sequence = None
+
+    def receive(self, timeout: float | None = None) -> PosePacket | None:
+        """Waits for the next packet and applies it to `markers`.
+
+        :param timeout: The maximum number of seconds to wait. None waits forever.
+        :return: The packet, or None if the timeout expired or an invalid packet was received.
+        """
+
+        self.socket.settimeout(timeout)
+        try:
+            size = self.socket.recv_into(self.buffer)
+        except TimeoutError:
+            return None
+        received_at = time.time()
+        try:
+            packet = unpack_packet(self.buffer[:size])
+        except ValueError:
+            self.invalid += 1
+            return None
+
+        if self._last_sequence is not None:
+            gap = (packet.sequence - self._last_sequence - 1) & 0xFFFFFFFF
+            # Reordered packets show up as a huge gap, don't count them as lost
+            if gap < 0x80000000:
+                self.lost += gap
+        self._last_sequence = packet.sequence
+        self.packets += 1
+        self.latencies.append(received_at - packet.timestamp)
+
+        if packet.keyframe:
+            self.keyframes += 1
+            self.markers.clear()
+        for marker in packet.markers:
+            self.markers[marker.marker_id] = marker
+        for marker_id in packet.removed:
+            self.markers.pop(marker_id, None)
+        return packet
+
+    def run(self, duration: float | None = None, verbose: bool = False) -> dict[str, float]:
+        """Receives packets until the duration is over or Ctrl+C is pressed.
+
+        :param duration: The number of seconds to receive for. None receives until interrupted.
+        :param verbose: If True, the tracked markers are printed after every packet. Default is False.
+        :return: The statistics of the stream (see `report`).
+        """
+
+        start = time.perf_counter()
+        first_packet = last_packet = None
+        try:
+            while duration is None or time.perf_counter() - start < duration:
+                packet = self.receive(timeout=0.1)
+                if packet is None:
+                    continue
+                last_packet = time.perf_counter()
+                if first_packet is None:
+                    first_packet = last_packet
+                if verbose:
+                    markers = " ".join(f"[{marker.marker_id}: x={marker.x:.4f} y={marker.y:.4f} angle={marker.angle:.1f}]" for marker in self.markers.values())
+                    print(f"{packet.frame_index}: {markers}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.socket.close()
+        elapsed = last_packet - first_packet if first_packet is not None and last_packet > first_packet else 0.0
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict[str, float]:
+        """Returns the packet count and rate, keyframes, lost and invalid packets and the mean, 99th percentile and
+        maximum latency in milliseconds."""
+
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "packets": self.packets,
+            "packet_rate": (self.packets - 1) / elapsed if elapsed > 0 else 0.0,
+            "keyframes": self.keyframes,
+            "lost": self.lost,
+            "invalid": self.invalid,
+            "latency_mean_ms": float(latencies.mean()),
+            "latency_p99_ms": float(np.percentile(latencies, 99)),
+            "latency_max_ms": float(latencies.max()),
+        }
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Receive the marker poses sent by the track command with --udp and measure latency and packet rate.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"UDP port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to receive for (default: until Ctrl+C)")
+    parser.add_argument("--verbose", action="store_true", help="print the tracked markers after every packet")
+    args = parser.parse_args(argv)
+
+    try:
+        receiver = PoseReceiver(args.host, args.port)
+    except OSError as err:
+        print(f": [Error] Could not listen on {args.host}:{args.port}: {err}")
+        sys.exit(1)
+    print(f"[STARTED] Receiving poses on {args.host}:{args.port}. Press Ctrl+C to stop.")
+    stats = receiver.run(args.duration, args.verbose)
+    print(f"[DONE] Received {stats["packets"]} packets ({stats["packet_rate"]:.1f}/s, {stats["keyframes"]} keyframes, {stats["lost"]} lost, {stats["invalid"]} invalid).")
+    print(f": latency avg {stats["latency_mean_ms"]:.2f} ms / p99 {stats["latency_p99_ms"]:.2f} ms / max {stats["latency_max_ms"]:.2f} ms")
+
+if __name__ == "__main__":
+    main()
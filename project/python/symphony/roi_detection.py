@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+from .camera_calibration import create_detector_parameters
+from .lazy import lazy_import
+from .marker_generation import aruco_dictionaries, get_dictionary
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+# Number of frames between two full-frame rescans, which pick up markers that entered the view
+RESCAN_INTERVAL = 30
+# Padding around a predicted marker, relative to the marker's size in pixels
+ROI_PADDING = 0.4
+# Minimum padding around a predicted marker, in pixels
+MIN_ROI_PADDING_PX = 16
+
+class MarkerTrack:
+    """Last known corners of a marker and its velocity in pixels per frame."""
+
+    __slots__ = ("corners", "velocity")
+
+    def __init__(self, corners: np.ndarray):
+        self.corners = corners
+        self.velocity = np.zeros(2, dtype=np.float32)
+
+    def update(self, corners: np.ndarray):
+        self.velocity = corners.mean(axis=0) - self.corners.mean(axis=0)
+        self.corners = corners
+
+    def predict(self) -> np.ndarray:
+        # Constant velocity: the marker keeps moving as much as it did between the last two frames
+        return self.corners + self.velocity
+
+class RoiMarkerDetector:
+    """Marker detector that only searches small regions of interest around the predicted marker positions.
+
+    The totems move slowly and there are only a handful of them, so after a full-frame detection every marker is
+    tracked and searched for in a padded box around its predicted position in the next frame. A full-frame rescan
+    runs every `rescan_interval` frames and whenever a tracked marker is not found in its region.
+    Returns the same (corners, ids) as `aruco.ArucoDetector.detectMarkers`.
+    """
+
+    def __init__(self, detector: cv2.aruco.ArucoDetector, rescan_interval: int = RESCAN_INTERVAL, padding: float = ROI_PADDING, min_padding_px: int = MIN_ROI_PADDING_PX):
+        """
+        :param detector: The detector to run on the full frame and the regions of interest.
+        :param rescan_interval: The number of frames between two full-frame rescans. Default is RESCAN_INTERVAL.
+        :param padding: The padding around a predicted marker, relative to its size. Default is ROI_PADDING.
+        :param min_padding_px: The minimum padding around a predicted marker in pixels. Default is MIN_ROI_PADDING_PX.
+        """
+
+        self.detector = detector
+        self.rescan_interval = rescan_interval
+        self.padding = padding
+        self.min_padding_px = min_padding_px
+        self.tracks = {}
+        self._frames_since_rescan = 0
+        # Detection time per mode: [number of detections, total seconds]
+        self.timings = {"roi": [0, 0.0], "full": [0, 0.0]}
+
+    def reset(self):
+        self.tracks.clear()
+        self._frames_since_rescan = 0
+
+    def detect(self, gray: np.ndarray) -> tuple[tuple[np.ndarray, ...], np.ndarray | None]:
+        self._frames_since_rescan += 1
+        if len(self.tracks) == 0 or self._frames_since_rescan >= self.rescan_interval:
+            return self._detect_full(gray)
+
+        start = time.perf_counter()
+        found = {}
+        for x0, y0, x1, y1 in self._regions(gray.shape):
+            corners, ids, _ = self.detector.detectMarkers(gray[y0:y1, x0:x1])
+            if ids is None:
+                continue
+            offset = np.array([x0, y0], dtype=np.float32)
+            for marker_corners, marker_id in zip(corners, ids.ravel()):
+                found.setdefault(int(marker_id), marker_corners.reshape(4, 2) + offset)
+        self._add_timing("roi", time.perf_counter() - start)
+
+        # A tracked marker that is not in its region moved too fast, was covered or removed: look at the whole frame
+        if any(marker_id not in found for marker_id in self.tracks):
+            return self._detect_full(gray)
+
+        for marker_id, marker_corners in found.items():
+            if marker_id in self.tracks:
+                self.tracks[marker_id].update(marker_corners)
+            else:
+                self.tracks[marker_id] = MarkerTrack(marker_corners)
+        return self._as_detection(found)
+
+    def latency_report(self) -> dict[str, float]:
+        """Returns the number of detections and mean detection time in milliseconds per mode."""
+
+        return {f"{mode}_{key}": value for mode, (count, total) in self.timings.items() for key, value in (("count", count), ("mean_ms", total / count * 1000 if count > 0 else 0.0))}
+
+    def _detect_full(self, gray: np.ndarray) -> tuple[tuple[np.ndarray, ...], np.ndarray | None]:
+        start = time.perf_counter()
+        corners, ids, _ = self.detector.detectMarkers(gray)
+        self._add_timing("full", time.perf_counter() - start)
+        self._frames_since_rescan = 0
+
+        found = {}
+        if ids is not None:
+            for marker_corners, marker_id in zip(corners, ids.ravel()):
+                found.setdefault(int(marker_id), marker_corners.reshape(4, 2))
+        # Markers that are gone even from the full frame are no longer tracked
+        tracks = {}
+        for marker_id, marker_corners in found.items():
+            track = self.tracks.get(marker_id)
+            if track is None:
+                track = MarkerTrack(marker_corners)
+            else:
+                track.update(marker_corners)
+            tracks[marker_id] = track
+        self.tracks = tracks
+        return corners, ids
+
+    def _regions(self, shape: tuple[int, ...]) -> list[tuple[int, int, int, int]]:
+        height, width = shape[:2]
+        boxes = []
+        for track in self.tracks.values():
+            predicted = track.predict()
+            low, high = predicted.min(axis=0), predicted.max(axis=0)
+            size = float(max(high - low))
+            pad = max(size * self.padding, self.min_padding_px) + float(np.abs(track.velocity).max())
+            boxes.append([max(int(low[0] - pad), 0), max(int(low[1] - pad), 0), min(int(high[0] + pad) + 1, width), min(int(high[1] + pad) + 1, height)])
+
+        # Merge overlapping boxes, so no marker is cut in half or detected twice
+        merged = True
+        while merged and len(boxes) > 1:
+            merged = False
+            for i in range(len(boxes)):
+                for j in range(i + 1, len(boxes)):
+                    a, b = boxes[i], boxes[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del boxes[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return [tuple(box) for box in boxes if box[2] > box[0] and box[3] > box[1]]
+
+    def _add_timing(self, mode: str, elapsed: float):
+        self.timings[mode][0] += 1
+        self.timings[mode][1] += elapsed
+
+    @staticmethod
+    def _as_detection(found: dict[int, np.ndarray]) -> tuple[tuple[np.ndarray, ...], np.ndarray | None]:
+        if len(found) == 0:
+            return (), None
+        corners = tuple(marker_corners.reshape(1, 4, 2).astype(np.float32) for marker_corners in found.values())
+        ids = np.array(list(found.keys()), dtype=np.int32).reshape(-1, 1)
+        return corners, ids
+
+def compare_detection_modes(source: int | str, dict: int, max_frames: int = 300, rescan_interval: int = RESCAN_INTERVAL) -> dict[str, float]:
+    """Runs full-frame and ROI detection on the same frames and compares their detection time and results.
+
+    :param source: The camera index or video file to read frames from.
+    :param dict: The ArUco dictionary of the markers.
+    :param max_frames: The maximum number of frames to compare. Default is 300.
+    :param rescan_interval: The number of frames between two full-frame rescans in ROI mode.
+    :return: The frame count, mean and 99th percentile detection time per mode in milliseconds, the speedup and
+        the fraction of frames in which both modes found the same marker IDs.
+    """
+
+    aruco_dict = get_dictionary(dict)
+    full_detector = cv2.aruco.ArucoDetector(aruco_dict, create_detector_parameters())
+    roi_detector = RoiMarkerDetector(cv2.aruco.ArucoDetector(aruco_dict, create_detector_parameters()), rescan_interval)
+
+    capture = cv2.VideoCapture(source)
+    full_times, roi_times, agreeing = [], [], 0
+    try:
+        while len(full_times) < max_frames:
+            success, frame = capture.read()
+            if not success:
+                break
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+            start = time.perf_counter()
+            _, full_ids, _ = full_detector.detectMarkers(gray)
+            full_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            _, roi_ids = roi_detector.detect(gray)
+            roi_times.append(time.perf_counter() - start)
+
+            full_set = set() if full_ids is None else set(full_ids.ravel().tolist())
+            roi_set = set() if roi_ids is None else set(roi_ids.ravel().tolist())
+            agreeing += full_set == roi_set
+    finally:
+        capture.release()
+
+    if len(full_times) == 0:
+        raise ValueError(f"Could not read any frames from '{source}'.")
+    full_ms, roi_ms = np.array(full_times) * 1000, np.array(roi_times) * 1000
+    return {
+        "frames": len(full_times),
+        "full_mean_ms": float(full_ms.mean()),
+        "full_p99_ms": float(np.percentile(full_ms, 99)),
+        "roi_mean_ms": float(roi_ms.mean()),
+        "roi_p99_ms": float(np.percentile(roi_ms, 99)),
+        "speedup": float(full_ms.mean() / roi_ms.mean()),
+        "agreement": agreeing / len(full_times),
+    }
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Compare the detection latency of ROI mode and full-frame mode on a camera or video.")
+    parser.add_argument("--source", default="0", help="camera index or video file (default: 0)")
+    parser.add_argument("--dict", default="DICT_5X5_50", help="name of the ArUco dictionary of the markers (default: DICT_5X5_50)")
+    parser.add_argument("--frames", type=int, default=300, help="maximum number of frames to compare (default: 300)")
+    parser.add_argument("--rescan-interval", type=int, default=RESCAN_INTERVAL, help=f"frames between two full-frame rescans in ROI mode (default: {RESCAN_INTERVAL})")
+    args = parser.parse_args(argv)
+
+    dict = getattr(cv2.aruco, args.dict, None)
+    if dict not in aruco_dictionaries():
+        print(f": [Error] Unknown ArUco dictionary '{args.dict}'.")
+        sys.exit(2)
+    source = int(args.source) if args.source.isdigit() else args.source
+
+    try:
+        results = compare_detection_modes(source, dict, args.frames, args.rescan_interval)
+    except ValueError as err:
+        print(f": [Error] {err}")
+        sys.exit(1)
+    print(f"[DONE] Compared {results["frames"]} frames.")
+    print(f": full-frame: {results["full_mean_ms"]:.2f} ms mean, {results["full_p99_ms"]:.2f} ms p99")
+    print(f": ROI:        {results["roi_mean_ms"]:.2f} ms mean, {results["roi_p99_ms"]:.2f} ms p99")
+    print(f": ROI mode is {results["speedup"]:.1f}x faster, both modes found the same markers in {results["agreement"] * 100:.1f}% of the frames.")
+
+if __name__ == "__main__":
+    main()
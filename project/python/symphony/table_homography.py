@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import NamedTuple
+
+from . import instrumentation
+from .camera_calibration import create_charuco_board, create_charuco_detector, detect_charuco, load_calibration
+from .lazy import lazy_import
+from .marker_tracking import MarkerEstimator, TrackedMarker
+from .roi_detection import RESCAN_INTERVAL
+from .undistortion import scale_camera_matrix
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+# File the table homography is saved to
+TABLE_HOMOGRAPHY_FILE = "table_homography.json"
+# The board must show at least this many ChArUco corners to compute the homography
+MIN_HOMOGRAPHY_CORNERS = 12
+# A marker that moved less than this is considered still, in projector mode scaled to UV
+POSITION_THRESHOLD_MM = 0.5
+# Projector UV of the projected image's corners: top-left, top-right, bottom-right, bottom-left
+PROJECTOR_UV_CORNERS = ((0, 0), (1, 0), (1, 1), (0, 1))
+
+class TableHomography(NamedTuple):
+    """Mapping from camera pixels to the table, see `compute_table_homography`.
+
+    - homography: The 3x3 homography from (undistorted) pixels to millimeters on the table.
+    - image_size: The (width, height) of the image the homography was computed from.
+    - rms_mm: The RMS error of the board corners mapped with the homography, in millimeters.
+    - projector_homography: The 3x3 homography from millimeters on the table to projector UV, or None.
+    - camera_matrix, dist_coeffs: The intrinsics, at `image_size`, the pixels are undistorted with first, or None to map the
+      pixels as they are.
+    """
+
+    homography: np.ndarray
+    image_size: tuple[int, int]
+    rms_mm: float
+    projector_homography: np.ndarray | None = None
+    camera_matrix: np.ndarray | None = None
+    dist_coeffs: np.ndarray | None = None
+
+def compute_table_homography(image: np.ndarray, camera_matrix: np.ndarray | None = None, dist_coeffs: np.ndarray | None = None, calibrated_size: tuple[int, int] | None = None) -> TableHomography | None:
+    """Computes the homography from camera pixels to the table from an image of the ChArUco board lying on it.
+
+    The table coordinates are the board's: the origin is its first corner, x and y run along its edges in
+    millimeters. The markers sit on top of the totems, so the board should lie at the height of the markers.
+
+    :param image: The grayscale image.
+    :param camera_matrix: The camera matrix, to undistort the corners first. Optional, without it lens distortion
+        ends up as error in the mapping.
+    :param dist_coeffs: The distortion coefficients, needed with `camera_matrix`.
+    :param calibrated_size: The (width, height) the camera was calibrated at, to scale `camera_matrix` to the
+        image's resolution. Optional, assumes the image has the calibration's resolution.
+    :return: The homography, or None if too little of the board is visible.
+    """
+
+    board = create_charuco_board()
+    charuco_corners, charuco_ids, _ = detect_charuco(image, board, create_charuco_detector(board))
+    if charuco_ids is None or len(charuco_ids) < MIN_HOMOGRAPHY_CORNERS:
+        return None
+    object_points, image_points = board.matchImagePoints(charuco_corners, charuco_ids)
+    table_points = object_points.reshape(-1, 3)[:, :2].astype(np.float64) * 1000
+    image_points = image_points.reshape(-1, 1, 2).astype(np.float64)
+    image_size = (image.shape[1], image.shape[0])
+    if camera_matrix is not None:
+        camera_matrix = scale_camera_matrix(camera_matrix, calibrated_size or image_size, image_size)
+        image_points = cv2.undistortPoints(image_points, camera_matrix, dist_coeffs, P=camera_matrix)
+    homography, _ = cv2.findHomography(image_points, table_points)
+    if homography is None:
+        return None
+    mapped = cv2.perspectiveTransform(image_points, homography).reshape(-1, 2)
+    rms_mm = float(np.sqrt(np.mean(np.sum((mapped - table_points) ** 2, axis=1))))
+    return TableHomography(homography, image_size, rms_mm, None, camera_matrix, dist_coeffs)
+
+def compute_projector_homography(corners_mm: np.ndarray) -> np.ndarray:
+    """Computes the homography from millimeters on the table to projector UV.
+
+    Measure where the corners of the projected image land on the table, in table coordinates. The order of the
+    corners also takes care of the mirror between the projector and the tabletop.
+
+    :param corners_mm: The (4, 2) table coordinates of the projected image's top-left, top-right, bottom-right and
+        bottom-left corner.
+    :return: The 3x3 homography.
+    """
+
+    return cv2.getPerspectiveTransform(np.asarray(corners_mm, dtype=np.float32), np.array(PROJECTOR_UV_CORNERS, dtype=np.float32)).astype(np.float64)
+
+def projector_orientation(projector_homography: np.ndarray) -> tuple[np.ndarray, float]:
+    """Computes the rotation, and mirror, of the projector's axes relative to the table's.
+
+    UV stretches the table's width and height to 0-1 each, so angles measured in UV are skewed. Headings are
+    measured on the table instead and only turned, or mirrored, into the projector's axes with this. It is the
+    orthogonal part of the homography's Jacobian at the centre of the projected image.
+
+    :param projector_homography: The 3x3 homography from millimeters on the table to projector UV.
+    :return: The 2x2 orthogonal matrix that turns directions on the table into directions in the projector image,
+        and the smallest length in UV a millimeter on the table is stretched to.
+    """
+
+    uv = np.array([0.5, 0.5])
+    centre = cv2.perspectiveTransform(uv.reshape(1, 1, 2), np.linalg.inv(projector_homography)).reshape(2)
+    w = projector_homography[2] @ np.append(centre, 1.0)
+    jacobian = (projector_homography[:2, :2] - np.outer(uv, projector_homography[2, :2])) / w
+    u, scales, vt = np.linalg.svd(jacobian)
+    return u @ vt, float(scales.min())
+
+def save_table_homography(table: TableHomography, path: str):
+    data = {
+        "homography": table.homography.tolist(),
+        "image_size": list(table.image_size),
+        "rms_mm": table.rms_mm,
+        "projector_homography": table.projector_homography.tolist() if table.projector_homography is not None else None,
+        "camera_matrix": np.asarray(table.camera_matrix).tolist() if table.camera_matrix is not None else None,
+        "dist_coeffs": np.asarray(table.dist_coeffs).tolist() if table.dist_coeffs is not None else None,
+    }
+    with open(path, "w") as save_file:
+        json.dump(data, save_file, indent=4)
+
+def load_table_homography(path: str) -> TableHomography:
+    """Loads a table homography saved by `save_table_homography`.
+
+    :param path: The path of the file.
+    :return: The table homography.
+    :raises OSError: If the file cannot be read.
+    :raises KeyError: If the file does not contain a table homography.
+    """
+
+    with open(path, "r") as table_file:
+        data = json.load(table_file)
+
+    def optional_array(key: str) -> np.ndarray | None:
+        return np.array(data[key], dtype=np.float64) if data.get(key) is not None else None
+
+    return TableHomography(np.array(data["homography"], dtype=np.float64), tuple(data["image_size"]), float(data["rms_mm"]), optional_array("projector_homography"), optional_array("camera_matrix"), optional_array("dist_coeffs"))
+
+class TableMarkerEstimator(MarkerEstimator):
+    """Locates markers on the table with a homography instead of estimating their 6-DoF pose.
+
+    The totems only sit flat on the table, so the centre and heading of every marker follow from mapping its
+    corners onto the table. All corners of a frame are mapped to millimeters with a single
+    `cv2.perspectiveTransform`. In projector mode only the centres are mapped on into UV, the headings stay
+    measured in millimeters and are turned into the projector's axes (see `projector_orientation`). Drop-in replacement for `MarkerPoseEstimator` in
+    `MarkerTracker`. The poses have a confidence of 1, there is no reprojection error to derive one from.
+    """
+
+    def __init__(self, table: TableHomography, dict: int, roi: bool = False, rescan_interval: int = RESCAN_INTERVAL, projector: bool = False):
+        """
+        :param table: The table homography.
+        :param dict: The ArUco dictionary the markers were generated with.
+        :param roi: If True, markers are only searched for around their predicted positions (see `RoiMarkerDetector`).
+        :param rescan_interval: The number of frames between two full-frame rescans in ROI mode.
+        :param projector: If True, the markers are located in projector UV instead of millimeters.
+        :raises ValueError: If the dictionary is unknown, or `projector` is set without a projector homography.
+        """
+
+        super().__init__(dict, roi, rescan_interval)
+        if projector and table.projector_homography is None:
+            raise ValueError("The table homography has no projector homography.")
+        self.settings = (table, dict, roi, rescan_interval, projector)
+        self.table = table
+        self.homography = table.homography
+        self.projector_homography = None
+        self.projector_orientation = None
+        self.position_threshold = POSITION_THRESHOLD_MM
+        if projector:
+            self.projector_homography = table.projector_homography
+            self.projector_orientation, uv_per_mm = projector_orientation(table.projector_homography)
+            self.position_threshold = POSITION_THRESHOLD_MM * uv_per_mm
+        self._frame_size = table.image_size
+        self._frame_homography = self.homography
+        self._frame_camera_matrix = table.camera_matrix
+
+    def estimate(self, corners: tuple[np.ndarray, ...], ids: np.ndarray | None, frame_size: tuple[int, int]) -> list[TrackedMarker]:
+        if ids is None:
+            return []
+        with instrumentation.span("map"):
+            homography, camera_matrix = self.homography_for(frame_size)
+            points = np.concatenate(corners).reshape(-1, 1, 2)
+            if camera_matrix is not None:
+                points = cv2.undistortPoints(points, camera_matrix, self.table.dist_coeffs, P=camera_matrix)
+            mapped = cv2.perspectiveTransform(points, homography).reshape(-1, 4, 2)
+            centres = mapped.mean(axis=1)
+            # Heading of the marker's top edge, from its first to its second corner
+            edges = mapped[:, 1] - mapped[:, 0]
+            if self.projector_homography is not None:
+                centres = cv2.perspectiveTransform(centres.reshape(-1, 1, 2), self.projector_homography).reshape(-1, 2)
+                edges = edges @ self.projector_orientation.T
+            angles = np.degrees(np.arctan2(edges[:, 1], edges[:, 0]))
+            markers = [TrackedMarker(marker_id, x, y, angle) for marker_id, (x, y), angle in zip(ids.ravel().tolist(), centres.tolist(), angles.tolist())]
+        instrumentation.count("markers.tracked", len(markers))
+        return markers
+
+    def homography_for(self, frame_size: tuple[int, int]) -> tuple[np.ndarray, np.ndarray | None]:
+        # Frames of another resolution than the homography's are scaled to it first
+        if frame_size != self._frame_size:
+            self._frame_size = frame_size
+            scale_x = self.table.image_size[0] / frame_size[0]
+            scale_y = self.table.image_size[1] / frame_size[1]
+            self._frame_homography = self.homography @ np.diag([scale_x, scale_y, 1.0])
+            if self.table.camera_matrix is not None:
+                # Undistorted with the intrinsics of this resolution, then scaled like the raw pixels
+                self._frame_camera_matrix = scale_camera_matrix(self.table.camera_matrix, self.table.image_size, frame_size)
+        return self._frame_homography, self._frame_camera_matrix
+
+def parse_corners(value: str) -> np.ndarray:
+    try:
+        corners = np.array([[float(coordinate) for coordinate in corner.split(",")] for corner in value.split(";")], dtype=np.float64)
+    except ValueError:
+        corners = None
+    if corners is None or corners.shape != (4, 2):
+        raise argparse.ArgumentTypeError(f"Invalid projector corners '{value}', expected 'X,Y;X,Y;X,Y;X,Y' in millimeters.")
+    return corners
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Compute the homography from camera pixels to the table from a snapshot of the ChArUco board lying on the table.")
+    parser.add_argument("snapshot", help="snapshot of the board lying flat on the table, at the height of the markers")
+    parser.add_argument("--calibration", default=None, help="camera calibration to undistort with first (default: none, map the pixels as they are)")
+    parser.add_argument("--projector-corners", type=parse_corners, default=None, metavar="X,Y;X,Y;X,Y;X,Y", help="table coordinates in millimeters of the projected image's top-left, top-right, bottom-right and bottom-left corner, to also map into projector UV")
+    parser.add_argument("--output", default=TABLE_HOMOGRAPHY_FILE, help=f"path to save the homography to (default: {TABLE_HOMOGRAPHY_FILE})")
+    args = parser.parse_args(argv)
+
+    camera_matrix = dist_coeffs = calibrated_size = None
+    if args.calibration is not None:
+        try:
+            camera_matrix, dist_coeffs, calibrated_size = load_calibration(args.calibration)
+        except (OSError, KeyError, ValueError) as err:
+            print(f": [Error] Could not load calibration '{args.calibration}': {err}")
+            sys.exit(1)
+    image = cv2.imread(args.snapshot, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        print(f": [Error] Could not read image '{args.snapshot}'.")
+        sys.exit(1)
+
+    table = compute_table_homography(image, camera_matrix, dist_coeffs, calibrated_size)
+    if table is None:
+        print(f"[FAILED] Less than {MIN_HOMOGRAPHY_CORNERS} corners of the board found in '{args.snapshot}'.")
+        sys.exit(1)
+    if args.projector_corners is not None:
+        table = table._replace(projector_homography=compute_projector_homography(args.projector_corners))
+    save_table_homography(table, args.output)
+    print(f"[DONE] Table homography saved to '{args.output}', board corners mapped with {table.rms_mm:.2f} mm RMS error.")
+
+    # How long mapping a frame of markers takes, the only per-frame work besides detection
+    estimator = TableMarkerEstimator(table, cv2.aruco.DICT_5X5_50)
+    corners = tuple(np.random.default_rng(0).uniform(0, min(table.image_size), (1, 4, 2)).astype(np.float32) for _ in range(16))
+    ids = np.arange(16, dtype=np.int32).reshape(-1, 1)
+    start = time.perf_counter()
+    for _ in range(1000):
+        estimator.estimate(corners, ids, table.image_size)
+    print(f"[INFO] Mapping 16 markers takes {(time.perf_counter() - start) * 1000:.1f} µs per frame.")
+
+if __name__ == "__main__":
+    main()
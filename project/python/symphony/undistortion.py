@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import os
+
+from .lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+# Files the undistortion maps are stored in, next to the calibration data
+UNDISTORT_MAP1_FILE = "undistort_map1.npy"
+UNDISTORT_MAP2_FILE = "undistort_map2.npy"
+
+def scale_camera_matrix(camera_matrix: np.ndarray, calibrated_size: tuple[int, int], image_size: tuple[int, int]) -> np.ndarray:
+    """Scales a camera matrix to another resolution of the same sensor area.
+
+    :param camera_matrix: The 3x3 camera matrix obtained at `calibrated_size`.
+    :param calibrated_size: The (width, height) the camera was calibrated at.
+    :param image_size: The (width, height) to scale the camera matrix to.
+    :return: The scaled camera matrix.
+    """
+
+    scale_x = image_size[0] / calibrated_size[0]
+    scale_y = image_size[1] / calibrated_size[1]
+    scaled = np.array(camera_matrix, dtype=np.float64).copy()
+    scaled[0, :] *= scale_x
+    scaled[1, :] *= scale_y
+    return scaled
+
+def compute_undistort_maps(camera_matrix: np.ndarray, dist_coeffs: np.ndarray, image_size: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """Precomputes the lookup tables to undistort frames of the given size with a single `cv2.remap`.
+
+    The maps are stored in OpenCV's fixed-point format: (H, W, 2) int16 integer source coordinates and (H, W) uint16
+    interpolation table indices. This is the same representation `cv2.undistort` builds internally on every call.
+
+    :param camera_matrix: The 3x3 camera matrix, valid for `image_size`.
+    :param dist_coeffs: The distortion coefficients.
+    :param image_size: The (width, height) of the frames to undistort.
+    :return: The two undistortion maps.
+    """
+
+    camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+    dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64)
+    return cv2.initUndistortRectifyMap(camera_matrix, dist_coeffs, None, camera_matrix, tuple(image_size), cv2.CV_16SC2)
+
+def save_undistort_maps(map1: np.ndarray, map2: np.ndarray, directory: str) -> tuple[str, str]:
+    """Saves the undistortion maps as '.npy' files, so they can be memory-mapped when loading.
+
+    :param map1: The fixed-point coordinate map.
+    :param map2: The interpolation table map.
+    :param directory: The directory to save the maps to.
+    :return: The paths of both map files.
+    """
+
+    map1_path = os.path.join(directory, UNDISTORT_MAP1_FILE)
+    map2_path = os.path.join(directory, UNDISTORT_MAP2_FILE)
+    np.save(map1_path, map1)
+    np.save(map2_path, map2)
+    return map1_path, map2_path
+
+def load_undistort_maps(directory: str, mmap: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """Loads the undistortion maps saved by `save_undistort_maps`.
+
+    :param directory: The directory the maps were saved to.
+    :param mmap: If True, the maps are memory-mapped read-only instead of read into memory. Default is True.
+    :return: The two undistortion maps.
+    :raises OSError: If the map files cannot be read.
+    """
+
+    mmap_mode = "r" if mmap else None
+    map1 = np.load(os.path.join(directory, UNDISTORT_MAP1_FILE), mmap_mode=mmap_mode)
+    map2 = np.load(os.path.join(directory, UNDISTORT_MAP2_FILE), mmap_mode=mmap_mode)
+    return map1, map2
+
+def undistort_frame(frame: np.ndarray, maps: tuple[np.ndarray, np.ndarray], out: np.ndarray | None = None) -> np.ndarray:
+    """Undistorts a frame with the precomputed maps.
+
+    :param frame: The frame to undistort, with the resolution the maps were computed for.
+    :param maps: The undistortion maps.
+    :param out: An optional preallocated output frame of the same shape and type, to avoid an allocation per frame.
+    :return: The undistorted frame.
+    """
+
+    map1, map2 = maps
+    return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR, dst=out)
+
+def undistort_corners(corners: np.ndarray, camera_matrix: np.ndarray, dist_coeffs: np.ndarray) -> np.ndarray:
+    """Undistorts detected corner points instead of the whole frame.
+
+    This is much cheaper than undistorting every frame when only the marker positions are needed.
+
+    :param corners: The detected corners in distorted pixel coordinates, in any shape ending in 2 (e.g. (N, 1, 4, 2)).
+    :param camera_matrix: The 3x3 camera matrix.
+    :param dist_coeffs: The distortion coefficients.
+    :return: The undistorted corners in pixel coordinates, in the same shape as the input.
+    """
+
+    corners = np.asarray(corners, dtype=np.float32)
+    if corners.size == 0:
+        return corners
+    camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+    points = cv2.undistortPoints(corners.reshape(-1, 1, 2), camera_matrix, np.asarray(dist_coeffs, dtype=np.float64), P=camera_matrix)
+    return points.reshape(corners.shape)
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from symphony.calibration_bundle import BoardConfig, is_bundle, load_bundle, save_bundle
+
+class CalibrationBundleTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "calibration.bin")
+        self.camera_matrix = np.array([[1400.0, 0.0, 960.0], [0.0, 1395.5, 540.0], [0.0, 0.0, 1.0]])
+        self.dist_coeffs = np.array([[-0.12, 0.05, 0.001, -0.002, 0.0]])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        rng = np.random.default_rng(0)
+        rvecs = [rng.normal(size=(3, 1)) for _ in range(3)]
+        tvecs = [rng.normal(size=(3, 1)) for _ in range(3)]
+        corners = [rng.uniform(0, 1000, (count, 1, 2)).astype(np.float32) for count in (5, 0, 12)]
+        ids = [np.arange(len(view_corners), dtype=np.int32).reshape(-1, 1) for view_corners in corners]
+        board = BoardConfig(12, 8, 0.02, 0.015, 7, True)
+        table_pose = (np.array([0.1, -0.2, 0.3]), np.array([0.0, 0.5, 1.25]))
+        save_bundle(self.path, self.camera_matrix, self.dist_coeffs, (1920, 1080), rvecs, tvecs, corners, ids, 0.25, board, table_pose)
+
+        self.assertTrue(is_bundle(self.path))
+        bundle = load_bundle(self.path)
+        np.testing.assert_array_equal(bundle.camera_matrix, self.camera_matrix)
+        np.testing.assert_array_equal(bundle.dist_coeffs, self.dist_coeffs)
+        self.assertEqual(bundle.image_size, (1920, 1080))
+        self.assertEqual(bundle.rms, 0.25)
+        self.assertEqual(bundle.view_count, 3)
+        self.assertEqual(bundle.board, board)
+        np.testing.assert_array_equal(bundle.rvecs, np.hstack(rvecs).T)
+        np.testing.assert_array_equal(bundle.tvecs, np.hstack(tvecs).T)
+        for loaded, saved in zip(bundle.charuco_corners, corners):
+            np.testing.assert_array_equal(loaded, saved)
+        for loaded, saved in zip(bundle.charuco_ids, ids):
+            np.testing.assert_array_equal(loaded, saved)
+        np.testing.assert_array_equal(bundle.table_pose[0].ravel(), table_pose[0])
+        np.testing.assert_array_equal(bundle.table_pose[1].ravel(), table_pose[1])
+
+    def test_optional_sections(self):
+        save_bundle(self.path, self.camera_matrix, self.dist_coeffs, (640, 480))
+        bundle = load_bundle(self.path)
+        self.assertIsNone(bundle.rms)
+        self.assertIsNone(bundle.board)
+        self.assertEqual(bundle.view_count, 0)
+        self.assertIsNone(bundle.rvecs)
+        self.assertIsNone(bundle.charuco_corners)
+        self.assertIsNone(bundle.table_pose)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as other_file:
+            other_file.write(b"{}")
+        self.assertFalse(is_bundle(self.path))
+        with self.assertRaises(ValueError):
+            load_bundle(self.path)
+
+    def test_rejects_truncated(self):
+        save_bundle(self.path, self.camera_matrix, self.dist_coeffs, (640, 480))
+        with open(self.path, "rb") as bundle_file:
+            data = bundle_file.read()
+        with open(self.path, "wb") as bundle_file:
+            bundle_file.write(data[:20])
+        with self.assertRaises(ValueError):
+            load_bundle(self.path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+
+from symphony.camera_calibration import CACHE_DIR, create_charuco_board, detect_snapshots, prune_detection_cache
+
+class DetectionCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache_dir = os.path.join(self.directory, CACHE_DIR)
+        board = create_charuco_board().generateImage((800, 1200), marginSize=40)
+        self.paths = []
+        for index in range(2):
+            path = os.path.join(self.directory, f"snapshot_{index}.jpg")
+            cv2.imwrite(path, cv2.rotate(board, cv2.ROTATE_90_CLOCKWISE) if index else board)
+            self.paths.append(path)
+
+    def test_reuses_detections(self):
+        first = detect_snapshots(self.paths, self.cache_dir, workers=1)
+        self.assertEqual([result["cached"] for result in first], [False, False])
+        self.assertIsNotNone(first[0]["charuco_ids"])
+        second = detect_snapshots(self.paths, self.cache_dir, workers=1)
+        self.assertEqual([result["cached"] for result in second], [True, True])
+        self.assertEqual([result["cache_file"] for result in second], [result["cache_file"] for result in first])
+        self.assertEqual(len(first[0]["charuco_ids"]), len(second[0]["charuco_ids"]))
+
+    def test_unreadable_snapshot(self):
+        with open(self.paths[1], "wb") as snapshot:
+            snapshot.write(b"not an image")
+        results = detect_snapshots(self.paths, self.cache_dir, workers=1)
+        self.assertFalse(results[0]["cached"])
+        self.assertIsNone(results[1])
+
+    def test_prunes_stale_entries(self):
+        results = detect_snapshots(self.paths, self.cache_dir, workers=1)
+        self.assertEqual(prune_detection_cache(self.cache_dir, results), 0)
+        # Replacing a snapshot leaves the detections of the old one behind
+        cv2.imwrite(self.paths[1], cv2.imread(self.paths[0]))
+        results = detect_snapshots(self.paths, self.cache_dir, workers=1)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 3)
+        self.assertEqual(prune_detection_cache(self.cache_dir, results), 1)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), sorted(result["cache_file"] for result in results))
+        # A deleted snapshot matches nothing
+        self.assertEqual(prune_detection_cache(self.cache_dir, results[:1]), 1)
+        self.assertEqual(os.listdir(self.cache_dir), [results[0]["cache_file"]])
+
+    def test_prunes_missing_directory(self):
+        self.assertEqual(prune_detection_cache(self.cache_dir, []), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+
+from symphony.frame_ring import NO_FRAME, FrameRing
+
+class FrameRingTest(unittest.TestCase):
+    def setUp(self):
+        self.ring = FrameRing((4, 6), slots=3)
+        self.addCleanup(self.ring.close)
+
+    def frame(self, value: int) -> np.ndarray:
+        return np.full((4, 6), value, dtype=np.uint8)
+
+    def test_write_and_read(self):
+        self.assertEqual(self.ring.latest, NO_FRAME)
+        sequence_number = self.ring.write(self.frame(7), 1.5)
+        self.assertEqual(sequence_number, 1)
+        self.assertEqual(self.ring.latest, 1)
+        frame, timestamp = self.ring.read(sequence_number)
+        np.testing.assert_array_equal(frame, self.frame(7))
+        self.assertEqual(timestamp, 1.5)
+        self.assertTrue(self.ring.is_current(sequence_number))
+
+    def test_converts_bgr(self):
+        bgr = np.zeros((4, 6, 3), dtype=np.uint8)
+        bgr[...] = (255, 255, 255)
+        frame, _ = self.ring.read(self.ring.write(bgr, 0.0))
+        np.testing.assert_array_equal(frame, self.frame(255))
+
+    def test_overwrite(self):
+        first = self.ring.write(self.frame(1), 0.0)
+        # Keep a view of the first frame, as a reader would
+        frame, _ = self.ring.read(first)
+        for value in range(2, 2 + self.ring.slots):
+            self.ring.write(self.frame(value), 0.0)
+        self.assertFalse(self.ring.is_current(first))
+        self.assertIsNone(self.ring.read(first))
+        # The view now shows the frame that took over the slot
+        np.testing.assert_array_equal(frame, self.frame(1 + self.ring.slots))
+        self.assertTrue(self.ring.is_current(self.ring.latest))
+
+    def test_unwritten_frame(self):
+        self.assertIsNone(self.ring.read(1))
+        self.assertFalse(self.ring.is_current(1))
+
+    def test_rejects_other_sizes(self):
+        with self.assertRaises(ValueError):
+            self.ring.write(np.zeros((6, 4), dtype=np.uint8), 0.0)
+
+    def test_wait(self):
+        self.assertEqual(self.ring.wait(NO_FRAME, timeout=0.01), NO_FRAME)
+        self.ring.write(self.frame(1), 0.0)
+        self.assertEqual(self.ring.wait(NO_FRAME), 1)
+        self.ring.close_writer()
+        self.assertEqual(self.ring.wait(1), 1)
+
+    def test_attach_by_name(self):
+        self.ring.write(self.frame(9), 2.0)
+        attached = FrameRing(name=self.ring.name)
+        self.addCleanup(attached.close)
+        self.assertEqual(attached.shape, (4, 6))
+        self.assertEqual(attached.slots, 3)
+        frame, timestamp = attached.read(1)
+        np.testing.assert_array_equal(frame, self.frame(9))
+        self.assertEqual(timestamp, 2.0)
+
+    def test_needs_two_slots(self):
+        with self.assertRaises(ValueError):
+            FrameRing((4, 6), slots=1)
+
+if __name__ == "__main__":
+    unittest.main()
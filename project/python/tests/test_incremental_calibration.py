@@ -0,0 +1,83 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from symphony.camera_calibration import create_charuco_board
+from symphony.incremental_calibration import IncrementalCalibrator
+
+IMAGE_SIZE = (1280, 720)
+# The intrinsics the views are projected with
+CAMERA_MATRIX = np.array([[1000.0, 0, 640], [0, 1000.0, 360], [0, 0, 1]])
+
+def board_view(board, rotation: tuple[float, float, float], translation: tuple[float, float, float], noise: float = 0.0, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    # The ChArUco corners of the board seen from a known pose, as detect_charuco returns them
+    points = board.getChessboardCorners()
+    corners, _ = cv2.projectPoints(points, np.array(rotation), np.array(translation), CAMERA_MATRIX, np.zeros(5))
+    corners += np.random.default_rng(seed).normal(0, noise, corners.shape)
+    return corners.astype(np.float32), np.arange(len(points), dtype=np.int32).reshape(-1, 1)
+
+def board_views(board, count: int) -> list[tuple[np.ndarray, np.ndarray]]:
+    return [board_view(board, (0.4 * np.cos(index), 0.4 * np.sin(index), 0.2 * index), (-0.15 + 0.03 * index, -0.1, 0.45 + 0.05 * index), noise=0.1, seed=index) for index in range(count)]
+
+class IncrementalCalibratorTest(unittest.TestCase):
+    def setUp(self):
+        self.board = create_charuco_board()
+
+    def test_calibrates_once_enough_views(self):
+        calibrator = IncrementalCalibrator(self.board, IMAGE_SIZE, min_views=3)
+        updates = [calibrator.add_view(*view) for view in board_views(self.board, 4)]
+        self.assertTrue(all(update.accepted for update in updates))
+        self.assertIsNone(updates[1].rms)
+        self.assertIsNotNone(updates[2].rms)
+        self.assertEqual(updates[3].views, 4)
+        np.testing.assert_allclose(calibrator.camera_matrix, CAMERA_MATRIX, rtol=0.05, atol=10)
+
+    def test_rejects_too_few_corners(self):
+        calibrator = IncrementalCalibrator(self.board, IMAGE_SIZE)
+        corners, ids = board_views(self.board, 1)[0]
+        update = calibrator.add_view(corners[:3], ids[:3])
+        self.assertFalse(update.accepted)
+        self.assertEqual(calibrator.add_view(None, None).reason, "only 0 ChArUco corners")
+        self.assertEqual(calibrator.views, [])
+
+    def test_rejects_near_duplicates(self):
+        calibrator = IncrementalCalibrator(self.board, IMAGE_SIZE)
+        corners, ids = board_views(self.board, 1)[0]
+        self.assertTrue(calibrator.add_view(corners, ids).accepted)
+        update = calibrator.add_view(corners + 1, ids)
+        self.assertFalse(update.accepted)
+        self.assertEqual(update.reason, "near-duplicate of view 0")
+        # A view of most of the same corners far from the kept one is not a duplicate
+        self.assertTrue(calibrator.add_view(corners[:-5] + 100, ids[:-5]).accepted)
+        self.assertEqual(len(calibrator.views), 2)
+
+    def test_evicts_worst_view(self):
+        calibrator = IncrementalCalibrator(self.board, IMAGE_SIZE, max_views=4, min_views=3)
+        views = board_views(self.board, 5)
+        # A view with bad corners gets the largest error once there is a better one to replace it with
+        bad = board_view(self.board, (0.0, -0.3, 1.5), (0.05, -0.15, 0.7), noise=5.0)
+        for view in views[:3] + [bad]:
+            calibrator.add_view(*view)
+        self.assertEqual(len(calibrator.views), 4)
+        update = calibrator.add_view(*views[3])
+        self.assertTrue(update.accepted)
+        self.assertEqual(update.views, 4)
+        self.assertFalse(any(view.charuco_corners is bad[0] for view in calibrator.views))
+        self.assertEqual(len(calibrator.rvecs), 4)
+        self.assertEqual(len(calibrator.tvecs), 4)
+
+    def test_evicts_new_view_when_worst(self):
+        calibrator = IncrementalCalibrator(self.board, IMAGE_SIZE, max_views=4, min_views=3)
+        for view in board_views(self.board, 4):
+            calibrator.add_view(*view)
+        kept = [view.charuco_corners for view in calibrator.views]
+        update = calibrator.add_view(*board_view(self.board, (0.0, -0.3, 1.5), (0.05, -0.15, 0.7), noise=5.0))
+        self.assertFalse(update.accepted)
+        self.assertTrue(update.reason.startswith("largest reprojection error of all views"))
+        self.assertGreater(update.view_error, max(view.error for view in calibrator.views))
+        self.assertEqual([view.charuco_corners for view in calibrator.views], kept)
+        self.assertEqual(len(calibrator.rvecs), 4)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from symphony.marker_cache import MarkerCache
+
+class MarkerCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.directory.name, ".cache")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_evicts_least_recently_used(self):
+        cache = MarkerCache(self.cache_dir, ".jpg", memory_limit=20)
+        cache.put("a" * 64, b"0" * 8)
+        cache.put("b" * 64, b"1" * 8)
+        # Using the first entry makes the second one the least recently used
+        self.assertEqual(cache.get("a" * 64), b"0" * 8)
+        cache.put("c" * 64, b"2" * 8)
+        self.assertEqual(list(cache._memory), ["a" * 64, "c" * 64])
+        self.assertEqual(cache._memory_size, 16)
+
+    def test_evicted_entries_load_from_disk(self):
+        cache = MarkerCache(self.cache_dir, ".jpg", memory_limit=10)
+        cache.put("a" * 64, b"0" * 8)
+        cache.put("b" * 64, b"1" * 8)
+        self.assertNotIn("a" * 64, cache._memory)
+        self.assertEqual(cache.get("a" * 64), b"0" * 8)
+        self.assertEqual(MarkerCache(self.cache_dir, ".jpg").get("b" * 64), b"1" * 8)
+
+    def test_keeps_an_entry_larger_than_the_limit(self):
+        cache = MarkerCache(self.cache_dir, ".jpg", memory_limit=4)
+        cache.put("a" * 64, b"0" * 8)
+        self.assertEqual(list(cache._memory), ["a" * 64])
+
+    def test_get_or_render_renders_once(self):
+        cache = MarkerCache(self.cache_dir, ".jpg")
+        renders = []
+        render = lambda: renders.append(1) or b"image"
+        self.assertEqual(cache.get_or_render("d" * 64, render), b"image")
+        self.assertEqual(cache.get_or_render("d" * 64, render), b"image")
+        self.assertEqual(len(renders), 1)
+
+    def test_key_depends_on_every_setting(self):
+        key = MarkerCache.key(b"bits", 420, False, 0, ".jpg")
+        self.assertEqual(key, MarkerCache.key(b"bits", 420, False, 0, ".JPG"))
+        for other in (MarkerCache.key(b"tibs", 420, False, 0, ".jpg"), MarkerCache.key(b"bits", 210, False, 0, ".jpg"), MarkerCache.key(b"bits", 420, True, 0, ".jpg"), MarkerCache.key(b"bits", 420, False, 4, ".jpg"), MarkerCache.key(b"bits", 420, False, 0, ".png")):
+            self.assertNotEqual(key, other)
+
+if __name__ == "__main__":
+    unittest.main()
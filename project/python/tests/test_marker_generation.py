@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from symphony.marker_generation import FileAction, Operation, encode_marker_image, existing_marker_files, generate_marker_image, generate_marker_images, get_dictionary, marker_filepath, parse_marker_ids, resolve_file_action
+
+class ParseMarkerIdsTest(unittest.TestCase):
+    def test_ids_and_ranges(self):
+        self.assertEqual(parse_marker_ids("0-3,7, 12-13"), [0, 1, 2, 3, 7, 12, 13])
+
+    def test_keeps_order_and_duplicates(self):
+        self.assertEqual(parse_marker_ids("5,1-2,1"), [5, 1, 2, 1])
+
+    def test_ignores_empty_parts(self):
+        self.assertEqual(parse_marker_ids("4,,5,"), [4, 5])
+
+    def test_rejects_malformed(self):
+        for spec in ("3-1", "a", "1-b"):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                parse_marker_ids(spec)
+
+class GenerateMarkerImagesTest(unittest.TestCase):
+    def assert_same_pixels(self, dict: int, marker_size_px: int, inverted: bool, border_thickness: int):
+        aruco_dict = get_dictionary(dict)
+        marker_ids = [0, 1, 17, 49]
+        markers = generate_marker_images(aruco_dict, marker_ids, marker_size_px, inverted, border_thickness)
+        for marker_id, marker in zip(marker_ids, markers):
+            expected = generate_marker_image(aruco_dict, marker_id, marker_size_px, inverted)
+            if border_thickness > 0:
+                border_colour = (0, 0, 0) if inverted else (255, 255, 255)
+                expected = cv2.copyMakeBorder(expected, border_thickness, border_thickness, border_thickness, border_thickness, cv2.BORDER_CONSTANT, value=border_colour)
+            np.testing.assert_array_equal(marker, expected.reshape(marker.shape), err_msg=f"marker {marker_id}")
+
+    def test_same_pixels_as_single_renderer(self):
+        for marker_size_px in (70, 420, 100):
+            for inverted in (False, True):
+                for border_thickness in (0, 5):
+                    with self.subTest(marker_size_px=marker_size_px, inverted=inverted, border_thickness=border_thickness):
+                        self.assert_same_pixels(cv2.aruco.DICT_5X5_50, marker_size_px, inverted, border_thickness)
+
+    def test_other_marker_dimensions(self):
+        for dict in (cv2.aruco.DICT_4X4_50, cv2.aruco.DICT_7X7_50):
+            with self.subTest(dict=dict):
+                self.assert_same_pixels(dict, 90, False, 0)
+
+    def test_rejects_size_below_cells(self):
+        with self.assertRaises(ValueError):
+            generate_marker_images(get_dictionary(cv2.aruco.DICT_5X5_50), [0], 6)
+
+class ResolveFileActionTest(unittest.TestCase):
+    def setUp(self):
+        # The markers are saved relative to the working directory
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        os.makedirs("markers")
+        self.dict = get_dictionary(cv2.aruco.DICT_5X5_50)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def write(self, filepath: str, marker_size_px: int):
+        with open(filepath, "wb") as marker_file:
+            marker_file.write(encode_marker_image(self.dict, 3, marker_size_px, False, 0))
+
+    def test_create_when_missing(self):
+        self.assertEqual(resolve_file_action(self.dict, 3, 70, False, 0), (FileAction.CREATE, marker_filepath(3, False)))
+
+    def test_unchanged_when_identical(self):
+        self.write(marker_filepath(3, False), 70)
+        self.assertEqual(resolve_file_action(self.dict, 3, 70, False, 0, Operation.KEEP_BOTH)[0], FileAction.UNCHANGED)
+
+    def test_keep_both_matches_kept_versions(self):
+        self.write(marker_filepath(3, False), 70)
+        self.write(marker_filepath(3, False, 1), 140)
+        self.assertEqual(existing_marker_files(3, False), [marker_filepath(3, False), marker_filepath(3, False, 1)])
+        self.assertEqual(resolve_file_action(self.dict, 3, 140, False, 0, Operation.KEEP_BOTH), (FileAction.UNCHANGED, marker_filepath(3, False, 1)))
+        self.assertEqual(resolve_file_action(self.dict, 3, 210, False, 0, Operation.KEEP_BOTH), (FileAction.KEEP_BOTH, marker_filepath(3, False, 2)))
+
+if __name__ == "__main__":
+    unittest.main()
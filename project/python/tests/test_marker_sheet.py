@@ -0,0 +1,36 @@
+import unittest
+
+import cv2
+
+from symphony.marker_sheet import iter_sheet_pages, mm_to_px
+
+class IterSheetPagesTest(unittest.TestCase):
+    def test_lays_out_pages(self):
+        # 4 x 5 markers of 40 mm fit on an A4 page
+        pages = [(page.copy(), ids) for page, ids in iter_sheet_pages(cv2.aruco.DICT_5X5_50, range(30), 40, dpi=100)]
+        self.assertEqual([ids for _, ids in pages], [list(range(20)), list(range(20, 30))])
+        self.assertEqual(pages[0][0].shape, (mm_to_px(297, 100), mm_to_px(210, 100)))
+
+    def test_checks_before_rendering(self):
+        # The layout is rejected on the call, not once the first page is requested
+        with self.assertRaises(ValueError):
+            iter_sheet_pages(cv2.aruco.DICT_5X5_50, [0], 40, dpi=0)
+
+    def test_rejects_invalid_sizes(self):
+        for kwargs in ({"dpi": -300}, {"marker_size_mm": 0}, {"margin_mm": -1}, {"spacing_mm": -1}, {"border_mm": -1}):
+            with self.subTest(**kwargs):
+                with self.assertRaises(ValueError):
+                    iter_sheet_pages(cv2.aruco.DICT_5X5_50, [0], **{"marker_size_mm": 40, **kwargs})
+
+    def test_rejects_markers_larger_than_printable_area(self):
+        with self.assertRaisesRegex(ValueError, "printable area"):
+            iter_sheet_pages(cv2.aruco.DICT_5X5_50, [0], 200)
+        with self.assertRaisesRegex(ValueError, "printable area"):
+            iter_sheet_pages(cv2.aruco.DICT_5X5_50, [0], 40, margin_mm=90)
+
+    def test_rejects_markers_below_a_pixel_per_cell(self):
+        with self.assertRaisesRegex(ValueError, "needs at least 7px"):
+            iter_sheet_pages(cv2.aruco.DICT_5X5_50, [0], 1, dpi=72)
+
+if __name__ == "__main__":
+    unittest.main()
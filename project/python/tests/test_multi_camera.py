@@ -0,0 +1,39 @@
+import math
+import unittest
+
+from symphony.marker_tracking import FramePoses, TrackedMarker
+from symphony.multi_camera import MarkerFuser
+
+class MarkerFuserTest(unittest.TestCase):
+    def setUp(self):
+        self.frames = []
+        self.fuser = MarkerFuser(self.frames.append, max_age=0.5)
+
+    def test_single_camera_passes_through(self):
+        marker = TrackedMarker(1, 0.1, 0.2, 30.0, 0.8)
+        self.fuser.add("cam0", FramePoses(5, 1.0, [marker]))
+        self.assertEqual(self.frames, [FramePoses(0, 1.0, [marker])])
+
+    def test_confidence_weighting(self):
+        self.fuser.add("cam0", FramePoses(0, 1.0, [TrackedMarker(1, 0.0, 0.0, 0.0, 0.75)]))
+        self.fuser.add("cam1", FramePoses(0, 1.0, [TrackedMarker(1, 1.0, 2.0, 90.0, 0.25)]))
+        marker, = self.frames[-1].markers
+        self.assertAlmostEqual(marker.x, 0.25)
+        self.assertAlmostEqual(marker.y, 0.5)
+        self.assertAlmostEqual(marker.angle, math.degrees(math.atan2(0.25, 0.75)))
+        self.assertAlmostEqual(marker.confidence, 1.0 - 0.25 * 0.75)
+
+    def test_angles_wrap_around(self):
+        self.fuser.add("cam0", FramePoses(0, 1.0, [TrackedMarker(1, 0.0, 0.0, 179.0, 0.5)]))
+        self.fuser.add("cam1", FramePoses(0, 1.0, [TrackedMarker(1, 0.0, 0.0, -179.0, 0.5)]))
+        marker, = self.frames[-1].markers
+        self.assertAlmostEqual(abs(marker.angle), 180.0)
+
+    def test_stale_observations_are_left_out(self):
+        self.fuser.add("cam0", FramePoses(0, 1.0, [TrackedMarker(1, 0.0, 0.0, 0.0, 0.5)]))
+        self.fuser.add("cam1", FramePoses(0, 2.0, [TrackedMarker(1, 1.0, 1.0, 0.0, 0.5), TrackedMarker(2, 3.0, 3.0, 0.0, 0.5)]))
+        self.assertEqual(self.frames[-1].markers, [TrackedMarker(1, 1.0, 1.0, 0.0, 0.5), TrackedMarker(2, 3.0, 3.0, 0.0, 0.5)])
+        self.assertEqual([frame.frame_index for frame in self.frames], [0, 1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import socket
+import unittest
+
+from symphony.marker_tracking import FramePoses, TrackedMarker
+from symphony.pose_stream import HEADER, MAX_MARKERS_PER_PACKET, RECORD, PosePublisher, unpack_packet
+
+class PosePacketTest(unittest.TestCase):
+    def setUp(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.socket.settimeout(1.0)
+        self.port = self.socket.getsockname()[1]
+
+    def tearDown(self):
+        self.socket.close()
+
+    def publisher(self, **kwargs) -> PosePublisher:
+        publisher = PosePublisher("127.0.0.1", self.port, **kwargs)
+        self.addCleanup(publisher.close)
+        return publisher
+
+    def receive(self):
+        return unpack_packet(self.socket.recv(65536))
+
+    def test_round_trip(self):
+        markers = [TrackedMarker(3, 0.125, -0.5, 90.0, 0.75), TrackedMarker(7, 1.5, 2.25, -45.0, 1.0)]
+        self.publisher().publish(FramePoses(42, 0.0, markers))
+        packet = self.receive()
+        self.assertEqual(packet.sequence, 0)
+        self.assertEqual(packet.frame_index, 42)
+        self.assertTrue(packet.keyframe)
+        self.assertEqual(packet.markers, markers)
+        self.assertEqual(packet.removed, [])
+
+    def test_delta_packets(self):
+        publisher = self.publisher(keyframe_interval=100)
+        publisher.publish(FramePoses(0, 0.0, [TrackedMarker(1, 0.0, 0.0, 0.0), TrackedMarker(2, 0.0, 0.0, 0.0)]))
+        # Marker 1 moved less than the threshold, marker 2 disappeared
+        publisher.publish(FramePoses(1, 0.0, [TrackedMarker(1, publisher.position_threshold / 2, 0.0, 0.0)]))
+        publisher.publish(FramePoses(2, 0.0, [TrackedMarker(1, 1.0, 0.0, 0.0)]))
+        self.receive()
+        packet = self.receive()
+        self.assertFalse(packet.keyframe)
+        self.assertEqual((packet.markers, packet.removed), ([], [2]))
+        packet = self.receive()
+        self.assertEqual(([marker.marker_id for marker in packet.markers], packet.removed), ([1], []))
+
+    def test_splits_large_keyframes(self):
+        markers = [TrackedMarker(i, float(i), 0.0, 0.0) for i in range(MAX_MARKERS_PER_PACKET + 10)]
+        self.publisher().publish(FramePoses(0, 0.0, markers))
+        first, second = self.receive(), self.receive()
+        self.assertTrue(first.keyframe)
+        self.assertFalse(second.keyframe)
+        self.assertEqual((first.sequence, second.sequence), (0, 1))
+        self.assertEqual(first.markers + second.markers, markers)
+
+    def test_splits_large_deltas(self):
+        publisher = self.publisher(keyframe_interval=100)
+        publisher.publish(FramePoses(0, 0.0, [TrackedMarker(i, 0.0, 0.0, 0.0) for i in range(MAX_MARKERS_PER_PACKET)]))
+        # 10 new markers and all the removals don't fit in one packet
+        new_markers = [TrackedMarker(i, 0.0, 0.0, 0.0) for i in range(100, 110)]
+        publisher.publish(FramePoses(1, 0.0, new_markers))
+        self.receive()
+        first, second = self.receive(), self.receive()
+        self.assertEqual(len(first.markers) + len(first.removed), MAX_MARKERS_PER_PACKET)
+        self.assertFalse(first.keyframe or second.keyframe)
+        self.assertEqual(first.markers + second.markers, new_markers)
+        self.assertEqual(sorted(first.removed + second.removed), list(range(MAX_MARKERS_PER_PACKET)))
+        # Nothing changed in frame 2, the next packet holds the removals of frame 3
+        publisher.publish(FramePoses(2, 0.0, new_markers))
+        publisher.publish(FramePoses(3, 0.0, []))
+        packet = self.receive()
+        self.assertEqual(packet.frame_index, 3)
+        self.assertEqual(sorted(packet.removed), list(range(100, 110)))
+
+    def test_rejects_malformed(self):
+        with self.assertRaises(ValueError):
+            unpack_packet(b"SOLP")
+        with self.assertRaises(ValueError):
+            unpack_packet(HEADER.pack(b"XXXX", 1, 0, 0, 0, 0, 0))
+        with self.assertRaises(ValueError):
+            unpack_packet(HEADER.pack(b"SOLP", 1, 0, 2, 0, 0, 0) + bytes(RECORD.size))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from symphony.camera_calibration import create_detector_parameters
+from symphony.marker_generation import get_dictionary
+from symphony.roi_detection import RoiMarkerDetector
+
+MARKER_SIZE_PX = 80
+
+def frame_with_markers(positions: dict[int, tuple[int, int]], size: tuple[int, int] = (640, 480)) -> np.ndarray:
+    # White frame with the markers' top-left corners at the given positions
+    frame = np.full((size[1], size[0]), 255, dtype=np.uint8)
+    for marker_id, (x, y) in positions.items():
+        frame[y:y + MARKER_SIZE_PX, x:x + MARKER_SIZE_PX] = cv2.aruco.generateImageMarker(get_dictionary(cv2.aruco.DICT_5X5_50), marker_id, MARKER_SIZE_PX)
+    return frame
+
+class RoiMarkerDetectorTest(unittest.TestCase):
+    def setUp(self):
+        self.detector = RoiMarkerDetector(cv2.aruco.ArucoDetector(get_dictionary(cv2.aruco.DICT_5X5_50), create_detector_parameters()), rescan_interval=10)
+
+    def detect(self, positions: dict[int, tuple[int, int]]) -> dict[int, np.ndarray]:
+        corners, ids = self.detector.detect(frame_with_markers(positions))
+        return {} if ids is None else {int(marker_id): marker_corners.reshape(4, 2) for marker_corners, marker_id in zip(corners, ids.ravel())}
+
+    def counts(self) -> tuple[int, int]:
+        return self.detector.timings["full"][0], self.detector.timings["roi"][0]
+
+    def test_tracks_in_regions(self):
+        self.detect({1: (50, 50), 2: (400, 300)})
+        found = self.detect({1: (56, 52), 2: (404, 300)})
+        self.assertEqual(self.counts(), (1, 1))
+        self.assertEqual(sorted(found), [1, 2])
+        np.testing.assert_allclose(found[1][0], (56, 52), atol=1.5)
+        np.testing.assert_allclose(found[2][0], (404, 300), atol=1.5)
+
+    def test_rescans_lost_track(self):
+        self.detect({1: (50, 50), 2: (400, 300)})
+        # Marker 1 jumped out of its region
+        found = self.detect({1: (300, 60), 2: (400, 300)})
+        self.assertEqual(self.counts(), (2, 1))
+        self.assertEqual(sorted(found), [1, 2])
+        np.testing.assert_allclose(found[1][0], (300, 60), atol=1.5)
+        self.assertEqual(sorted(self.detector.tracks), [1, 2])
+        # The track continues from where the rescan found it
+        self.detect({1: (302, 60), 2: (400, 300)})
+        self.assertEqual(self.counts(), (2, 2))
+
+    def test_drops_removed_markers(self):
+        self.detect({1: (50, 50), 2: (400, 300)})
+        found = self.detect({2: (400, 300)})
+        self.assertEqual(self.counts(), (2, 1))
+        self.assertEqual(sorted(found), [2])
+        self.assertEqual(sorted(self.detector.tracks), [2])
+
+    def test_rescans_periodically(self):
+        self.detect({1: (50, 50)})
+        # A new marker outside the tracked regions is only picked up by the next full-frame rescan
+        for _ in range(9):
+            self.assertEqual(sorted(self.detect({1: (50, 50), 3: (300, 300)})), [1])
+        self.assertEqual(sorted(self.detect({1: (50, 50), 3: (300, 300)})), [1, 3])
+        self.assertEqual(self.counts(), (2, 9))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from symphony.camera_calibration import create_charuco_board
+from symphony.table_homography import TableHomography, TableMarkerEstimator, compute_projector_homography, compute_table_homography, projector_orientation
+
+# Where a projected image of 600 x 400 mm lands on the table
+PROJECTOR_CORNERS = [[0, 0], [600, 0], [600, 400], [0, 400]]
+# The same image mirrored left to right
+MIRRORED_CORNERS = [[600, 0], [0, 0], [0, 400], [600, 400]]
+
+def marker_corners(centre: tuple[float, float], angle: float, side: float = 20) -> np.ndarray:
+    # Top-left, top-right, bottom-right, bottom-left corner of a marker turned by angle degrees
+    rotation = np.array([[np.cos(np.radians(angle)), -np.sin(np.radians(angle))], [np.sin(np.radians(angle)), np.cos(np.radians(angle))]])
+    square = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * side / 2
+    return (square @ rotation.T + centre).reshape(1, 4, 2).astype(np.float32)
+
+class TableMarkerEstimatorTest(unittest.TestCase):
+    def estimate(self, table: TableHomography, markers: list[tuple[tuple[float, float], float]], frame_size: tuple[int, int] = (1000, 1000), projector: bool = False):
+        estimator = TableMarkerEstimator(table, cv2.aruco.DICT_5X5_50, projector=projector)
+        corners = tuple(marker_corners(centre, angle) for centre, angle in markers)
+        return estimator.estimate(corners, np.arange(len(markers), dtype=np.int32).reshape(-1, 1), frame_size)
+
+    def test_maps_to_millimeters(self):
+        # Half a millimeter per pixel
+        table = TableHomography(np.diag([0.5, 0.5, 1.0]), (1000, 1000), 0.0)
+        first, second = self.estimate(table, [((100, 200), 0), ((400, 300), 45)])
+        self.assertEqual(first.marker_id, 0)
+        self.assertAlmostEqual(first.x, 50, places=3)
+        self.assertAlmostEqual(first.y, 100, places=3)
+        self.assertAlmostEqual(first.angle, 0, places=3)
+        self.assertEqual(second.marker_id, 1)
+        self.assertAlmostEqual(second.x, 200, places=3)
+        self.assertAlmostEqual(second.y, 150, places=3)
+        self.assertAlmostEqual(second.angle, 45, places=3)
+
+    def test_scales_other_frame_sizes(self):
+        table = TableHomography(np.diag([0.5, 0.5, 1.0]), (1000, 1000), 0.0)
+        marker, = self.estimate(table, [((50, 100), 30)], frame_size=(500, 500))
+        self.assertAlmostEqual(marker.x, 50, places=3)
+        self.assertAlmostEqual(marker.y, 100, places=3)
+        self.assertAlmostEqual(marker.angle, 30, places=3)
+
+    def test_maps_to_projector_uv(self):
+        table = TableHomography(np.eye(3), (1000, 1000), 0.0, compute_projector_homography(PROJECTOR_CORNERS))
+        marker, = self.estimate(table, [((150, 300), 45)], projector=True)
+        self.assertAlmostEqual(marker.x, 0.25, places=5)
+        self.assertAlmostEqual(marker.y, 0.75, places=5)
+        # Headings are measured in millimeters, not skewed by the stretch of UV
+        self.assertAlmostEqual(marker.angle, 45, places=3)
+
+    def test_mirrored_projector_heading(self):
+        table = TableHomography(np.eye(3), (1000, 1000), 0.0, compute_projector_homography(MIRRORED_CORNERS))
+        marker, = self.estimate(table, [((150, 300), 45)], projector=True)
+        self.assertAlmostEqual(marker.x, 0.75, places=5)
+        self.assertAlmostEqual(marker.angle, 135, places=3)
+
+    def test_projector_needs_projector_homography(self):
+        with self.assertRaises(ValueError):
+            TableMarkerEstimator(TableHomography(np.eye(3), (1000, 1000), 0.0), cv2.aruco.DICT_5X5_50, projector=True)
+
+class ProjectorOrientationTest(unittest.TestCase):
+    def test_no_rotation(self):
+        orientation, uv_per_mm = projector_orientation(compute_projector_homography(PROJECTOR_CORNERS))
+        np.testing.assert_allclose(orientation, np.eye(2), atol=1e-9)
+        # The longer side stretches a millimeter the least
+        self.assertAlmostEqual(uv_per_mm, 1 / 600)
+
+    def test_mirror(self):
+        orientation, _ = projector_orientation(compute_projector_homography(MIRRORED_CORNERS))
+        np.testing.assert_allclose(orientation, np.diag([-1.0, 1.0]), atol=1e-9)
+
+    def test_rotation(self):
+        # The projected image turned a quarter turn on the table
+        orientation, _ = projector_orientation(compute_projector_homography([[400, 0], [400, 600], [0, 600], [0, 0]]))
+        np.testing.assert_allclose(orientation, [[0.0, 1.0], [-1.0, 0.0]], atol=1e-9)
+
+class ComputeTableHomographyTest(unittest.TestCase):
+    def setUp(self):
+        self.image = create_charuco_board().generateImage((1400, 1000), marginSize=50)
+        # The intrinsics at twice the image's resolution
+        self.camera_matrix = np.array([[2000.0, 0, 1400], [0, 2000.0, 1000], [0, 0, 1]])
+        self.dist_coeffs = np.array([0.1, -0.05, 0, 0, 0])
+
+    def test_finds_board(self):
+        table = compute_table_homography(self.image)
+        self.assertIsNotNone(table)
+        self.assertEqual(table.image_size, (1400, 1000))
+        self.assertLess(table.rms_mm, 0.5)
+
+    def test_scales_camera_matrix(self):
+        table = compute_table_homography(self.image, self.camera_matrix, self.dist_coeffs, (2800, 2000))
+        expected = compute_table_homography(self.image, self.camera_matrix * [[0.5], [0.5], [1]], self.dist_coeffs)
+        np.testing.assert_allclose(table.camera_matrix, expected.camera_matrix)
+        np.testing.assert_allclose(table.homography, expected.homography)
+
+    def test_rejects_image_without_board(self):
+        self.assertIsNone(compute_table_homography(np.full((1000, 1400), 255, dtype=np.uint8)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from symphony.undistortion import UNDISTORT_MAP1_FILE, UNDISTORT_MAP2_FILE, compute_undistort_maps, load_undistort_maps, save_undistort_maps, scale_camera_matrix, undistort_corners, undistort_frame
+
+CAMERA_MATRIX = np.array([[500.0, 0, 320], [0, 500.0, 240], [0, 0, 1]])
+DIST_COEFFS = np.array([-0.2, 0.05, 0.001, -0.001, 0.0])
+IMAGE_SIZE = (640, 480)
+
+class UndistortMapsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.maps = compute_undistort_maps(CAMERA_MATRIX, DIST_COEFFS, IMAGE_SIZE)
+        self.frame = np.random.default_rng(0).integers(0, 256, (IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.uint8)
+
+    def test_matches_undistort(self):
+        np.testing.assert_array_equal(undistort_frame(self.frame, self.maps), cv2.undistort(self.frame, CAMERA_MATRIX, DIST_COEFFS))
+
+    def test_round_trip(self):
+        paths = save_undistort_maps(*self.maps, self.directory)
+        self.assertEqual(paths, (os.path.join(self.directory, UNDISTORT_MAP1_FILE), os.path.join(self.directory, UNDISTORT_MAP2_FILE)))
+        for mmap in (True, False):
+            with self.subTest(mmap=mmap):
+                loaded = load_undistort_maps(self.directory, mmap)
+                for original, map in zip(self.maps, loaded):
+                    self.assertEqual(map.dtype, original.dtype)
+                    np.testing.assert_array_equal(map, original)
+                self.assertEqual(isinstance(loaded[0], np.memmap), mmap)
+                np.testing.assert_array_equal(undistort_frame(self.frame, loaded), undistort_frame(self.frame, self.maps))
+
+    def test_missing_maps(self):
+        with self.assertRaises(OSError):
+            load_undistort_maps(self.directory)
+
+    def test_reuses_output(self):
+        out = np.empty_like(self.frame)
+        self.assertIs(undistort_frame(self.frame, self.maps, out), out)
+
+class UndistortCornersTest(unittest.TestCase):
+    def test_matches_undistort_points(self):
+        corners = np.array([[[[100, 80], [140, 80], [140, 120], [100, 120]]]], dtype=np.float32)
+        undistorted = undistort_corners(corners, CAMERA_MATRIX, DIST_COEFFS)
+        self.assertEqual(undistorted.shape, corners.shape)
+        expected = cv2.undistortPoints(corners.reshape(-1, 1, 2), CAMERA_MATRIX, DIST_COEFFS, P=CAMERA_MATRIX)
+        np.testing.assert_allclose(undistorted.reshape(-1, 2), expected.reshape(-1, 2), atol=1e-4)
+
+    def test_scales_camera_matrix(self):
+        scaled = scale_camera_matrix(CAMERA_MATRIX, IMAGE_SIZE, (1280, 960))
+        np.testing.assert_allclose(scaled, [[1000, 0, 640], [0, 1000, 480], [0, 0, 1]])
+
+if __name__ == "__main__":
+    unittest.main()